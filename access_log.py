@@ -0,0 +1,210 @@
+# C:\Users\mnold_t1ohvc3\Documents\zahlenpirat-backend\access_log.py
+"""
+Strukturiertes Zugriffs-/Audit-Log als JSONL – geschrieben von einem Hintergrund-Thread.
+
+- `AccessLogMiddleware` (reines ASGI) legt pro Anfrage eine Zeile an: Zeit, Methode, Route
+  (Pfad-Muster), Status, Dauer, Bytes. Routen ergänzen eigene Felder über `annotate(...)`
+  (z. B. sessionId, Textlängen) – aufrufen im async-Handler, nicht in run_io.
+- Zeilen gehen in eine begrenzte Queue (ZP_ACCESS_LOG_QUEUE); ein Thread schreibt sie gebündelt
+  nach ZP_ACCESS_LOG (Standard data/logs/requests.jsonl, "" = aus) und rotiert ab
+  ZP_ACCESS_LOG_MAX_BYTES (requests.jsonl.1 … .ZP_ACCESS_LOG_BACKUPS).
+- Mehrere Worker hängen an dieselbe Datei an (ein write() pro Bündel). Rotiert wird unter
+  file_lock, und nur, wenn die Datei noch die eigene ist; hat ein anderer Worker rotiert
+  (anderer Inode), wird neu geöffnet.
+- Ist die Queue voll, wird die Zeile verworfen und gezählt – eine Anfrage wartet nie auf das Log.
+- Eingaben/Ausgaben im Klartext und Spielernamen nur mit ZP_ACCESS_LOG_PII=1 (`pii_enabled()`).
+"""
+import contextvars, json, os, queue, threading, time, logging
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+from json_files import file_lock
+from metrics import route_label
+
+log = logging.getLogger(__name__)
+
+ACCESS_LOG_FILE = os.getenv("ZP_ACCESS_LOG", os.path.join("data", "logs", "requests.jsonl"))
+ACCESS_LOG_QUEUE = int(os.getenv("ZP_ACCESS_LOG_QUEUE", "10000"))
+ACCESS_LOG_MAX_BYTES = int(os.getenv("ZP_ACCESS_LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+ACCESS_LOG_BACKUPS = int(os.getenv("ZP_ACCESS_LOG_BACKUPS", "5"))
+ACCESS_LOG_PII = os.getenv("ZP_ACCESS_LOG_PII", "0") == "1"
+BATCH = 256  # Zeilen pro Schreibvorgang
+
+_STOP = object()
+
+# Zusatzfelder der laufenden Anfrage (von annotate() befüllt, von der Middleware geschrieben)
+_current: contextvars.ContextVar[Optional[Dict[str, Any]]] = contextvars.ContextVar("zp_access_fields", default=None)
+
+
+def pii_enabled() -> bool:
+    return ACCESS_LOG_PII
+
+
+def annotate(**fields: Any) -> None:
+    """Felder zur Log-Zeile der laufenden Anfrage hinzufügen (außerhalb einer Anfrage: nichts)."""
+    current = _current.get()
+    if current is not None:
+        current.update(fields)
+
+
+class AccessLog:
+    def __init__(self, path: str = ACCESS_LOG_FILE, maxsize: int = ACCESS_LOG_QUEUE,
+                 max_bytes: int = ACCESS_LOG_MAX_BYTES, backups: int = ACCESS_LOG_BACKUPS):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=maxsize)
+        self._thread: Optional[threading.Thread] = None
+        self._guard = threading.Lock()
+        self.written = 0
+        self.dropped = 0
+        self.rotations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path)
+
+    def write(self, entry: Dict[str, Any]) -> None:
+        """Zeile einreihen, ohne zu blockieren; bei voller Queue verwerfen und zählen."""
+        if not self.enabled:
+            return
+        if self._thread is None:
+            self._start()
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            self.dropped += 1
+
+    def _start(self) -> None:
+        with self._guard:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="zp-access-log", daemon=True)
+                self._thread.start()
+
+    # ------------------------------------------------------------------
+    # Schreib-Thread
+    # ------------------------------------------------------------------
+    def _run(self) -> None:
+        d = os.path.dirname(self.path)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        f = self._open()
+        try:
+            while True:
+                batch: List[Any] = [self._queue.get()]
+                while len(batch) < BATCH:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                stop = batch[-1] is _STOP
+                lines = [e for e in batch if e is not _STOP]
+                if lines:
+                    try:
+                        f = self._current(f)
+                        f.write("".join(json.dumps(e, ensure_ascii=False, separators=(",", ":"), default=str) + "\n"
+                                        for e in lines).encode("utf-8"))
+                        f.flush()
+                        self.written += len(lines)
+                        if self.max_bytes > 0 and os.fstat(f.fileno()).st_size >= self.max_bytes:
+                            f = self._rotate(f)
+                    except (OSError, TypeError, ValueError):
+                        self.dropped += len(lines)
+                        log.warning("Zugriffs-Log konnte nicht geschrieben werden: %s", self.path, exc_info=True)
+                if stop:
+                    return
+        finally:
+            f.close()
+
+    def _open(self) -> Any:
+        # Binär + O_APPEND: ein Bündel geht als ein write() raus und landet am aktuellen Dateiende
+        return open(self.path, "ab")
+
+    def _is_current(self, f: Any) -> bool:
+        try:
+            return os.path.samestat(os.fstat(f.fileno()), os.stat(self.path))
+        except FileNotFoundError:
+            return False
+
+    def _current(self, f: Any) -> Any:
+        """Hat ein anderer Worker rotiert, zeigt `f` auf die alte Datei → neu öffnen."""
+        if self._is_current(f):
+            return f
+        f.close()
+        return self._open()
+
+    def _rotate(self, f: Any) -> Any:
+        """Rotieren unter file_lock – aber nur, wenn nicht schon ein anderer Worker rotiert hat."""
+        try:
+            with file_lock(self.path):
+                if self._is_current(f):
+                    for i in range(self.backups - 1, 0, -1):
+                        src = f"{self.path}.{i}"
+                        if os.path.exists(src):
+                            os.replace(src, f"{self.path}.{i + 1}")
+                    if self.backups > 0:
+                        os.replace(self.path, f"{self.path}.1")
+                    else:
+                        os.remove(self.path)
+                    self.rotations += 1
+        except OSError:
+            log.warning("Zugriffs-Log konnte nicht rotiert werden: %s", self.path, exc_info=True)
+        f.close()
+        return self._open()
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Restliche Zeilen schreiben und den Thread beenden (Shutdown)."""
+        with self._guard:
+            thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        self._queue.put(_STOP)   # blockierend: beim Shutdown darf gewartet werden
+        thread.join(timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"enabled": self.enabled, "written": self.written, "dropped": self.dropped,
+                "queued": self._queue.qsize(), "rotations": self.rotations}
+
+
+ACCESS_LOG = AccessLog()
+
+
+class AccessLogMiddleware:
+    def __init__(self, app: Any, access_log: AccessLog = ACCESS_LOG):
+        self.app = app
+        self.access_log = access_log
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable, send: Callable) -> None:
+        if scope["type"] != "http" or not self.access_log.enabled:
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        status = 500
+        size = 0
+
+        async def _send(message: Dict[str, Any]) -> None:
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        fields: Dict[str, Any] = {}
+        token = _current.set(fields)
+        try:
+            await self.app(scope, receive, _send)
+        finally:
+            _current.reset(token)
+            entry = {
+                "ts": datetime.now(timezone.utc).isoformat(timespec="milliseconds"),
+                "method": scope["method"],
+                "route": route_label(scope),
+                "status": status,
+                "durMs": round((time.perf_counter() - start) * 1000, 2),
+                "bytes": size,
+            }
+            if ACCESS_LOG_PII and scope.get("query_string"):
+                entry["query"] = scope["query_string"].decode("latin-1")
+            entry.update(fields)
+            self.access_log.write(entry)
@@ -0,0 +1,89 @@
+# C:\Users\mnold_t1ohvc3\Documents\zahlenpirat-backend\autosave_queue.py
+import os, threading, logging
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from score_store import ScoreStore
+
+log = logging.getLogger(__name__)
+
+FLUSH_MS = int(os.getenv("ZP_AUTOSAVE_FLUSH_MS", "500"))
+FLUSH_BATCH = int(os.getenv("ZP_AUTOSAVE_BATCH", "50"))
+
+
+class AutosaveQueue:
+    """
+    Sammelt die Autosave-Stände aus /flow und schreibt sie gebündelt im Hintergrund.
+
+    Pro Spieler wird nur der jüngste Stand behalten; geschrieben wird alle `flush_ms`
+    Millisekunden oder sobald `flush_batch` Spieler anstehen – und immer bei close().
+    `write` ersetzt das Schreiben (Standard: store.upsert_running_sessions), z. B. um danach
+    noch weitere Indizes nachzuführen.
+    """
+
+    def __init__(self, get_store: Callable[[], ScoreStore],
+                 flush_ms: int = FLUSH_MS, flush_batch: int = FLUSH_BATCH,
+                 write: Optional[Callable[[List[Tuple[str, Dict[str, Any]]]], None]] = None):
+        self._get_store = get_store
+        self._write = write
+        self.flush_ms = flush_ms
+        self.flush_batch = flush_batch
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+
+    def submit(self, spieler: str, session: Dict[str, Any]) -> None:
+        with self._cond:
+            # Dict behält die Einfügereihenfolge → ältere Spieler werden zuerst geschrieben
+            self._pending.pop(spieler, None)
+            self._pending[spieler] = session
+            closed = self._closed
+            if not closed:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._run, name="autosave-flusher", daemon=True)
+                    self._thread.start()
+                if len(self._pending) >= self.flush_batch:
+                    self._cond.notify()
+        if closed:
+            # Nach dem Shutdown gibt es keinen Hintergrund-Thread mehr → direkt schreiben
+            self.flush()
+
+    def flush(self) -> None:
+        """Alle anstehenden Stände sofort schreiben (z. B. bevor /endSession die letzte Session liest)."""
+        with self._flush_lock:
+            with self._cond:
+                if not self._pending:
+                    return
+                batch = list(self._pending.items())
+                self._pending.clear()
+            try:
+                if self._write is not None:
+                    self._write(batch)
+                else:
+                    self._get_store().upsert_running_sessions(batch)
+            except Exception:
+                log.error("Autosave: %d Stände konnten nicht gespeichert werden", len(batch), exc_info=True)
+                with self._cond:
+                    # Neuere Stände aus der Zwischenzeit gewinnen
+                    for spieler, session in batch:
+                        self._pending.setdefault(spieler, session)
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                if self._closed:
+                    return
+                self._cond.wait(self.flush_ms / 1000.0)
+                if self._closed:
+                    return
+            self.flush()
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        t = self._thread
+        if t is not None and t.is_alive():
+            t.join()
+        self.flush()
@@ -0,0 +1,319 @@
+# Last-/Benchmark der heißen Endpunkte – offline, reproduzierbar, mit Baseline-Vergleich.
+#   python bench/bench_endpoints.py [--rows 1000,100000,1000000] [--backend journal] [--n 200]
+#                                   [--uvicorn] [--save-baseline | --check] [--tolerance 0.3]
+#
+# Pro Datenmenge läuft ein eigener Worker-Prozess in einem frischen Temp-Ordner mit synthetischen
+# scores.json/data/scores.json (fester Seed). Gemessen wird mit FastAPIs TestClient (In-Process)
+# und – mit --uvicorn, falls installiert – gegen einen lokalen uvicorn über HTTP.
+# Ausgabe: p50/p95/p99 (ms), Durchsatz (req/s) und die erste ("kalte") Anfrage je Szenario.
+# --check vergleicht p95 und Durchsatz mit bench/baseline.json und endet bei Regression mit Code 1.
+import argparse, json, os, random, shutil, socket, subprocess, sys, tempfile, time
+from typing import Any, Callable, Dict, List, Optional
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO)
+
+BASELINE_FILE = os.path.join(REPO, "bench", "baseline.json")
+SCENARIOS = ("tasks", "save", "load", "leaderboard", "getHistory", "flow")
+MODI = ("Test", "Training", "Zahlenspiele")
+OPS = (["+"], ["-"], ["+", "-"], ["×"], ["×", "÷"])
+
+# Ein /flow-Dialog: Name → Operatoren → merken (nur Sitzung) → Start → 10 Antworten
+FLOW_SCRIPT = ["name", "Bench Pirat", "2", "operatoren", "1,3", "2", "start"] + ["12"] * 10
+
+
+# ======================
+# Daten
+# ======================
+
+def _players(rows: int) -> List[str]:
+    return [f"Spieler{i:05d}" for i in range(max(50, rows // 100))]
+
+
+def seed(workdir: str, rows: int, rnd_seed: int = 42) -> Dict[str, List[str]]:
+    """Synthetische scores.json (flache Liste) + Session-Historie; liefert die Spielernamen."""
+    from json_files import atomic_write_json, atomic_write_json_list
+
+    rnd = random.Random(rnd_seed)
+    players = _players(rows)
+
+    def _scores():
+        for i in range(rows):
+            yield {
+                "spieler": rnd.choice(players),
+                "punkte": rnd.randint(0, 200),
+                "klasse": rnd.randint(1, 4),
+                "modus": rnd.choice(MODI),
+                "operatoren": rnd.choice(OPS),
+                "schwierigkeit": rnd.choice(("Leicht", "Mittel", "Schwer")),
+                "zahlenauswahl": "1-100",
+                "kategorie": 1,
+                "dauer": f"{rnd.randint(20, 600)} Sek",
+                "autosave": False,
+                "datum": f"2025-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d} 10:{i % 60:02d}:00",
+            }
+
+    atomic_write_json_list(os.path.join(workdir, "scores.json"), _scores())
+
+    session_players = players[: max(10, len(players) // 10)]
+    sessions: Dict[str, Dict[str, List[Dict[str, Any]]]] = {p: {"sessions": []} for p in session_players}
+    for i in range(max(100, rows // 10)):
+        p = rnd.choice(session_players)
+        sessions[p]["sessions"].append({
+            "spieler": p, "modus": "Test", "klasse": rnd.randint(1, 4), "schwierigkeit": "Mittel",
+            "operatoren": rnd.choice(OPS), "aufgabenGesamt": 10, "aufgabenGeloest": rnd.randint(0, 10),
+            "punkte": rnd.randint(0, 100), "status": "abgeschlossen", "sessionId": f"bench-{i}",
+            "datum": f"2025-01-01T10:00:{i % 60:02d}",
+        })
+    atomic_write_json(os.path.join(workdir, "data", "scores.json"), sessions, ensure_ascii=False)
+    return {"players": players, "sessionPlayers": session_players}
+
+
+# ======================
+# Messen
+# ======================
+
+def percentile(sorted_ms: List[float], p: float) -> float:
+    """Nearest-Rank-Perzentil."""
+    if not sorted_ms:
+        return 0.0
+    k = max(0, min(len(sorted_ms) - 1, int(round(p / 100.0 * len(sorted_ms) + 0.5)) - 1))
+    return sorted_ms[k]
+
+
+def summarize(lat_ms: List[float], wall_s: float, cold_ms: float) -> Dict[str, float]:
+    s = sorted(lat_ms)
+    return {
+        "n": len(s),
+        "p50": round(percentile(s, 50), 3),
+        "p95": round(percentile(s, 95), 3),
+        "p99": round(percentile(s, 99), 3),
+        "rps": round(len(s) / wall_s, 1) if wall_s > 0 else 0.0,
+        "coldMs": round(cold_ms, 3),
+    }
+
+
+def run_scenarios(request: Callable[..., Any], names: Dict[str, List[str]], n: int,
+                  max_sek: float, only: Optional[List[str]] = None) -> Dict[str, Dict[str, float]]:
+    rnd = random.Random(7)
+    players, session_players = names["players"], names["sessionPlayers"]
+
+    def _tasks():
+        return [("GET", "/tasks", {"params": {"schwierigkeit": "Mittel", "klasse": rnd.randint(1, 4),
+                                              "operator": "+,×", "count": 10}})]
+
+    def _save():
+        return [("POST", "/save", {"json": {"spieler": rnd.choice(players), "punkte": rnd.randint(0, 200),
+                                            "klasse": rnd.randint(1, 4), "modus": rnd.choice(MODI),
+                                            "operatoren": rnd.choice(OPS)}})]
+
+    def _load():
+        return [("GET", "/load", {"params": {"spieler": rnd.choice(players)}})]
+
+    def _leaderboard():
+        params: Dict[str, Any] = {"limit": 10}
+        if rnd.random() < 0.5:
+            params.update(modus=rnd.choice(MODI), klasse=rnd.randint(1, 4))
+        return [("GET", "/leaderboard", {"params": params})]
+
+    def _history():
+        return [("GET", "/getHistory", {"params": {"spieler": rnd.choice(session_players)}})]
+
+    counter = iter(range(10 ** 9))
+
+    def _flow():
+        sid = f"bench-flow-{next(counter)}"
+        return [("POST", "/flow", {"json": {"sessionId": sid, "text": t}}) for t in FLOW_SCRIPT]
+
+    builders = {"tasks": _tasks, "save": _save, "load": _load, "leaderboard": _leaderboard,
+                "getHistory": _history, "flow": _flow}
+    out: Dict[str, Dict[str, float]] = {}
+    for name in (only or SCENARIOS):
+        lat: List[float] = []
+        cold = -1.0
+        start = warm = time.perf_counter()
+        while len(lat) < n and time.perf_counter() - start < max_sek:
+            for method, path, kw in builders[name]():
+                t0 = time.perf_counter()
+                resp = request(method, path, **kw)
+                dt = (time.perf_counter() - t0) * 1000
+                if resp.status_code >= 400:
+                    raise RuntimeError(f"{name}: {method} {path} → {resp.status_code} {resp.text[:200]}")
+                if cold < 0:
+                    cold = dt  # erste Anfrage baut Indizes/Caches auf → getrennt ausweisen
+                    warm = time.perf_counter()
+                else:
+                    lat.append(dt)
+        out[name] = summarize(lat, time.perf_counter() - warm, cold)
+    return out
+
+
+# ======================
+# Worker (ein Prozess je Datenmenge/Modus)
+# ======================
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def worker(args: argparse.Namespace) -> Dict[str, Any]:
+    workdir = tempfile.mkdtemp(prefix=f"zp-bench-{args.rows}-")
+    try:
+        return _measure(args, workdir)
+    finally:
+        os.chdir(REPO)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def _measure(args: argparse.Namespace, workdir: str) -> Dict[str, Any]:
+    os.makedirs(os.path.join(workdir, "data"), exist_ok=True)
+    t0 = time.perf_counter()
+    names = seed(workdir, args.rows)
+    seed_s = time.perf_counter() - t0
+    os.chdir(workdir)  # alle Pfade des Backends sind relativ
+    only = args.only.split(",") if args.only else None
+
+    if args.mode == "inproc":
+        from fastapi.testclient import TestClient
+        import main
+
+        with TestClient(main.app) as client:
+            results = run_scenarios(client.request, names, args.n, args.max_sek, only)
+    else:
+        import httpx
+
+        port = _free_port()
+        env = dict(os.environ, PYTHONPATH=REPO + os.pathsep + os.environ.get("PYTHONPATH", ""))
+        proc = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+             "--log-level", "warning", "--no-access-log"],
+            cwd=workdir, env=env,
+        )
+        try:
+            with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=120) as client:
+                deadline = time.monotonic() + 60
+                while True:
+                    try:
+                        client.get("/health")
+                        break
+                    except httpx.TransportError:
+                        if time.monotonic() > deadline or proc.poll() is not None:
+                            raise RuntimeError("uvicorn ist nicht gestartet")
+                        time.sleep(0.1)
+                results = run_scenarios(client.request, names, args.n, args.max_sek, only)
+        finally:
+            proc.terminate()
+            proc.wait(timeout=30)
+    return {"rows": args.rows, "mode": args.mode, "backend": args.backend, "seedSek": round(seed_s, 2),
+            "results": results}
+
+
+# ======================
+# Treiber
+# ======================
+
+def _key(backend: str, mode: str, rows: int, scenario: str) -> str:
+    return f"{backend}/{mode}/{rows}/{scenario}"
+
+
+def compare(current: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]],
+            tolerance: float, min_delta_ms: float) -> List[str]:
+    """Regressionen: p95 mehr als `tolerance` (und min_delta_ms) schlechter oder Durchsatz entsprechend niedriger."""
+    problems = []
+    for key, cur in current.items():
+        base = baseline.get(key)
+        if base is None:
+            continue
+        if cur["p95"] > base["p95"] * (1 + tolerance) and cur["p95"] - base["p95"] > min_delta_ms:
+            problems.append(f"{key}: p95 {cur['p95']:.2f} ms > Baseline {base['p95']:.2f} ms")
+        if base.get("rps") and cur["rps"] < base["rps"] / (1 + tolerance) and cur["p50"] - base["p50"] > min_delta_ms:
+            problems.append(f"{key}: {cur['rps']:.1f} req/s < Baseline {base['rps']:.1f} req/s")
+    return problems
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Benchmark der heißen Endpunkte (offline)")
+    ap.add_argument("--rows", default="1000,100000,1000000", help="Datenmengen (Scores), kommagetrennt")
+    ap.add_argument("--backend", default="journal", choices=("journal", "json", "sqlite"))
+    ap.add_argument("--n", type=int, default=200, help="Messungen je Szenario")
+    ap.add_argument("--max-sek", type=float, default=30.0, help="Zeitlimit je Szenario")
+    ap.add_argument("--only", default="", help=f"Teilmenge von {','.join(SCENARIOS)}")
+    ap.add_argument("--uvicorn", action="store_true", help="zusätzlich über HTTP gegen lokalen uvicorn")
+    ap.add_argument("--save-baseline", action="store_true")
+    ap.add_argument("--check", action="store_true", help="gegen bench/baseline.json prüfen")
+    ap.add_argument("--tolerance", type=float, default=0.3, help="erlaubte Verschlechterung (0.3 = 30 %%)")
+    ap.add_argument("--min-delta-ms", type=float, default=1.0, help="kleinere Unterschiede sind Rauschen")
+    ap.add_argument("--json", help="Ergebnisse zusätzlich als JSON in diese Datei")
+    ap.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    ap.add_argument("--mode", default="inproc", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.worker:
+        args.rows = int(args.rows)
+        print(json.dumps(worker(args)))
+        return 0
+
+    modes = ["inproc"]
+    if args.uvicorn:
+        try:
+            import uvicorn  # noqa: F401
+            modes.append("uvicorn")
+        except ImportError:
+            print("uvicorn nicht installiert – nur In-Process-Messung")
+
+    env = dict(os.environ, ZP_SCORES_STORAGE=args.backend, ZP_OUTBOX_REPLAY_SEK="0")
+    current: Dict[str, Dict[str, float]] = {}
+    runs = []
+    for rows in (int(r) for r in args.rows.split(",") if r):
+        for mode in modes:
+            cmd = [sys.executable, os.path.abspath(__file__), "--worker", "--rows", str(rows), "--mode", mode,
+                   "--backend", args.backend, "--n", str(args.n), "--max-sek", str(args.max_sek)]
+            if args.only:
+                cmd += ["--only", args.only]
+            proc = subprocess.run(cmd, env=env, capture_output=True, text=True)
+            if proc.returncode != 0:
+                sys.stderr.write(proc.stderr)
+                return 2
+            run = json.loads(proc.stdout.strip().splitlines()[-1])
+            runs.append(run)
+            print(f"\n{args.backend} / {mode} / {rows} Scores (Seed {run['seedSek']} s)")
+            print(f"  {'Szenario':<12}{'n':>6}{'p50':>10}{'p95':>10}{'p99':>10}{'req/s':>10}{'kalt':>10}")
+            for name, r in run["results"].items():
+                print(f"  {name:<12}{r['n']:>6}{r['p50']:>10.2f}{r['p95']:>10.2f}{r['p99']:>10.2f}"
+                      f"{r['rps']:>10.1f}{r['coldMs']:>10.1f}")
+                current[_key(args.backend, mode, rows, name)] = r
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(runs, f, indent=2)
+
+    if args.save_baseline:
+        baseline = {}
+        if os.path.exists(BASELINE_FILE):
+            with open(BASELINE_FILE, "r", encoding="utf-8") as f:
+                baseline = json.load(f)
+        baseline.update(current)
+        with open(BASELINE_FILE, "w", encoding="utf-8") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print(f"\nBaseline gespeichert: {BASELINE_FILE}")
+
+    if args.check:
+        if not os.path.exists(BASELINE_FILE):
+            print(f"\nKeine Baseline ({BASELINE_FILE}) – zuerst mit --save-baseline auf dieser Maschine erzeugen.")
+            return 2
+        with open(BASELINE_FILE, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        problems = compare(current, baseline, args.tolerance, args.min_delta_ms)
+        if problems:
+            print("\nREGRESSION:")
+            for p in problems:
+                print("  " + p)
+            return 1
+        print("\nKeine Regression gegenüber der Baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,81 @@
+# Benchmark: utils_text.to_plain (translate-Tabelle + Cache) gegen die alte replace-Kette.
+#   python bench/bench_to_plain.py [--n 20000]
+import argparse, os, random, sys, timeit, unicodedata
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils_text import to_plain, _to_plain  # noqa: E402
+from engine import format_confirmation_and_menu, _operator_choice_menu  # noqa: E402
+
+
+# --- bisherige Implementierung (Stand vor der Umstellung), nur zum Vergleich ---
+def _legacy_is_emoji(ch: str) -> bool:
+    o = ord(ch)
+    return (
+        0x1F300 <= o <= 0x1FAFF
+        or 0x2600 <= o <= 0x26FF
+        or 0x2700 <= o <= 0x27BF
+        or o in (0xFE0F, 0x20E3)
+    )
+
+
+def legacy_to_plain(text: str) -> str:
+    t = "".join(ch for ch in text if not _legacy_is_emoji(ch))
+    replacements = {
+        "„": '"', "“": '"', "‚": "'", "’": "'", "…": "...", "—": "-", "–": "-",
+        "•": "- ", "·": "-", "×": "x", "÷": "/",
+        "→": "->", "←": "<-", "±": "+/-",
+        "Ä": "Ae", "Ö": "Oe", "Ü": "Ue", "ä": "ae", "ö": "oe", "ü": "ue", "ß": "ss",
+        " ": " ",
+    }
+    for src, dst in replacements.items():
+        t = t.replace(src, dst)
+    t = unicodedata.normalize("NFKD", t).encode("ascii", "ignore").decode("ascii")
+    t = "\n".join(line.rstrip() for line in t.splitlines())
+    while "  " in t:
+        t = t.replace("  ", " ")
+    return t
+
+
+def _samples():
+    texts = [
+        format_confirmation_and_menu("Operatoren", "+,×"),
+        format_confirmation_and_menu("Schwierigkeit", "Mittel"),
+        _operator_choice_menu(),
+        "1️⃣ 🧭 Test\n2️⃣ 🏴‍☠️ Zahlenspiele\n3️⃣ 🗺️ Lernen\n4️⃣ ⚓ Abenteuer & Extras\n",
+        "✅ Richtig, aye! ⚓\nDie Lösung ist 12.\n\n⚔️ Nächste Aufgabe: 7 × 6 = ?",
+    ]
+    rnd = random.Random(42)
+    alphabet = "abcÄÖÜäöüß •·×÷→←±„“‚’…—– \t\n\r\u00A0 éèñ😀⚓✅️⃣ﬁ①"
+    fuzz = ["".join(rnd.choice(alphabet) for _ in range(rnd.randint(0, 200))) for _ in range(2000)]
+    return texts, fuzz
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=20000, help="Aufrufe pro Messung")
+    args = ap.parse_args()
+
+    texts, fuzz = _samples()
+    for t in texts + fuzz:
+        assert _to_plain(t) == legacy_to_plain(t), repr(t)
+    print(f"Ausgaben identisch für {len(texts) + len(fuzz)} Texte")
+
+    def run(fn, pool):
+        k = len(pool)
+        return min(timeit.repeat(lambda: [fn(pool[i % k]) for i in range(args.n)], number=1, repeat=3))
+
+    rows = [
+        ("alt (replace-Kette)", run(legacy_to_plain, texts)),
+        ("neu, ohne Cache", run(_to_plain, texts)),
+        ("neu, mit Cache (Menütexte)", run(to_plain, texts)),
+        ("alt, Zufallstexte", run(legacy_to_plain, fuzz)),
+        ("neu, Zufallstexte ohne Cache", run(_to_plain, fuzz)),
+    ]
+    base = rows[0][1]
+    for name, sec in rows:
+        print(f"{name:32s} {sec * 1e6 / args.n:8.2f} µs/Aufruf   x{base / sec:5.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,26 @@
 # C:\Users\mnold_t1ohvc3\Documents\zahlenpirat-backend\connector_routes.py
-from fastapi import APIRouter, Body, Query
-from typing import Dict, Any
-from engine import get_state
-import requests
+from fastapi import APIRouter, Body, Header, Query
+from typing import Dict, Any, Optional, Tuple
+from engine import get_state, save_state, SESSIONS
 import logging, traceback
 import json, os, uuid, datetime
 
-# Normalisierer aus der Engine (für Operatoren/Schwierigkeit/Modus)
-from engine import _normalize_operator_value, _normalize_schwierigkeit, _normalize_modus
+# Normalisierer (für Operatoren/Schwierigkeit/Modus) + Mojibake-Reparatur
+from normalize import canonical_value, repair_mojibake
+
+from score_store import SESSIONS_FILE, get_store
+from io_executor import run_io
+from paging import ndjson_response, page, tail_page, wants_ndjson
+from fast_json import FastJSONResponse
+from autosave_queue import AutosaveQueue
+from remote_save import RemoteSaver
+from player_stats import PLAYER_STATS
+from access_log import annotate, pii_enabled
 
 from settings_manager import (
     load_persistent,
-    save_persistent,
+    load_persistent_snapshot,
+    update_persistent,
     reset_persistent,
     normalize_keys_for_display,
 )
@@ -65,75 +74,57 @@ router = APIRouter()
 logging.basicConfig(level=logging.INFO)
 
 # --- HELFER: Eingabewerte reparieren/normalisieren ---------------------------
-def _repair_mojibake_str(s: str) -> str:
-    if "Ã" in s or "Â" in s:
-        try:
-            return s.encode("latin-1").decode("utf-8")
-        except Exception:
-            pass
-    return (
-        s.replace("Ã×", "×")
-         .replace("Ã·", "÷")
-         .replace("Ã,", "×,")
-    )
-
 def _normalize_for_key(key: str, raw: Any) -> str:
     v = str(raw)
     if key == "Operatoren":
-        v = _repair_mojibake_str(v)
-        v = _normalize_operator_value(v)
-    elif key == "Schwierigkeit":
-        v = _normalize_schwierigkeit(v)
-    elif key == "Modus":
-        v = _normalize_modus(v)
-    return v
+        v = repair_mojibake(v)
+    return canonical_value(key, v)
 # ----------------------------------------------------------------------------
 
 
 @router.get("/settings")
-def get_settings() -> Dict[str, Any]:
-    return load_persistent()
+async def get_settings() -> Dict[str, Any]:
+    return await run_io(load_persistent)
 
 
 @router.post("/settings")
-def set_settings(payload: Dict[str, Any] = Body(...)) -> Dict[str, Any]:
-    current = load_persistent()
-    for key, raw in (payload or {}).items():
-        if key in ("Operatoren", "Schwierigkeit", "Modus"):
-            current[key] = _normalize_for_key(key, raw)
-        else:
-            current[key] = raw
-    save_persistent(current)
+async def set_settings(payload: Dict[str, Any] = Body(...)) -> Dict[str, Any]:
+    def _apply(current: Dict[str, Any]) -> None:
+        for key, raw in (payload or {}).items():
+            if key in ("Operatoren", "Schwierigkeit", "Modus"):
+                current[key] = _normalize_for_key(key, raw)
+            else:
+                current[key] = raw
+
+    current = await run_io(update_persistent, _apply)
     return {"status": "ok", "saved": current}
 
 
 @router.post("/settings/set")
-def set_single(key: str = Query(...), value: str = Query(...)) -> Dict[str, Any]:
-    current = load_persistent()
+async def set_single(key: str = Query(...), value: str = Query(...)) -> Dict[str, Any]:
     if key in ("Operatoren", "Schwierigkeit", "Modus"):
         v = _normalize_for_key(key, value)
     else:
         v = value
-    current[key] = v
-    save_persistent(current)
+    await run_io(update_persistent, lambda current: current.__setitem__(key, v))
     return {"status": "ok", "saved": {key: v}}
 
 
 @router.post("/settings/reset")
-def reset_settings() -> Dict[str, Any]:
-    reset_persistent()
+async def reset_settings() -> Dict[str, Any]:
+    await run_io(reset_persistent)
     return {"status": "ok", "message": "all standards reset"}
 
 
 @router.get("/start")
-def start(plain: bool = Query(True)) -> Dict[str, str]:
+async def start(plain: bool = Query(True)) -> Dict[str, str]:
     base_menu = (
         "1️⃣ 🧭 Test\n"
         "2️⃣ 🏴‍☠️ Zahlenspiele\n"
         "3️⃣ 🗺️ Lernen\n"
         "4️⃣ ⚓ Abenteuer & Extras\n"
     )
-    persistent = load_persistent()
+    persistent = await run_io(load_persistent_snapshot)
     if persistent:
         disp = normalize_keys_for_display(persistent)
         std = (
@@ -154,8 +145,8 @@ def start(plain: bool = Query(True)) -> Dict[str, str]:
 
 
 @router.get("/current")
-def current(sessionId: str = Query(...), plain: bool = Query(True)) -> Dict[str, Any]:
-    data = get_effective_settings(sessionId)
+async def current(sessionId: str = Query(...), plain: bool = Query(True)) -> Dict[str, Any]:
+    data = await run_io(get_effective_settings, sessionId)
 
     def _fmt_block(title: str, d: Dict[str, Any]) -> str:
         if not d:
@@ -178,76 +169,118 @@ def current(sessionId: str = Query(...), plain: bool = Query(True)) -> Dict[str,
     return {"text": text, "data": data}
 
 
+def _flow_turn(sessionId: str, text: str) -> Tuple[str, Dict[str, Any]]:
+    """Ein Chat-Zug inkl. Session-/Settings-Zugriffen (läuft im I/O-Pool)."""
+    out = handle_user_input(sessionId, text)
+
+    state = get_state(sessionId)
+    if state.autosave_id is None:
+        state.autosave_id = str(uuid.uuid4())
+        save_state(sessionId, state)
+    sessionData = {
+        "spieler": sessionId,
+        "modus": state.session_standards.get("Modus", "Test"),
+        "klasse": state.session_standards.get("Klasse"),
+        "schwierigkeit": state.session_standards.get("Schwierigkeit"),
+        "operatoren": state.session_standards.get("Operatoren", []),
+        "aufgabenGesamt": state.aufgaben_gesamt,
+        "aufgabenGeloest": state.aufgaben_geloest,
+        "punkte": state.punkte,
+        "status": "laufend",
+        "sessionId": state.autosave_id,
+        "datum": datetime.datetime.utcnow().isoformat(),
+    }
+
+    # Gebündelt im Hintergrund speichern; ersetzt den vorigen "laufend"-Stand dieser Session
+    _autosave.submit(sessionId, sessionData)
+    return out, sessionData
+
+
 @router.post("/flow")
-def flow(
+async def flow(
     sessionId: str = Body(...),
     text: str = Body(...),
     plain: bool = Query(True),
 ) -> Dict[str, Any]:
     try:
-        logging.info(f"[FLOW] Eingabe erhalten – sessionId={sessionId}, text={text}")
-        out = handle_user_input(sessionId, text)
-
-        state = get_state(sessionId)
-        sessionData = {
-            "spieler": sessionId,
-            "modus": state.session_standards.get("Modus", "Test"),
-            "klasse": state.session_standards.get("Klasse"),
-            "schwierigkeit": state.session_standards.get("Schwierigkeit"),
-            "operatoren": state.session_standards.get("Operatoren", []),
-            "aufgabenGesamt": state.session_stats.get("aufgabenGesamt", 0),
-            "aufgabenGeloest": state.session_stats.get("aufgabenGeloest", 0),
-            "punkte": state.session_stats.get("punkte", 0),
-            "status": "laufend",
-            "sessionId": str(uuid.uuid4()),
-            "datum": datetime.datetime.utcnow().isoformat(),
-        }
-
-        scores = _load_scores()
-        if sessionId not in scores:
-            scores[sessionId] = {"sessions": []}
-        scores[sessionId]["sessions"].append(sessionData)
-        _save_scores(scores)
+        # Zugriffs-Log (access_log.py): Längen statt Klartext, Text nur mit ZP_ACCESS_LOG_PII=1
+        annotate(sessionId=sessionId, textLen=len(text))
+        out, sessionData = await run_io(_flow_turn, sessionId, text)
 
         if plain:
             out = to_plain(out)
-        logging.info(f"[FLOW] Ausgabe: {out}")
+        annotate(outLen=len(out), autoSaved=sessionData is not None)
+        if pii_enabled():
+            annotate(text=text, out=out)
         return {"text": out, "autoSaved": sessionData}
 
     except Exception as e:
         logging.error("Fehler im /flow", exc_info=True)
+        annotate(error=type(e).__name__)
         return {"text": f"⚠️ Fehler: {str(e)}"}
 
 
 # --------------------------------------------------------------------
 # NEUE FUNKTIONEN: Session-Speichern und -Historie
 # --------------------------------------------------------------------
-SCORES_FILE = os.path.join("data", "scores.json")
+# Speicher-Backend (JSON-Datei data/scores.json oder SQLite) – siehe score_store.py
+SCORES_FILE = SESSIONS_FILE
+
+# Standard-Seitengröße für /getHistory
+HISTORY_PAGE = int(os.getenv("ZP_HISTORY_PAGE", "100"))
+
+def _write_autosaves(batch) -> None:
+    # Unter dem Statistik-Lock, damit ein gleichzeitiger Neuaufbau nichts doppelt zählt
+    with PLAYER_STATS.lock:
+        get_store().upsert_running_sessions(batch)
+        PLAYER_STATS.add_sessions(batch)
+
 
-def _load_scores() -> dict:
-    if os.path.exists(SCORES_FILE):
-        with open(SCORES_FILE, "r", encoding="utf-8") as f:
-            try:
-                return json.load(f)
-            except Exception:
-                return {}
-    return {}
+# Autosave aus /flow: gebündelt, ein Stand pro laufender Session
+_autosave = AutosaveQueue(get_store, write=_write_autosaves)
 
-def _save_scores(data: dict):
-    os.makedirs(os.path.dirname(SCORES_FILE), exist_ok=True)
-    with open(SCORES_FILE, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+
+@router.on_event("shutdown")
+def _flush_autosave():
+    _autosave.close()
+
+
+def _store_session(spieler: str, sessionData: Dict[str, Any]) -> None:
+    # Offene Autosaves zuerst, damit die Reihenfolge in der Historie stimmt
+    _autosave.flush()
+    with PLAYER_STATS.lock:
+        get_store().add_session(spieler, sessionData)
+        PLAYER_STATS.add_session(spieler, sessionData)
+
+
+def _end_running_session(spieler: str, status: str) -> Dict[str, Any]:
+    _autosave.flush()
+    store = get_store()
+    last_session = store.last_session(spieler)
+    if last_session is None:
+        return {"status": "error", "message": f"Keine Session für Spieler '{spieler}' gefunden."}
+
+    if last_session.get("status") == "laufend":
+        last_session["status"] = status
+        last_session["datumEnde"] = datetime.datetime.utcnow().isoformat()
+        with PLAYER_STATS.lock:
+            store.replace_last_session(spieler, last_session)
+            PLAYER_STATS.add_session(spieler, last_session)
+        # Nächster /flow-Zug dieses Chats beginnt einen neuen Autosave-Stand
+        state = SESSIONS.get(spieler)
+        if state is not None:
+            state.autosave_id = None
+            save_state(spieler, state)
+        return {"status": "ok", "message": f"Session {status}", "session": last_session}
+    else:
+        return {"status": "ok", "message": f"Letzte Session ist bereits '{last_session.get('status')}'.", "session": last_session}
 
 
 @router.post("/saveSession")
-def save_session(
+async def save_session(
     spieler: str = Body(...),
     sessionData: Dict[str, Any] = Body(...),
 ) -> Dict[str, Any]:
-    scores = _load_scores()
-    if spieler not in scores:
-        scores[spieler] = {"sessions": []}
-
     sessionData.setdefault("modus", "Test")
     sessionData.setdefault("klasse", None)
     sessionData.setdefault("schwierigkeit", None)
@@ -260,29 +293,39 @@ def save_session(
     sessionData["sessionId"] = str(uuid.uuid4())
     sessionData["datum"] = datetime.datetime.utcnow().isoformat()
 
-    scores[spieler]["sessions"].append(sessionData)
-    _save_scores(scores)
+    await run_io(_store_session, spieler, sessionData)
     return {"status": "ok", "saved": sessionData}
 
 
 @router.get("/getHistory")
-def get_history(spieler: str = Query(...)) -> Dict[str, Any]:
-    scores = _load_scores()
-    if spieler not in scores:
-        return {"spieler": spieler, "sessions": []}
-    return {"spieler": spieler, "sessions": scores[spieler]["sessions"]}
+async def get_history(
+    spieler: str = Query(...),
+    after: Optional[int] = Query(None, ge=0),
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    fmt: Optional[str] = Query(None, alias="format"),
+    accept: Optional[str] = Header(None),
+):
+    # Ohne Cursor: die letzten `limit` Sessions (wie /load), chronologisch; hasMore = es gibt ältere.
+    # Mit ?after= die nächsten Sessions danach; nextCursor als ?after= für die nächste Seite.
+    # format=ndjson (oder Accept: application/x-ndjson) streamt alles ab dem Cursor.
+    await run_io(_autosave.flush)
+    if wants_ndjson(fmt, accept):
+        return ndjson_response(get_store().iter_player_sessions(spieler, after), limit)
+    if after is None:
+        n = limit or HISTORY_PAGE
+        rows = await run_io(get_store().tail_player_sessions, spieler, n + 1)
+        sessions, cursor, has_more = tail_page(rows, n)
+    else:
+        sessions, cursor, has_more = await run_io(
+            lambda: page(get_store().iter_player_sessions(spieler, after), limit or HISTORY_PAGE, after))
+    return FastJSONResponse({"spieler": spieler, "sessions": sessions, "nextCursor": cursor, "hasMore": has_more})
 
 
 @router.post("/postSaveExtended")
-def post_save_extended(sessionData: Dict[str, Any] = Body(...)) -> Dict[str, Any]:
+async def post_save_extended(sessionData: Dict[str, Any] = Body(...)) -> Dict[str, Any]:
     try:
-        logging.info(f"[SAVE] Anfrage erhalten: {sessionData}")
-        scores = _load_scores()
         spieler = sessionData.get("spieler", "Anonym")
 
-        if spieler not in scores:
-            scores[spieler] = {"sessions": []}
-
         sessionData.setdefault("modus", "Test")
         sessionData.setdefault("klasse", None)
         sessionData.setdefault("schwierigkeit", None)
@@ -295,68 +338,48 @@ def post_save_extended(sessionData: Dict[str, Any] = Body(...)) -> Dict[str, Any
         sessionData["sessionId"] = str(uuid.uuid4())
         sessionData["datum"] = datetime.datetime.utcnow().isoformat()
 
-        scores[spieler]["sessions"].append(sessionData)
-        _save_scores(scores)
+        await run_io(_store_session, spieler, sessionData)
 
-        logging.info(f"[SAVE] Erfolgreich gespeichert für Spieler={spieler}: {sessionData}")
+        annotate(sessionId=sessionData["sessionId"], sessionStatus=sessionData["status"], punkte=sessionData["punkte"])
+        if pii_enabled():
+            annotate(spieler=spieler, sessionData=sessionData)
         return {"status": "ok", "saved": sessionData}
     except Exception as e:
         logging.error("[SAVE] Fehler beim Speichern", exc_info=True)
+        annotate(error=type(e).__name__)
         return {"status": "error", "error": str(e)}
 
 
+# Remote-Speichern mit gemeinsamem Client, Circuit Breaker und Outbox (siehe remote_save.py).
+# Ist der Remote-Dienst gestört, wird direkt lokal über post_save_extended gespeichert.
+REMOTE_SAVER = RemoteSaver(local_save=post_save_extended, run_io=run_io)
+
+
+@router.on_event("startup")
+async def _start_outbox_replay():
+    REMOTE_SAVER.start()
+
+
+@router.on_event("shutdown")
+async def _close_remote_saver():
+    await REMOTE_SAVER.close()
+
+
 @router.post("/saveWithFallback")
-def save_with_fallback(sessionData: Dict[str, Any] = Body(...)) -> Dict[str, Any]:
-    base_url = "https://<dein-render-service>.onrender.com"
-    try:
-        resp = requests.post(f"{base_url}/save", json=sessionData, timeout=5)
-        if resp.ok:
-            return {"status": "ok", "source": "/save", "data": resp.json()}
-        else:
-            raise Exception(f"/save fehlgeschlagen: {resp.status_code} {resp.text}")
-    except Exception:
-        try:
-            resp2 = requests.post(f"{base_url}/postSaveExtended", json=sessionData, timeout=5)
-            if resp2.ok:
-                return {"status": "ok", "source": "/postSaveExtended", "data": resp2.json()}
-            else:
-                return {"status": "error", "source": "/postSaveExtended", "error": resp2.text}
-        except Exception as e2:
-            return {"status": "error", "error": f"Fallback fehlgeschlagen: {str(e2)}"}
+async def save_with_fallback(sessionData: Dict[str, Any] = Body(...)) -> Dict[str, Any]:
+    return await REMOTE_SAVER.save(sessionData)
 
 
 @router.post("/endSession")
-def end_session(spieler: str = Body(...)) -> Dict[str, Any]:
-    scores = _load_scores()
-    if spieler not in scores or not scores[spieler]["sessions"]:
-        return {"status": "error", "message": f"Keine Session für Spieler '{spieler}' gefunden."}
-
-    last_session = scores[spieler]["sessions"][-1]
-    if last_session.get("status") == "laufend":
-        last_session["status"] = "abgeschlossen"
-        last_session["datumEnde"] = datetime.datetime.utcnow().isoformat()
-        _save_scores(scores)
-        return {"status": "ok", "message": "Session abgeschlossen", "session": last_session}
-    else:
-        return {"status": "ok", "message": f"Letzte Session ist bereits '{last_session.get('status')}'.", "session": last_session}
+async def end_session(spieler: str = Body(...)) -> Dict[str, Any]:
+    return await run_io(_end_running_session, spieler, "abgeschlossen")
 
 
 @router.post("/abortSession")
-def abort_session(spieler: str = Body(...)) -> Dict[str, Any]:
-    scores = _load_scores()
-    if spieler not in scores or not scores[spieler]["sessions"]:
-        return {"status": "error", "message": f"Keine Session für Spieler '{spieler}' gefunden."}
-
-    last_session = scores[spieler]["sessions"][-1]
-    if last_session.get("status") == "laufend":
-        last_session["status"] = "abgebrochen"
-        last_session["datumEnde"] = datetime.datetime.utcnow().isoformat()
-        _save_scores(scores)
-        return {"status": "ok", "message": "Session abgebrochen", "session": last_session}
-    else:
-        return {"status": "ok", "message": f"Letzte Session ist bereits '{last_session.get('status')}'.", "session": last_session}
+async def abort_session(spieler: str = Body(...)) -> Dict[str, Any]:
+    return await run_io(_end_running_session, spieler, "abgebrochen")
 
 
 @router.get("/")
-def root():
+async def root():
     return {"status": "ok", "message": "Zahlenpirat Backend läuft 🎉"}
@@ -1,11 +1,22 @@
 # C:\Users\mnold_t1ohvc3\Documents\zahlenpirat-backend\engine.py
-from dataclasses import dataclass, field
+import json
+from dataclasses import dataclass, field, fields
 from typing import Dict, Optional, Tuple
 
-from settings_manager import load_persistent, save_persistent
+from settings_manager import load_persistent_snapshot, save_persistent, update_persistent
+from task_pool import TASK_POOL
+from session_store import SESSION_BACKEND, SessionStore, SqliteSessionStore
+from normalize import (
+    NAME_RE,
+    OPERATOR_DIGITS,
+    canonical_settings,
+    canonical_value,
+    normalize_operator_value,
+    parse_command,
+)
 
 
-@dataclass
+@dataclass(slots=True)
 class SessionState:
     # Merken-Dialog (1/2/3)
     merk_dialog_aktiv: bool = False
@@ -24,115 +35,64 @@ class SessionState:
     # Spielername
     player_name: Optional[str] = None
 
-    # 📊 Session-Statistiken
-    session_stats: Dict[str, int] = field(default_factory=lambda: {
-        "aufgabenGesamt": 0,
-        "aufgabenGeloest": 0,
-        "punkte": 0
-    })
+    # sessionId des laufenden Autosave-Stands (/flow)
+    autosave_id: Optional[str] = None
+
+    # 📊 Session-Statistiken (feste Felder statt eigenem Dict pro Session)
+    aufgaben_gesamt: int = 0
+    aufgaben_geloest: int = 0
+    punkte: int = 0
+
+    @property
+    def session_stats(self) -> Dict[str, int]:
+        """Nur-Lese-Ansicht im bisherigen Format (aufgabenGesamt/aufgabenGeloest/punkte)."""
+        return {
+            "aufgabenGesamt": self.aufgaben_gesamt,
+            "aufgabenGeloest": self.aufgaben_geloest,
+            "punkte": self.punkte,
+        }
 
 
-# In-Memory-Sessionstore
-SESSIONS: Dict[str, SessionState] = {}
+_STATE_FIELDS = tuple(f.name for f in fields(SessionState))
 
 
-def get_state(session_id: str) -> SessionState:
-    if session_id not in SESSIONS:
-        SESSIONS[session_id] = SessionState()
-    return SESSIONS[session_id]
+def _encode_state(state: SessionState) -> str:
+    # Kompakt: Werte in Feldreihenfolge als JSON-Array
+    return json.dumps([getattr(state, n) for n in _STATE_FIELDS], ensure_ascii=False, separators=(",", ":"))
 
 
-# ======================
-# Normalisierungen
-# ======================
+def _decode_state(raw: str) -> Optional[SessionState]:
+    values = json.loads(raw)
+    if len(values) != len(_STATE_FIELDS):
+        return None  # älteres/neueres Format → frische Session
+    return SessionState(**dict(zip(_STATE_FIELDS, values)))
 
-def _normalize_operator_token(tok: str) -> str:
-    t = tok.strip()
-    if not t:
-        return t
-    num_map = {"1": "+", "2": "-", "3": "×", "4": "÷"}
-    if t in num_map:
-        return num_map[t]
-    sym = (
-        t.replace("x", "×").replace("X", "×").replace("*", "×")
-         .replace("/", "÷").replace(":", "÷")
-         .replace("−", "-").replace("–", "-")
-    )
-    return sym if sym in {"+", "-", "×", "÷"} else t
-
-
-def _normalize_operator_value(raw: str) -> str:
-    parts = [p for chunk in raw.split(",") for p in chunk.split() if p]
-    out: list[str] = []
-    for p in parts:
-        n = _normalize_operator_token(p)
-        if n and n in {"+", "-", "×", "÷"} and n not in out:
-            out.append(n)
-    return ",".join(out) if out else raw.strip()
-
-
-def _normalize_schwierigkeit(raw: str) -> str:
-    v = raw.strip().lower()
-    if v in {"1", "leicht"}:
-        return "Leicht"
-    if v in {"2", "mittel"}:
-        return "Mittel"
-    if v in {"3", "schwer"}:
-        return "Schwer"
-    if v in {"4", "extrem", "extrem schwer", "sehr schwer"}:
-        return "Extrem schwer"
-    return raw.strip()
-
-
-def _normalize_modus(raw: str) -> str:
-    v = raw.strip()
-    map_num = {
-        "1": "Prüfung der Zahlen",
-        "2": "Zahlenspiele",
-        "3": "Lernen",
-        "4": "Abenteuer & Extras",
-        "5": "Erinnerung",
-        "6": "Piraten-Minigames",
-    }
-    return map_num.get(v, v)
-
-
-# ======================
-# Parser
-# ======================
 
-def parse_connector(text: str) -> Optional[Tuple[str, str]]:
-    t = text.strip()
-    low = t.lower()
+# Sessionstore: verfällt nach Leerlauf (TTL), begrenzt mit LRU-Verdrängung.
+# ZP_SESSION_BACKEND=sqlite teilt die Sessions zwischen mehreren uvicorn-Workern.
+if SESSION_BACKEND == "sqlite":
+    SESSIONS = SqliteSessionStore(SessionState, _encode_state, _decode_state)
+elif SESSION_BACKEND == "memory":
+    SESSIONS = SessionStore(SessionState)
+else:
+    raise ValueError(f"Unbekanntes Session-Backend: {SESSION_BACKEND!r} (erlaubt: memory, sqlite)")
 
-    if low.startswith("operatoren:"):
-        v = t.split(":", 1)[1].strip()
-        v = _normalize_operator_value(v)
-        return ("Operatoren", v)
 
-    if low.startswith("modus:"):
-        v = t.split(":", 1)[1].strip()
-        v = _normalize_modus(v)
-        return ("Modus", v)
+def get_state(session_id: str) -> SessionState:
+    return SESSIONS.get_or_create(session_id)
 
-    if low.startswith("klasse:"):
-        v = t.split(":", 1)[1].strip()
-        return ("Klasse", v)
 
-    if low.startswith("schwierigkeit:"):
-        v = t.split(":", 1)[1].strip()
-        v = _normalize_schwierigkeit(v)
-        return ("Schwierigkeit", v)
+def save_state(session_id: str, state: SessionState) -> None:
+    """Nach Änderungen aufrufen, damit andere Worker den Stand sehen."""
+    SESSIONS.save(session_id, state)
 
-    if low.startswith("zahlenauswahl:"):
-        v = t.split(":", 1)[1].strip()
-        return ("Zahlenauswahl", v)
 
-    if low.startswith("name:"):
-        v = t.split(":", 1)[1].strip()
-        return ("Name", v)
+# ======================
+# Parser
+# ======================
 
-    return None
+def parse_connector(text: str) -> Optional[Tuple[str, str]]:
+    return parse_command(text)
 
 
 def build_params_with_priority(
@@ -159,26 +119,16 @@ def build_params_with_priority(
 
 def get_effective_settings(session_id: str) -> Dict[str, Dict[str, str]]:
     state = get_state(session_id)
-    persistent = load_persistent()
-
-    def _canon(d: Dict[str, str]) -> Dict[str, str]:
-        out = dict(d)
-        if "Operatoren" in out:
-            out["Operatoren"] = _normalize_operator_value(out["Operatoren"])
-        if "Schwierigkeit" in out:
-            out["Schwierigkeit"] = _normalize_schwierigkeit(out["Schwierigkeit"])
-        if "Modus" in out:
-            out["Modus"] = _normalize_modus(out["Modus"])
-        return out
+    persistent = load_persistent_snapshot()
 
     eff_raw = build_params_with_priority(
         explicit=None,
         session=state.session_standards,
         persistent=persistent,
     )
-    effective = _canon(eff_raw)
-    session_norm = _canon(state.session_standards)
-    persistent_norm = _canon(persistent)
+    effective = canonical_settings(eff_raw)
+    session_norm = canonical_settings(state.session_standards)
+    persistent_norm = canonical_settings(persistent)
 
     return {
         "effective": effective,
@@ -187,10 +137,9 @@ def get_effective_settings(session_id: str) -> Dict[str, Dict[str, str]]:
     }
 
 def format_session_summary(state: SessionState) -> str:
-    stats = state.session_stats
-    richtig = stats.get("aufgabenGeloest", 0)
-    gesamt = stats.get("aufgabenGesamt", 0)
-    punkte = stats.get("punkte", 0)
+    richtig = state.aufgaben_geloest
+    gesamt = state.aufgaben_gesamt
+    punkte = state.punkte
 
     if gesamt == 0:
         return f"📜 Noch keine Ergebnisse für {state.player_name or 'Anonymer Matrose'}."
@@ -216,7 +165,7 @@ def format_session_summary(state: SessionState) -> str:
 
 def format_confirmation_and_menu(key: str, value: str) -> str:
     if key == "Operatoren":
-        value = _normalize_operator_value(value)
+        value = normalize_operator_value(value)
 
     friendly = None
     if key == "Operatoren":
@@ -278,15 +227,27 @@ def _is_numeric_answer(s: str) -> bool:
 # Neue Aufgabe generieren
 # ======================
 
-def _generate_task(state) -> str:
-    import random
-    a, b = random.randint(1, 10), random.randint(1, 10)
-    result = a + b
+def _generate_task(state, persistent: Optional[Dict[str, str]] = None) -> str:
+    # Operatoren/Klasse/Schwierigkeit/Zahlenauswahl: Session vor Persistent.
+    # Ohne Klasse und Zahlenauswahl bleibt es beim bisherigen Bereich 1..10 (nur "+").
+    params = build_params_with_priority(None, state.session_standards, persistent or {})
+    zahlenauswahl = params.get("Zahlenauswahl")
+    if not zahlenauswahl and not params.get("Klasse"):
+        zahlenauswahl = "1-10"
+    batch = TASK_POOL.draw(
+        1,
+        params.get("Operatoren") or "+",
+        klasse=params.get("Klasse"),
+        schwierigkeit=params.get("Schwierigkeit"),
+        zahlenauswahl=zahlenauswahl,
+    )
+    if not len(batch):
+        batch = TASK_POOL.draw(1, "+", zahlenauswahl="1-10")
 
     state.in_aufgabe = True
-    state.expected_answer = str(result)
+    state.expected_answer = str(batch.loesung[0])
 
-    return f"{a} + {b} = ?"
+    return batch.frage(0, " = ?")
 
 
 # ======================
@@ -295,7 +256,14 @@ def _generate_task(state) -> str:
 
 def handle_user_input(session_id: str, text: str) -> str:
     state = get_state(session_id)
-    persistent = load_persistent()
+    try:
+        return _handle_user_input(state, text)
+    finally:
+        save_state(session_id, state)
+
+
+def _handle_user_input(state: SessionState, text: str) -> str:
+    persistent = load_persistent_snapshot()
     t_raw = text or ""
     t = t_raw.strip()
 
@@ -318,14 +286,7 @@ def handle_user_input(session_id: str, text: str) -> str:
             if not key or value is None:
                 return "🔓 Abgebrochen."
 
-            if key == "Operatoren":
-                value = _normalize_operator_value(value)
-            elif key == "Schwierigkeit":
-                value = _normalize_schwierigkeit(value)
-            elif key == "Modus":
-                value = _normalize_modus(value)
-            elif key == "Name":
-                value = value.strip()
+            value = canonical_value(key, value)
 
             if choice == "1":
                 if key == "Name":
@@ -337,8 +298,7 @@ def handle_user_input(session_id: str, text: str) -> str:
                 else:
                     state.session_standards[key] = value
                 return "🗂️ Gemerkt für diese Sitzung."
-            persistent[key] = value
-            save_persistent(persistent)
+            update_persistent(lambda current: current.__setitem__(key, value))
             return "📌 Standard gespeichert."
         return "👉 Antworte mit „1“, „2“ oder „3“."
 
@@ -354,18 +314,18 @@ def handle_user_input(session_id: str, text: str) -> str:
         state.in_aufgabe = False
         state.expected_answer = None
 
-        state.session_stats["aufgabenGesamt"] += 1
+        state.aufgaben_gesamt += 1
         if given == exp:
-            state.session_stats["aufgabenGeloest"] += 1
-            state.session_stats["punkte"] += 10
+            state.aufgaben_geloest += 1
+            state.punkte += 10
             feedback = f"✅ Richtig, aye! ⚓\nDie Lösung ist {exp}."
         else:
             feedback = f"❌ Leider falsch. Erwartet war: {exp}"
 
-        if state.session_stats["aufgabenGesamt"] >= 10:
-            richtig = state.session_stats["aufgabenGeloest"]
-            falsch = state.session_stats["aufgabenGesamt"] - richtig
-            punkte = state.session_stats["punkte"]
+        if state.aufgaben_gesamt >= 10:
+            richtig = state.aufgaben_geloest
+            falsch = state.aufgaben_gesamt - richtig
+            punkte = state.punkte
 
             note = "1 (Sehr gut)" if richtig == 10 else \
                    "2 (Gut)" if richtig >= 8 else \
@@ -388,13 +348,12 @@ def handle_user_input(session_id: str, text: str) -> str:
                 "3️⃣ Zurück zum Start"
             )
 
-        return f"{feedback}\n\n⚔️ Nächste Aufgabe: {_generate_task(state)}"
+        return f"{feedback}\n\n⚔️ Nächste Aufgabe: {_generate_task(state, persistent)}"
 
     # Namensdialog
     if state.name_dialog_aktiv:
         candidate = t.strip()
-        import re
-        if not re.fullmatch(r"[A-Za-zÄÖÜäöüß\- ]{1,20}", candidate):
+        if not NAME_RE.fullmatch(candidate):
             return "Bitte gib nur deinen Namen ein (max. 20 Zeichen)."
         state.name_dialog_aktiv = False
         state.merk_dialog_aktiv = True
@@ -407,10 +366,9 @@ def handle_user_input(session_id: str, text: str) -> str:
         digits = [ch for ch in t if ch in "1234"]
         if not digits:
             return "Bitte antworte mit Ziffern 1..4."
-        mapping = {"1": "+", "2": "-", "3": "×", "4": "÷"}
         ops = []
         for d in digits:
-            sym = mapping[d]
+            sym = OPERATOR_DIGITS[d]
             if sym not in ops:
                 ops.append(sym)
         value = ",".join(ops)
@@ -453,7 +411,7 @@ def handle_user_input(session_id: str, text: str) -> str:
 
     if low in {"ahoi", "start"}:
         summary = format_session_summary(state)
-        return f"{summary}\n\n⚔️ Erste Aufgabe: {_generate_task(state)}"
+        return f"{summary}\n\n⚔️ Erste Aufgabe: {_generate_task(state, persistent)}"
 
 
     # Default → Einstellungen anzeigen
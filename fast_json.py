@@ -0,0 +1,34 @@
+# C:\Users\mnold_t1ohvc3\Documents\zahlenpirat-backend\fast_json.py
+"""
+Schnelle JSON-Antworten für die großen Listen-Endpunkte (/tasks, /load, /leaderboard, /getHistory).
+
+FastAPI schickt jeden Rückgabewert erst durch `jsonable_encoder` (rekursive Kopie, im Profil der
+größte Posten bei 10 000 Aufgaben) und dann durch json.dumps. Wer `FastJSONResponse(...)` direkt
+zurückgibt, überspringt den Encoder; serialisiert wird mit orjson, falls installiert, sonst mit
+der Standardbibliothek (gleiche Ausgabe wie JSONResponse). Der Inhalt muss dafür schon aus
+einfachen Typen bestehen (dict/list/str/int/float/bool/None).
+"""
+import json
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson  # optional: pip install orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+
+def dumps(obj: Any) -> bytes:
+    """Kompaktes UTF-8-JSON als Bytes."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            pass  # z. B. Ganzzahlen über 64 Bit → Standardbibliothek
+    return json.dumps(obj, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,41 @@
+# C:\Users\mnold_t1ohvc3\Documents\zahlenpirat-backend\io_executor.py
+"""
+Kleiner, eigener Thread-Pool für blockierende Datei-/SQLite-Zugriffe aus async-Handlern.
+
+Die Routen sind `async def` und laufen damit nicht mehr im anyio-Threadpool (Standard: 40 Threads);
+nur die eigentliche I/O wandert per `await run_io(fn, ...)` hierher. Langsame oder wartende
+Anfragen belegen so keine Threads mehr.
+"""
+import asyncio, functools, os, threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional, TypeVar
+
+T = TypeVar("T")
+
+IO_THREADS = int(os.getenv("ZP_IO_THREADS", "8"))
+
+_executor: Optional[ThreadPoolExecutor] = None
+_guard = threading.Lock()
+
+
+def get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _guard:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=IO_THREADS, thread_name_prefix="zp-io")
+    return _executor
+
+
+async def run_io(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """`fn(*args, **kwargs)` im I/O-Pool ausführen, ohne die Event-Loop zu blockieren."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(), functools.partial(fn, *args, **kwargs))
+
+
+def shutdown_io() -> None:
+    global _executor
+    with _guard:
+        ex, _executor = _executor, None
+    if ex is not None:
+        ex.shutdown(wait=True)
@@ -0,0 +1,197 @@
+# C:\Users\mnold_t1ohvc3\Documents\zahlenpirat-backend\json_files.py
+"""
+Gemeinsame Persistenz-Helfer für alle JSON-Dateien (scores.json, data/scores.json, data/settings.json).
+
+- atomic_write_json: erst in eine Temp-Datei im selben Ordner, dann os.replace → nie halbe Dateien
+- file_lock: genau ein Schreiber pro Datei (Thread-Lock + flock auf <datei>.lock, falls verfügbar)
+- update_json: Lesen-Ändern-Schreiben als eine serialisierte Mutation
+- STORE_JSON: Format der Score-Dateien – kompakt (Standard), eingerückt nur für Exporte
+  (PRETTY_JSON) oder mit ZP_JSON_PRETTY=1
+"""
+import json, os, tempfile, threading, logging
+from contextlib import contextmanager, nullcontext
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional
+
+try:
+    import fcntl  # nur POSIX; unter Windows reicht der Thread-Lock (ein Worker)
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+log = logging.getLogger(__name__)
+
+# json.dump-Optionen: kompakt spart etwa die Hälfte an Größe und Schreibzeit gegenüber indent=2
+COMPACT_JSON: Dict[str, Any] = {"ensure_ascii": False, "separators": (",", ":")}
+PRETTY_JSON: Dict[str, Any] = {"ensure_ascii": False, "indent": 2}
+STORE_JSON = PRETTY_JSON if os.getenv("ZP_JSON_PRETTY", "0") == "1" else COMPACT_JSON
+
+def _read_umask() -> int:
+    mask = os.umask(0)
+    os.umask(mask)
+    return mask
+
+
+# Einmal beim Import gelesen: os.umask() setzt den Wert prozessweit und ist nicht threadsicher
+_UMASK = _read_umask()
+
+_locks: Dict[str, threading.RLock] = {}
+_locks_guard = threading.Lock()
+_held = threading.local()
+
+
+class CorruptJsonFile(ValueError):
+    """Die Datei existiert, ist aber kein gültiges JSON – sie wird dann NICHT überschrieben."""
+
+
+def _key(path: str) -> str:
+    return os.path.abspath(path)
+
+
+def _thread_lock(path: str) -> threading.RLock:
+    key = _key(path)
+    lock = _locks.get(key)
+    if lock is None:
+        with _locks_guard:
+            lock = _locks.setdefault(key, threading.RLock())
+    return lock
+
+
+@contextmanager
+def file_lock(path: str) -> Iterator[None]:
+    """Exklusiver Schreibzugriff auf `path` – im Prozess und (POSIX) über Prozesse hinweg."""
+    key = _key(path)
+    lock = _thread_lock(path)
+    with lock:
+        depth = getattr(_held, key, 0)
+        if fcntl is None or depth:
+            setattr(_held, key, depth + 1)
+            try:
+                yield
+            finally:
+                setattr(_held, key, depth)
+            return
+        d = os.path.dirname(key)
+        os.makedirs(d, exist_ok=True)
+        with open(key + ".lock", "a") as lf:
+            fcntl.flock(lf.fileno(), fcntl.LOCK_EX)
+            setattr(_held, key, 1)
+            try:
+                yield
+            finally:
+                setattr(_held, key, 0)
+                fcntl.flock(lf.fileno(), fcntl.LOCK_UN)
+
+
+def read_json(path: str, default: Any = None, strict: bool = False) -> Any:
+    """
+    JSON lesen. Fehlt die Datei → `default`. Ist sie kaputt → bei strict=True CorruptJsonFile,
+    sonst Warnung + `default` (nur für reine Leser!).
+    """
+    if not os.path.exists(path):
+        return default
+    with open(path, "r", encoding="utf-8") as f:
+        try:
+            return json.load(f)
+        except json.JSONDecodeError as e:
+            if strict:
+                raise CorruptJsonFile(f"{path} ist kein gültiges JSON: {e}") from e
+            log.warning("%s ist kein gültiges JSON – verwende Standardwert", path)
+            return default
+
+
+def atomic_write_json(path: str, data: Any, **dump_kwargs: Any) -> None:
+    """Schreibt `data` crash-sicher nach `path` (Temp-Datei + fsync + os.replace)."""
+    # Ein dumps + ein write: schneller als json.dump, das in vielen kleinen Stücken schreibt
+    _atomic_write(path, lambda f: f.write(json.dumps(data, **dump_kwargs)))
+
+
+def atomic_write_text(path: str, text: str) -> None:
+    """Wie atomic_write_json, für fertigen Text (z. B. JSONL-Dateien)."""
+    _atomic_write(path, lambda f: f.write(text))
+
+
+def atomic_write_json_list(path: str, items: Iterable[Any]) -> int:
+    """
+    JSON-Liste Eintrag für Eintrag schreiben (eine Zeile pro Eintrag) – `items` darf ein Generator
+    sein, die Liste muss nie als Ganzes im Speicher stehen. Liefert die Anzahl Einträge.
+    """
+    count = 0
+
+    def _write(f):
+        nonlocal count
+        f.write("[")
+        for item in items:
+            f.write(",\n" if count else "\n")
+            f.write(json.dumps(item, ensure_ascii=False, separators=(",", ":")))
+            count += 1
+        f.write("\n]\n" if count else "]\n")
+
+    _atomic_write(path, _write)
+    return count
+
+
+def atomic_write_bytes(path: str, data: bytes, lock: bool = True) -> None:
+    """
+    Wie atomic_write_json, für Binärdaten (z. B. PDF). lock=False, wenn der Dateiname den Inhalt
+    schon eindeutig bestimmt – dann ist jeder Schreiber gleich gut und es bleibt keine .lock-Datei liegen.
+    """
+    _atomic_write(path, lambda f: f.write(data), binary=True, lock=lock)
+
+
+def _atomic_write(path: str, write: Callable[[Any], Any], binary: bool = False, lock: bool = True) -> None:
+    d = os.path.dirname(os.path.abspath(path))
+    os.makedirs(d, exist_ok=True)
+    with (file_lock(path) if lock else nullcontext()):
+        fd, tmp = tempfile.mkstemp(prefix=os.path.basename(path) + ".", suffix=".tmp", dir=d)
+        try:
+            os.chmod(tmp, _file_mode(path))  # mkstemp legt 0600 an
+            with (os.fdopen(fd, "wb") if binary else os.fdopen(fd, "w", encoding="utf-8")) as f:
+                write(f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, path)
+        except BaseException:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            raise
+        _fsync_dir(d)
+
+
+def _file_mode(path: str) -> int:
+    """Rechte der ersetzten Datei übernehmen; neue Dateien wie open() (0666 minus umask)."""
+    try:
+        return os.stat(path).st_mode & 0o7777
+    except FileNotFoundError:
+        return 0o666 & ~_UMASK
+
+
+def _fsync_dir(d: str) -> None:
+    if not hasattr(os, "O_DIRECTORY"):
+        return  # Windows: Verzeichnis-fsync gibt es nicht
+    fd = os.open(d, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def update_json(
+    path: str,
+    mutate: Callable[[Any], Optional[Any]],
+    default_factory: Callable[[], Any] = dict,
+    **dump_kwargs: Any,
+) -> Any:
+    """
+    Lesen-Ändern-Schreiben unter dem Datei-Lock. `mutate` bekommt den aktuellen Inhalt und
+    ändert ihn in-place oder gibt einen neuen Wert zurück. Liefert den geschriebenen Wert.
+    """
+    with file_lock(path):
+        data = read_json(path, None, strict=True)
+        if data is None:
+            data = default_factory()
+        result = mutate(data)
+        if result is not None:
+            data = result
+        atomic_write_json(path, data, **dump_kwargs)
+        return data
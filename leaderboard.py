@@ -0,0 +1,194 @@
+# C:\Users\mnold_t1ohvc3\Documents\zahlenpirat-backend\leaderboard.py
+import bisect, heapq, itertools, os, threading, time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+# Einträge pro (modus, klasse)-Topf; größere Limits gehen direkt an das Speicher-Backend
+LEADERBOARD_CAP = int(os.getenv("ZP_LEADERBOARD_CAP", "1000"))
+# Höchstens so oft wird geprüft, ob ein anderer Worker Scores gespeichert hat
+LEADERBOARD_RECHECK_SEK = float(os.getenv("ZP_LEADERBOARD_RECHECK_SEK", "1.0"))
+
+Bucket = Tuple[Any, Any]          # (modus, klasse)
+Key = Tuple[int, int]             # (-punkte, laufende Nummer) → aufsteigend sortiert = Rangfolge
+
+
+def _punkte(entry: Dict[str, Any]) -> int:
+    try:
+        return int(entry.get("punkte") or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+def _player_key(entry: Dict[str, Any]) -> Optional[str]:
+    s = entry.get("spieler")
+    return s.lower() if isinstance(s, str) else None
+
+
+class LeaderboardIndex:
+    """
+    Inkrementell gepflegte Rangliste je (modus, klasse).
+
+    - `top()` liefert die besten Einzel-Scores (wie /leaderboard bisher, aber begrenzt)
+    - `best_per_player()` liefert den Bestwert je Spieler samt letztem Stand (wie server.js)
+
+    Lesen kostet O(limit · log Töpfe), Schreiben O(log n) + Einfügen in eine sortierte Liste.
+    Der Index wird beim ersten Zugriff aus dem Speicher-Backend aufgebaut. Mit `version` (siehe
+    ScoreStore.scores_version) prüfen Abfragen höchstens alle `recheck_sek` Sekunden, ob sich der
+    Stand geändert hat, ohne dass es über `add` lief (anderer Worker) – dann wird neu aufgebaut.
+    """
+
+    def __init__(self, load_all: Callable[[], Iterable[Dict[str, Any]]], cap: int = LEADERBOARD_CAP,
+                 version: Optional[Callable[[], Any]] = None, recheck_sek: float = LEADERBOARD_RECHECK_SEK):
+        self._load_all = load_all
+        self.cap = cap
+        self._version_fn = version
+        self.recheck_sek = recheck_sek
+        self._version: Any = None
+        self._checked = 0.0
+        self.rebuilds = 0
+        self.lock = threading.RLock()
+        self._built = False
+        self._seq = itertools.count()
+        # Topf → sortierte Schlüssel + Einträge (gleiche Reihenfolge)
+        self._keys: Dict[Bucket, List[Key]] = {}
+        self._entries: Dict[Bucket, List[Dict[str, Any]]] = {}
+        # Topf → Spieler → (Schlüssel, Eintrag) ihres Bestwerts; dazu sortierte Bestwert-Liste
+        self._best: Dict[Bucket, Dict[str, Tuple[Key, Dict[str, Any]]]] = {}
+        self._best_keys: Dict[Bucket, List[Tuple[Key, str, Dict[str, Any]]]] = {}
+        # Spieler → letzter gespeicherter Eintrag (topfübergreifend)
+        self._last: Dict[str, Dict[str, Any]] = {}
+        self._truncated: Dict[Bucket, bool] = {}
+
+    # ------------------------------------------------------------------
+    # Aufbau / Pflege
+    # ------------------------------------------------------------------
+    def _ensure_built(self) -> None:
+        if self._built:
+            if self._changed():
+                self.rebuild()
+            return
+        with self.lock:
+            if self._built:
+                return
+            # Stand vor dem Laden merken: was währenddessen dazukommt, löst den nächsten Neuaufbau aus
+            self._version = self._read_version()
+            for entry in self._load_all():
+                if isinstance(entry, dict):
+                    self._insert(entry)
+            self._built = True
+
+    def rebuild(self) -> None:
+        with self.lock:
+            self._keys.clear()
+            self._entries.clear()
+            self._best.clear()
+            self._best_keys.clear()
+            self._last.clear()
+            self._truncated.clear()
+            self._built = False
+            self.rebuilds += 1
+            self._ensure_built()
+
+    def _read_version(self) -> Any:
+        self._checked = time.monotonic()
+        return self._version_fn() if self._version_fn is not None else None
+
+    def _changed(self) -> bool:
+        if self._version_fn is None or time.monotonic() - self._checked < self.recheck_sek:
+            return False
+        with self.lock:
+            return self._read_version() != self._version
+
+    def add(self, entry: Dict[str, Any], before: Any = None, after: Any = None) -> None:
+        """
+        Nach dem Speichern eines Scores aufrufen (am besten unter `lock`, siehe main.append_score).
+        `before`/`after` = Store-Version vor und nach dem eigenen Schreiben: Stand `before` noch dem
+        Index, ist er mit dem Eintrag wieder aktuell; sonst hat ein anderer Worker geschrieben.
+        """
+        with self.lock:
+            if self._built:
+                self._insert(entry)
+                if before is not None and before == self._version:
+                    self._version = after
+
+    def _insert(self, entry: Dict[str, Any]) -> None:
+        bucket: Bucket = (entry.get("modus"), entry.get("klasse"))
+        key: Key = (-_punkte(entry), next(self._seq))
+
+        keys = self._keys.setdefault(bucket, [])
+        entries = self._entries.setdefault(bucket, [])
+        i = bisect.bisect_left(keys, key)
+        if i < self.cap:
+            keys.insert(i, key)
+            entries.insert(i, entry)
+            if len(keys) > self.cap:
+                keys.pop()
+                entries.pop()
+                self._truncated[bucket] = True
+        else:
+            self._truncated[bucket] = True
+
+        player = _player_key(entry)
+        if player is None:
+            return
+        self._last[player] = entry
+        best = self._best.setdefault(bucket, {})
+        best_keys = self._best_keys.setdefault(bucket, [])
+        old = best.get(player)
+        if old is not None:
+            if old[0][0] <= key[0]:
+                return  # bisheriger Bestwert ist mindestens gleich gut
+            del best_keys[bisect.bisect_left(best_keys, (old[0],))]
+        best[player] = (key, entry)
+        # Schlüssel sind eindeutig → der Eintrag selbst wird nie verglichen
+        bisect.insort(best_keys, (key, player, entry))
+
+    # ------------------------------------------------------------------
+    # Abfragen
+    # ------------------------------------------------------------------
+    def _buckets(self, modus: Optional[str], klasse: Optional[int]) -> List[Bucket]:
+        return [
+            b for b in self._keys
+            if (modus is None or b[0] == modus) and (klasse is None or b[1] == klasse)
+        ]
+
+    def covers(self, limit: int, modus: Optional[str] = None, klasse: Optional[int] = None) -> bool:
+        """True, wenn `limit` Einträge vollständig aus dem Index beantwortet werden können."""
+        self._ensure_built()
+        if limit <= self.cap:
+            return True
+        with self.lock:
+            return not any(self._truncated.get(b) for b in self._buckets(modus, klasse))
+
+    def top(self, limit: int, modus: Optional[str] = None, klasse: Optional[int] = None) -> List[Dict[str, Any]]:
+        self._ensure_built()
+        with self.lock:
+            buckets = self._buckets(modus, klasse)
+            if len(buckets) == 1:
+                picked = self._entries[buckets[0]][:limit]
+            else:
+                merged = heapq.merge(*(zip(self._keys[b], self._entries[b]) for b in buckets),
+                                     key=lambda ke: ke[0])
+                picked = [e for _, e in itertools.islice(merged, limit)]
+        return [dict(e, rang=i) for i, e in enumerate(picked, start=1)]
+
+    def best_per_player(self, limit: int, modus: Optional[str] = None,
+                        klasse: Optional[int] = None) -> List[Dict[str, Any]]:
+        self._ensure_built()
+        with self.lock:
+            buckets = self._buckets(modus, klasse)
+            merged = heapq.merge(*(self._best_keys.get(b, ()) for b in buckets), key=lambda t: t[0])
+            out: List[Dict[str, Any]] = []
+            seen = set()
+            for key, player, entry in merged:
+                if player in seen:
+                    continue  # Spieler hat in einem anderen Topf bereits einen besseren Wert
+                seen.add(player)
+                out.append({
+                    "spieler": entry.get("spieler"),
+                    "punkte": -key[0],
+                    "letzterStand": self._last.get(player),
+                    "rang": len(out) + 1,
+                })
+                if len(out) >= limit:
+                    break
+        return out
@@ -1,9 +1,25 @@
-from fastapi import FastAPI, Query
+from fastapi import FastAPI, Header, HTTPException, Query
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import List, Optional, Union
 import random, json, os
 from datetime import datetime
-from connector_routes import router as connector_router
+from connector_routes import router as connector_router, REMOTE_SAVER
+from score_store import SCORES_FILE, get_store, close_store
+from leaderboard import LeaderboardIndex
+from task_generator import generate_batch
+from task_pool import TASK_POOL, DEFAULT_PREFILL
+from engine import SESSIONS
+from quiz_sessions import QUIZ_SESSIONS, TASK_ID_PREFIX, QuizSession, grade, lookup, result_json, score_entry, start_session, zeit_abgelaufen
+from io_executor import run_io, shutdown_io
+from paging import ndjson_response, page, tail_page, wants_ndjson
+from result_export import cached_pdf, iter_result_json, pdf_bytes, report_meta
+from player_stats import PLAYER_STATS
+from access_log import ACCESS_LOG, AccessLogMiddleware
+from profiling import ProfilingMiddleware, list_profiles, read_profile, token_ok
+from fast_json import FastJSONResponse
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, REGISTRY, MetricsMiddleware
+import settings_manager
 scores_memory = []
 
 # ⬇️ NEU: CORS Middleware einfügen
@@ -20,21 +36,71 @@ app.add_middleware(
 )
 # ⬆️ BIS HIER
 
+# Eine JSONL-Zeile pro Anfrage (data/logs/requests.jsonl), geschrieben im Hintergrund
+app.add_middleware(AccessLogMiddleware)
+# Profil einzelner Anfragen auf Zuruf (X-Profile/?profile= mit ZP_PROFILE_TOKEN, ZP_PROFILE_SAMPLE) → /admin/profiles
+app.add_middleware(ProfilingMiddleware)
+# Latenz + Status je Route für GET /metrics (als äußerste Schicht, misst auch CORS-Antworten)
+app.add_middleware(MetricsMiddleware)
+
 app.include_router(connector_router)
 
 
-DB_FILE = "scores.json"
+DB_FILE = SCORES_FILE
 
-# Hilfsfunktionen für Scores
-def load_scores():
-    if not os.path.exists(DB_FILE):
-        return []
-    with open(DB_FILE, "r") as f:
-        return json.load(f)
+# Obergrenze für Aufgaben pro Anfrage (Arbeitsblätter / Exporte)
+MAX_TASKS = 10000
 
-def save_scores(scores):
-    with open(DB_FILE, "w") as f:
-        json.dump(scores, f, indent=2)
+# Hilfsfunktionen für Scores (Backend über ZP_SCORES_STORAGE, siehe score_store.py)
+def load_scores():
+    return get_store().all_scores()
+
+def append_score(entry):
+    # Unter den Index-Locks, damit ein gleichzeitiger Erstaufbau den Eintrag nicht doppelt zählt
+    with _leaderboard.lock, PLAYER_STATS.lock:
+        store = get_store()
+        before = store.scores_version()
+        store.add_score(entry)
+        _leaderboard.add(entry, before, store.scores_version())
+        PLAYER_STATS.add_score(entry)
+
+async def append_score_async(entry):
+    await run_io(append_score, entry)
+
+
+# Rangliste je (modus, klasse), wird bei jedem Speichern mitgeführt
+_leaderboard = LeaderboardIndex(load_scores, version=lambda: get_store().scores_version())
+
+
+# Zustandswerte für GET /metrics – werden erst beim Abruf gelesen
+REGISTRY.add_stats("zp_task_pool", TASK_POOL.stats, counters=("hits", "misses", "evictions", "refills"),
+                   gauges=("pools", "aufgaben"))
+REGISTRY.add_stats("zp_sessions", SESSIONS.stats, counters=("created", "evicted_ttl", "evicted_lru"),
+                   gauges=("live",), store="flow")
+REGISTRY.add_stats("zp_sessions", QUIZ_SESSIONS.stats, counters=("created", "evicted_ttl", "evicted_lru"),
+                   gauges=("live",), store="quiz")
+REGISTRY.add_stats("zp_settings_cache", lambda: {"hits": settings_manager.cache_hits,
+                                                 "misses": settings_manager.cache_misses},
+                   counters=("hits", "misses"))
+REGISTRY.add_stats("zp_remote_save", REMOTE_SAVER.stats, counters=("replayed", "rejected"), gauges=("failures", "outbox"))
+REGISTRY.add_stats("zp_player_stats", PLAYER_STATS.stats, gauges=("players",))
+REGISTRY.add_stats("zp_access_log", ACCESS_LOG.stats, counters=("written", "dropped", "rotations"), gauges=("queued",))
+
+
+@app.on_event("startup")
+def _prefill_task_pools():
+    TASK_POOL.prefill(DEFAULT_PREFILL)
+
+
+@app.on_event("shutdown")
+def _close_store():
+    TASK_POOL.stop()
+    SESSIONS.stop()
+    QUIZ_SESSIONS.stop()
+    PLAYER_STATS.close()
+    ACCESS_LOG.close()
+    close_store()
+    shutdown_io()
 
 # -----------------------------
 # Modelle
@@ -48,15 +114,38 @@ class Task(BaseModel):
 class TaskRequest(BaseModel):
     operatoren: List[str]
     limit: int = 10
+    klasse: Optional[int] = None
+    schwierigkeit: Optional[str] = None
+    zahlenauswahl: Optional[str] = None
+    seed: Optional[int] = None
 
 class AnswerRequest(BaseModel):
     sessionId: str
     taskId: str
-    antwort: str
-    dauerSek: int
-    korrekteLoesung: str
-    spieler: str
-    operator: str
+    antwort: Optional[str] = None
+    dauerSek: int = 0
+    # Nur für Tests ohne /test/start – sonst kommt die Lösung aus der Session
+    korrekteLoesung: Optional[str] = None
+    spieler: Optional[str] = None
+    operator: Optional[str] = None
+
+class BatchAnswer(BaseModel):
+    taskId: str
+    antwort: Optional[str] = None
+    dauerSek: Optional[float] = None
+    korrekteLoesung: Optional[str] = None
+    frage: Optional[str] = None
+    operator: Optional[str] = None
+
+class AnswerBatchRequest(BaseModel):
+    sessionId: str
+    spieler: Optional[str] = None
+    klasse: Optional[int] = None
+    modus: Optional[str] = "Test"
+    schwierigkeit: Optional[str] = None
+    zahlenauswahl: Optional[str] = None
+    antworten: List[BatchAnswer]
+    abschliessen: bool = True   # False → nur ein Teil des Tests, gespeichert wird beim letzten Teil
 
 from typing import Optional, List
 from pydantic import BaseModel
@@ -80,6 +169,13 @@ class StartRequest(BaseModel):
     modus: Optional[str] = "Test"
     timerSek: Optional[int] = 300   # Standard: 5 Minuten
     anzahlAufgaben: Optional[int] = 10
+    klasse: Optional[int] = None
+    schwierigkeit: Optional[str] = None
+    zahlenauswahl: Optional[str] = None
+    operatoren: Optional[List[str]] = None
+    kategorie: Optional[int] = None
+    spieler: Optional[Union[str, List[str]]] = None
+    seed: Optional[int] = None
 
 # -----------------------------
 # Endpoints
@@ -87,144 +183,253 @@ class StartRequest(BaseModel):
 
 # Healthcheck
 @app.get("/health")
-def health():
-    return {"status": "ok"}
-
-# Spiel starten
-@app.post("/test/start")
-def start_test(req: StartRequest):
-    return {
-        "sessionId": "s1",   # später evtl. UUID verwenden
-        "modus": req.modus,
-        "timerSek": req.timerSek,
-        "anzahlAufgaben": req.anzahlAufgaben
-    }
+async def health():
+    # SESSIONS.stats() fragt beim SQLite-Backend die Datenbank ab
+    sessions = await run_io(SESSIONS.stats)
+    remote = await run_io(REMOTE_SAVER.stats)
+    return {"status": "ok", "sessions": sessions, "quizSessions": QUIZ_SESSIONS.stats(),
+            "taskPool": TASK_POOL.stats(), "remoteSave": remote, "playerStats": PLAYER_STATS.stats(),
+            "accessLog": ACCESS_LOG.stats()}
+
+# Kennzahlen im Prometheus-Textformat (Latenzen, Speicherzugriffe, Pools, Caches)
+@app.get("/metrics")
+async def metrics():
+    # Collector fragen u. a. die SQLite-Sessions ab → I/O-Pool
+    body = await run_io(REGISTRY.render)
+    return PlainTextResponse(body, media_type=METRICS_CONTENT_TYPE)
+
+# Gespeicherte Anfrage-Profile (neueste zuerst) und einzelnes Profil als collapsed stacks
+@app.get("/admin/profiles")
+async def get_profiles(x_profile_token: Optional[str] = Header(None)):
+    if not token_ok(x_profile_token):
+        raise HTTPException(status_code=403, detail="Forbidden")
+    return {"profiles": await run_io(list_profiles)}
+
+@app.get("/admin/profiles/{profile_id}")
+async def get_profile(profile_id: str, x_profile_token: Optional[str] = Header(None)):
+    if not token_ok(x_profile_token):
+        raise HTTPException(status_code=403, detail="Forbidden")
+    folded = await run_io(read_profile, profile_id)
+    if folded is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return PlainTextResponse(folded)
+
+def _draw_tasks(count, operatoren, klasse, schwierigkeit, zahlenauswahl, seed):
+    # Mit seed reproduzierbar frisch erzeugen, sonst fertige Aufgaben aus dem Pool nehmen
+    if seed is not None:
+        return generate_batch(count, operatoren, klasse=klasse, schwierigkeit=schwierigkeit,
+                              zahlenauswahl=zahlenauswahl, seed=seed)
+    return TASK_POOL.draw(count, operatoren, klasse=klasse, schwierigkeit=schwierigkeit,
+                          zahlenauswahl=zahlenauswahl)
+
+
+async def _draw_tasks_async(count, operatoren, klasse, schwierigkeit, zahlenauswahl, seed):
+    # Pool-Treffer sind O(1) → direkt; große oder reproduzierbare Stapel im I/O-Pool erzeugen
+    if seed is None and count <= TASK_POOL.pool_size:
+        return _draw_tasks(count, operatoren, klasse, schwierigkeit, zahlenauswahl, seed)
+    return await run_io(_draw_tasks, count, operatoren, klasse, schwierigkeit, zahlenauswahl, seed)
 
 
     # Aufgaben erzeugen (GET-Variante für Frontend-Kompatibilität)
 @app.get("/tasks")
-def get_tasks(
+async def get_tasks(
     schwierigkeit: str = Query(...),
     klasse: int = Query(...),
-    operator: str = Query(...),
-    count: int = Query(1),
+    operator: str = Query(...),          # auch mehrere: "+,×"
+    count: int = Query(1, ge=0, le=MAX_TASKS),
+    zahlenauswahl: Optional[str] = Query(None),
+    seed: Optional[int] = Query(None),
 ):
-    tasks = []
-    import random
-
-    for i in range(count):
-        a, b = random.randint(1, 10), random.randint(1, 10)
-
-        if operator == "+":
-            frage, loesung, op = f"{a} + {b}", str(a + b), "+"
-        elif operator == "-":
-            frage, loesung, op = f"{a} - {b}", str(a - b), "-"
-        elif operator == "×":
-            frage, loesung, op = f"{a} × {b}", str(a * b), "×"
-        elif operator == "÷" and b != 0:
-            frage, loesung, op = f"{a} ÷ {b}", str(a // b), "÷"
-        else:
-            continue
-
-        tasks.append({
-            "id": str(i + 1),
-            "frage": frage,
-            "korrekteLoesung": loesung,
-            "operator": op,
-            "klasse": klasse,
-            "schwierigkeit": schwierigkeit
-        })
-
-    return {"tasks": tasks}
+    batch = await _draw_tasks_async(count, operator, klasse, schwierigkeit, zahlenauswahl, seed)
+    # Direkt serialisiert (ohne jsonable_encoder), siehe fast_json.py
+    return FastJSONResponse({"tasks": batch.to_dicts(klasse=klasse, schwierigkeit=schwierigkeit)})
 
 
 # Aufgaben erzeugen
 @app.post("/get/tasks")
-def get_tasks(req: TaskRequest):
-    operatoren = req.operatoren
-    limit = req.limit
-    tasks = []
-    for i in range(limit):
-        a, b = random.randint(1, 10), random.randint(1, 10)
-        if "+" in operatoren:
-            frage, loesung, op = f"{a} + {b}", str(a + b), "+"
-        elif "-" in operatoren:
-            frage, loesung, op = f"{a} - {b}", str(a - b), "-"
-        elif "×" in operatoren:
-            frage, loesung, op = f"{a} × {b}", str(a * b), "×"
-        elif "÷" in operatoren and b != 0:
-            frage, loesung, op = f"{a} ÷ {b}", str(a // b), "÷"
-        else:
-            continue
-        tasks.append(Task(id=str(i+1), frage=frage, korrekteLoesung=loesung, operator=op))
-    return tasks
+async def get_tasks(req: TaskRequest):
+    batch = await _draw_tasks_async(
+        min(max(req.limit, 0), MAX_TASKS), req.operatoren, req.klasse, req.schwierigkeit,
+        req.zahlenauswahl or ("1-10" if req.klasse is None else None), req.seed,
+    )
+    return [Task(**t) for t in batch.to_dicts()]
+
+# Spiel starten: Aufgaben werden hier erzeugt und in der Session abgelegt (wie server.js)
+@app.post("/test/start")
+async def start_test(req: StartRequest):
+    anzahl = min(max(req.anzahlAufgaben or 0, 0), MAX_TASKS)
+    zahlenauswahl = req.zahlenauswahl or ("1-10" if req.klasse is None else None)
+    batch = await _draw_tasks_async(anzahl, req.operatoren or ["+"], req.klasse, req.schwierigkeit,
+                                    zahlenauswahl, req.seed)
+    spieler = req.spieler[0] if isinstance(req.spieler, list) and req.spieler else req.spieler or None
+    session_id, _ = start_session(
+        batch, spieler=spieler, klasse=req.klasse, modus=req.modus or "Test",
+        schwierigkeit=req.schwierigkeit, zahlenauswahl=zahlenauswahl, timer_sek=req.timerSek or 0,
+    )
+    return {
+        "sessionId": session_id,
+        "modus": req.modus,
+        "timerSek": req.timerSek,
+        "anzahlAufgaben": len(batch),
+        # Lösungen bleiben auf dem Server (Index der Session), geprüft wird in /test/answer
+        "tasks": batch.to_dicts(id_prefix=TASK_ID_PREFIX, loesung=False),
+    }
+
+
+def _started_session(session_id: str):
+    """Test aus /test/start oder None (sessionId vom Client ausgedacht, z. B. "s1")."""
+    session = QUIZ_SESSIONS.get(session_id)
+    return session if session is not None and session.aufgaben is not None else None
+
+
+def _resolve_answer(session, task_id: str, korrekte_loesung: Optional[str]):
+    """
+    (frage, loesung, operator) für eine Antwort. Bei Tests aus /test/start zählt nur die
+    gespeicherte Lösung; ohne Test geht es nur mit vom Client gelieferter Lösung (alter Weg).
+    """
+    if session is not None:
+        if zeit_abgelaufen(session):
+            raise HTTPException(status_code=410, detail="Zeit abgelaufen")
+        task = lookup(session, task_id)
+        if task is None:
+            raise HTTPException(status_code=404, detail="Task not found")
+        return task
+    if korrekte_loesung is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    return None, korrekte_loesung, None
+
 
 # Antwort prüfen
 @app.post("/test/answer")
-def post_answer(req: AnswerRequest):
-    korrekt = req.antwort == req.korrekteLoesung
-    punkte_delta = 10 if korrekt else -5
-    gesamtpunkte = max(0, punkte_delta)  # TODO: Aufsummieren wenn du Session-Punkte willst
-
-    # Score laden und erweitern
-    scores = load_scores()
-    entry = {
-        "spieler": req.spieler,  # ✅ kommt jetzt direkt vom Request
-        "punkte": gesamtpunkte,
-        "klasse": 3,
-        "modus": "Test",
-        "operatoren": [req.operator],
-        "schwierigkeit": "Einfach",
-        "zahlenauswahl": "1-20",
-        "kategorie": 1,
-        "dauer": f"{req.dauerSek} Sek",
-        "autosave": True,
-        "datum": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    }
-    scores.append(entry)
-    save_scores(scores)
+async def post_answer(req: AnswerRequest):
+    session = _started_session(req.sessionId)
+    frage, loesung, op = _resolve_answer(session, req.taskId, req.korrekteLoesung)
+    started = session is not None
+    if not started:
+        # Ohne /test/start teilen sich viele Clients dieselbe ausgedachte sessionId ("s1") und
+        # taskIds ("1".."N") → keine Server-Session, jede Antwort wird einzeln gewertet und gespeichert
+        session = QuizSession(spieler=req.spieler)
+    neu = req.taskId not in session.ergebnisse
+    detail = grade(session, req.taskId, req.antwort, loesung, req.dauerSek, frage, op or req.operator)
+    if started:
+        QUIZ_SESSIONS.save(req.sessionId, session)
+    korrekt = detail["korrekt"]
+    punkte_delta = detail["punkte"]
+    gesamtpunkte = session.punkte  # laufender Stand der Session
+
+    # Score anhängen (eine gewertete Aufgabe zählt nur einmal)
+    if neu:
+        entry = {
+            "spieler": req.spieler or session.spieler or "Anonymer Matrose",
+            "punkte": gesamtpunkte,
+            "klasse": session.klasse if session.klasse is not None else 3,
+            "modus": session.modus,
+            "operatoren": [detail.get("operator")] if detail.get("operator") else [],
+            "schwierigkeit": session.schwierigkeit or "Einfach",
+            "zahlenauswahl": session.zahlenauswahl or "1-20",
+            "kategorie": 1,
+            "dauer": f"{req.dauerSek} Sek",
+            "korrekt": korrekt,
+            "autosave": True,
+            "datum": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        }
+        await append_score_async(entry)
 
     return {
         "korrekt": korrekt,
-        "korrekteLoesung": req.korrekteLoesung,
-        "erklaerung": f"Die richtige Lösung war {req.korrekteLoesung}.",
+        "korrekteLoesung": loesung,
+        "erklaerung": f"{frage} ergibt {loesung}." if frage else f"Die richtige Lösung war {loesung}.",
         "punkteDelta": punkte_delta,
         "gesamtpunkte": gesamtpunkte
     }
 
 
+# Alle Antworten eines Tests (oder eines Teils) auf einmal werten – ein Score statt einer Zeile pro Aufgabe
+@app.post("/test/answers:batch")
+async def post_answers_batch(req: AnswerBatchRequest):
+    session = _started_session(req.sessionId)
+    # Erst alles prüfen (404/410), dann werten – eine ungültige Aufgabe bucht nichts
+    resolved = [(a, _resolve_answer(session, a.taskId, a.korrekteLoesung)) for a in req.antworten]
+
+    started = session is not None
+    if not started:
+        # Ohne /test/start keine Server-Session (s. post_answer): nur diese Anfrage wird gewertet
+        if not req.abschliessen:
+            raise HTTPException(status_code=400, detail="Partial submissions require /test/start")
+        session = QuizSession()
+    if req.spieler:
+        session.spieler = req.spieler
+    if req.klasse is not None:
+        session.klasse = req.klasse
+    if req.modus:
+        session.modus = req.modus
+
+    details = [
+        grade(session, a.taskId, a.antwort, loesung, a.dauerSek, frage or a.frage, op or a.operator)
+        for a, (frage, loesung, op) in resolved
+    ]
+
+    if req.abschliessen and not session.gespeichert and session.ergebnisse:
+        session.gespeichert = True
+        try:
+            await append_score_async(score_entry(session, req.schwierigkeit, req.zahlenauswahl))
+        except Exception:
+            session.gespeichert = False
+            raise
+    if started:
+        QUIZ_SESSIONS.save(req.sessionId, session)
+
+    # summary = ganzer Test bisher, details = die Aufgaben dieser Anfrage
+    return result_json(req.sessionId, session, details)
+
+
+# Ergebnisdatei eines Tests (ResultJson oder PDF-Bericht)
+@app.get("/download/result")
+async def download_result(
+    sessionId: str = Query(...),
+    fmt: str = Query("pdf", alias="format", pattern="^(pdf|json)$"),
+):
+    session = QUIZ_SESSIONS.get(sessionId)
+    filename = f"ergebnis-{sessionId}.{fmt}".replace('"', "")
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
+    if session is None:
+        # Abgelaufene Session: ein schon erzeugtes PDF gibt es evtl. noch auf der Platte
+        data = await run_io(cached_pdf, sessionId) if fmt == "pdf" else None
+        if data is None:
+            raise HTTPException(status_code=404, detail="Session not found")
+        return Response(data, media_type="application/pdf", headers=headers)
+
+    # Stand jetzt festhalten – die Session kann sich während der Ausgabe weiter ändern
+    result = result_json(sessionId, session)
+    if fmt == "json":
+        return StreamingResponse(iter_result_json(result), media_type="application/json", headers=headers)
+    data = await run_io(pdf_bytes, sessionId, result, report_meta(session))
+    return Response(data, media_type="application/pdf", headers=headers)
+
+
 # Punkte speichern (dauerhaft in scores.json) – POST-Version
 @app.post("/api/storeScore")
-def save_score_post(req: SaveRequest):
-    return save_score_logic(req)
+async def save_score_post(req: SaveRequest):
+    return await save_score_logic(req)
 
 # ⚓ Alias: /save → identisch zu /api/storeScore
 @app.post("/save")
-def save_score_alias(req: SaveRequest):
-    return save_score_logic(req)
+async def save_score_alias(req: SaveRequest):
+    return await save_score_logic(req)
 
 
 # Punkte speichern (dauerhaft in scores.json) – PUT-Version
 @app.put("/api/score")
-def save_score_put(req: SaveRequest):
-    return save_score_logic(req)
+async def save_score_put(req: SaveRequest):
+    return await save_score_logic(req)
 
 # Gemeinsame Logik für Score-Speichern
-def save_score_logic(req: SaveRequest):
-    try:
-        scores = load_scores()
-        if not isinstance(scores, list):
-            scores = []
-    except Exception as e:
-        print("⚠️ Fehler beim Laden von scores.json in /save:", e)
-        scores = []
-
+async def save_score_logic(req: SaveRequest):
     entry = req.dict()
     entry["datum"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    scores.append(entry)
 
     try:
-        save_scores(scores)
+        await append_score_async(entry)
     except Exception as e:
         print("⚠️ Fehler beim Speichern von scores.json:", e)
         return {"message": "Fehler beim Speichern", "error": str(e)}
@@ -236,27 +441,69 @@ def save_score_logic(req: SaveRequest):
 
 # Punkte laden (dauerhaft aus scores.json)
 @app.get("/load")
-def load_scores_for_player(spieler: str):
+async def load_scores_for_player(
+    spieler: str,
+    after: Optional[int] = Query(None, ge=0),          # Cursor aus X-Next-Cursor bzw. "cursor" (NDJSON)
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    fmt: Optional[str] = Query(None, alias="format"),  # "ndjson" → Stream
+    accept: Optional[str] = Header(None),
+):
+    # Ohne Cursor: die letzten `limit` (Standard 20) Scores vom Spieler (Case-insensitive),
+    # X-Has-More: true, wenn es ältere gibt; mit ?after= die nächsten Scores danach
+    if wants_ndjson(fmt, accept):
+        it = get_store().iter_player_scores(spieler, after)
+        return ndjson_response(it, limit)
     try:
-        scores = load_scores()
+        if after is None:
+            n = limit or 20
+            rows = await run_io(lambda: get_store().tail_player_scores(spieler, n + 1))
+            items, cursor, has_more = tail_page(rows, n)
+        else:
+            items, cursor, has_more = await run_io(
+                lambda: page(get_store().iter_player_scores(spieler, after), limit or 20, after))
     except Exception as e:
         print("⚠️ Fehler beim Laden von scores.json in /load:", e)
         return []
-
-    # Alle Scores vom Spieler (Case-insensitive)
-    matching_scores = [
-        s for s in scores
-        if "spieler" in s and isinstance(s["spieler"], str) and s["spieler"].lower() == spieler.lower()
-    ]
-
-    # Nur die letzten 20 zurückgeben
-    return matching_scores[-20:]
+    headers = {"X-Has-More": "true" if has_more else "false"}
+    if cursor is not None:
+        headers["X-Next-Cursor"] = str(cursor)
+    return FastJSONResponse(items, headers=headers)
 
 # Rangliste (dauerhaft aus scores.json)
 @app.get("/leaderboard")
-def leaderboard():
-    scores = load_scores()
-    sorted_scores = sorted(scores, key=lambda x: x["punkte"], reverse=True)
-    for idx, s in enumerate(sorted_scores, start=1):
-        s["rang"] = idx
-    return sorted_scores
\ No newline at end of file
+async def leaderboard(
+    limit: int = Query(10, ge=0),
+    modus: Optional[str] = Query(None),
+    klasse: Optional[int] = Query(None),
+    best: bool = Query(False),
+):
+    # best=true → Bestwert je Spieler inkl. letztem Stand (wie server.js)
+    # Der Index lädt beim ersten Zugriff (und nach Scores anderer Worker) alle Scores → I/O-Pool
+    if best:
+        return FastJSONResponse(
+            await run_io(_leaderboard.best_per_player, limit or 2**31, modus=modus, klasse=klasse))
+    if limit and await run_io(_leaderboard.covers, limit, modus=modus, klasse=klasse):
+        return FastJSONResponse(await run_io(_leaderboard.top, limit, modus=modus, klasse=klasse))
+
+    # limit=0 (alles) oder mehr als der Index hält → direkt aus dem Speicher-Backend
+    sorted_scores = await run_io(lambda: get_store().top_scores(limit or None, modus=modus, klasse=klasse))
+    return FastJSONResponse([dict(s, rang=idx) for idx, s in enumerate(sorted_scores, start=1)])
+
+
+# Statistik je Spieler (inkrementell mitgeführt, siehe player_stats.py)
+@app.get("/stats")
+async def player_stats(spieler: str = Query(...)):
+    # Erster Zugriff lädt die Aggregate (oder baut sie aus der Historie auf) → im I/O-Pool
+    stats = await run_io(PLAYER_STATS.get, spieler)
+    if stats is None:
+        raise HTTPException(status_code=404, detail="Player not found")
+    return stats
+
+# Statistik aus der gesamten Historie neu berechnen (teuer → nur mit ZP_PROFILE_TOKEN, wie /admin/profiles;
+# ohne Token bleibt `python player_stats.py rebuild`)
+@app.post("/stats/rebuild")
+async def rebuild_player_stats(x_profile_token: Optional[str] = Header(None)):
+    if not token_ok(x_profile_token):
+        raise HTTPException(status_code=403, detail="Forbidden")
+    players = await run_io(PLAYER_STATS.rebuild)
+    return {"status": "ok", "players": players}
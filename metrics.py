@@ -0,0 +1,234 @@
+# C:\Users\mnold_t1ohvc3\Documents\zahlenpirat-backend\metrics.py
+"""
+Eingebaute Kennzahlen für GET /metrics (Prometheus-Textformat 0.0.4) – ohne Zusatzpaket.
+
+- `MetricsMiddleware` (reines ASGI) misst jede HTTP-Anfrage: Latenz-Histogramm und Zähler
+  je (Methode, Route, Status). Als Route zählt das Pfad-Muster ("/stats"), nicht der konkrete
+  Pfad – Anfragen ohne passende Route landen gemeinsam unter "unmatched".
+- `timed(op)` misst Speicherzugriffe (Score-Store, settings.json) in `zp_storage_seconds`.
+- Zustandswerte anderer Module (Task-Pool, Sessions, Settings-Cache, ...) werden erst beim
+  Abruf über `add_stats`/`add_collector` eingesammelt; dort wird nichts doppelt gezählt.
+"""
+import bisect, functools, threading, time
+from typing import Any, Callable, Dict, Iterable, List, Sequence, Tuple
+
+# Obergrenzen der Histogramm-Eimer in Sekunden (+Inf kommt automatisch dazu)
+BUCKETS: Tuple[float, ...] = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# (labels, wert) und (name, "gauge"|"counter", hilfe, samples) – so liefern Collector ihre Werte
+Sample = Tuple[Dict[str, Any], float]
+Family = Tuple[str, str, str, List[Sample]]
+
+
+def _escape(v: Any) -> str:
+    return str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[Any], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _num(v: float) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    return repr(int(v)) if float(v).is_integer() else repr(float(v))
+
+
+class Counter:
+    """Monoton steigender Zähler; Label-Werte positionell in der Reihenfolge von `labels`."""
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name, self.help, self.label_names = name, help, tuple(labels)
+        self._values: Dict[Tuple[Any, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: Any, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items(), key=lambda kv: tuple(map(str, kv[0])))
+        return [f"{self.name}{_labels(self.label_names, k)} {_num(v)}" for k, v in items]
+
+
+class Histogram:
+    """Histogramm mit festen Eimern; pro Label-Kombination Zählungen, Summe und Anzahl."""
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = BUCKETS):
+        self.name, self.help, self.label_names = name, help, tuple(labels)
+        self.buckets = tuple(buckets)
+        # je Label-Kombination: [eimer_0, ..., eimer_n, +Inf, summe] (Eimer nicht kumuliert)
+        self._values: Dict[Tuple[Any, ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: Any) -> None:
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            row = self._values.get(labels)
+            if row is None:
+                row = self._values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            row[i] += 1
+            row[-1] += value
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(((k, list(v)) for k, v in self._values.items()), key=lambda kv: tuple(map(str, kv[0])))
+        out: List[str] = []
+        for key, row in items:
+            total = 0
+            for le, n in zip(self.buckets + (float("inf"),), row[:-1]):
+                total += n
+                le_label = 'le="%s"' % _num(le)
+                out.append(f"{self.name}_bucket{_labels(self.label_names, key, le_label)} {_num(total)}")
+            out.append(f"{self.name}_sum{_labels(self.label_names, key)} {_num(row[-1])}")
+            out.append(f"{self.name}_count{_labels(self.label_names, key)} {_num(total)}")
+        return out
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: List[Any] = []
+        self._collectors: List[Callable[[], Iterable[Family]]] = []
+
+    def counter(self, name: str, help: str, labels: Sequence[str] = ()) -> Counter:
+        c = Counter(name, help, labels)
+        self._metrics.append(c)
+        return c
+
+    def histogram(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = BUCKETS) -> Histogram:
+        h = Histogram(name, help, labels, buckets)
+        self._metrics.append(h)
+        return h
+
+    def add_collector(self, collect: Callable[[], Iterable[Family]]) -> None:
+        """Werte erst beim Abruf ermitteln; gleichnamige Familien mehrerer Collector werden zusammengelegt."""
+        self._collectors.append(collect)
+
+    def add_stats(self, prefix: str, stats: Callable[[], Dict[str, Any]], counters: Sequence[str] = (),
+                  gauges: Sequence[str] = (), **labels: Any) -> None:
+        """
+        Vorhandene stats()-Methode einbinden: je Schlüssel eine Kennzahl `<prefix>_<schlüssel>`
+        (Zähler mit Endung _total). stats() wird pro Abruf genau einmal aufgerufen.
+        """
+        def collect() -> List[Family]:
+            data = stats()
+            out: List[Family] = []
+            for kind, keys in (("counter", counters), ("gauge", gauges)):
+                for k in keys:
+                    v = data.get(k)
+                    if isinstance(v, (int, float)) and not isinstance(v, bool):
+                        name = f"{prefix}_{k.lower()}" + ("_total" if kind == "counter" else "")
+                        out.append((name, kind, f"{prefix} {k}", [(labels, float(v))]))
+            return out
+        self.add_collector(collect)
+
+    def render(self) -> str:
+        """Alle Kennzahlen im Prometheus-Textformat. Collector können blockieren → run_io."""
+        lines: List[str] = []
+        for m in self._metrics:
+            lines.append(f"# HELP {m.name} {m.help}")
+            lines.append(f"# TYPE {m.name} {'counter' if isinstance(m, Counter) else 'histogram'}")
+            lines.extend(m.render())
+        families: Dict[str, Tuple[str, str, List[Sample]]] = {}
+        for collect in self._collectors:
+            for name, kind, help, samples in collect():
+                families.setdefault(name, (kind, help, []))[2].extend(samples)
+        for name, (kind, help, samples) in families.items():
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                lines.append(f"{name}{_labels(list(labels), list(labels.values()))} {_num(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+REQUEST_SECONDS = REGISTRY.histogram("zp_http_request_duration_seconds",
+                                     "Dauer der HTTP-Anfragen (inkl. Senden des Bodys)", ("method", "route"))
+REQUESTS_TOTAL = REGISTRY.counter("zp_http_requests_total", "HTTP-Anfragen nach Status", ("method", "route", "status"))
+STORAGE_SECONDS = REGISTRY.histogram("zp_storage_seconds", "Dauer der Speicherzugriffe", ("op",))
+STORAGE_ERRORS = REGISTRY.counter("zp_storage_errors_total", "Fehlgeschlagene Speicherzugriffe", ("op",))
+
+
+# ======================
+# Speicherzugriffe
+# ======================
+
+def timed(op: str) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    """Decorator: Laufzeit in zp_storage_seconds{op=...}, Ausnahmen zusätzlich als Fehler."""
+    def deco(fn: Callable[..., Any]) -> Callable[..., Any]:
+        @functools.wraps(fn)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            except Exception:
+                STORAGE_ERRORS.inc(op)
+                raise
+            finally:
+                STORAGE_SECONDS.observe(time.perf_counter() - start, op)
+        return wrapper
+    return deco
+
+
+def instrument(cls: type, prefix: str, names: Iterable[str]) -> None:
+    """Methoden einer Klasse nachträglich mit `timed(f"{prefix}.{name}")` umhüllen (nur eigene, keine geerbten)."""
+    for name in names:
+        if name in cls.__dict__:
+            setattr(cls, name, timed(f"{prefix}.{name}")(cls.__dict__[name]))
+
+
+# ======================
+# HTTP
+# ======================
+
+_route_paths: Dict[Any, str] = {}
+_routes_seen = -1
+
+
+def route_label(scope: Dict[str, Any]) -> str:
+    """Pfad-Muster der Route, die die Anfrage bedient hat ("unmatched" ohne Treffer). Erst nach dem Routing aufrufen."""
+    global _route_paths, _routes_seen
+    # Das Routing trägt den gefundenen Endpunkt in den (gemeinsamen) scope ein
+    endpoint = scope.get("endpoint")
+    if endpoint is None:
+        return "unmatched"
+    routes = getattr(scope.get("app"), "routes", None) or []
+    if len(routes) != _routes_seen:
+        _route_paths = {getattr(r, "endpoint", None): getattr(r, "path", "") for r in routes}
+        _routes_seen = len(routes)
+    return _route_paths.get(endpoint) or getattr(endpoint, "__name__", "unmatched")
+
+
+class MetricsMiddleware:
+    """Misst Dauer und Status jeder HTTP-Anfrage; Streams zählen bis zum letzten Block."""
+
+    def __init__(self, app: Any):
+        self.app = app
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable, send: Callable) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        status = 500
+
+        async def _send(message: Dict[str, Any]) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, _send)
+        finally:
+            route = route_label(scope)
+            REQUEST_SECONDS.observe(time.perf_counter() - start, scope["method"], route)
+            REQUESTS_TOTAL.inc(scope["method"], route, status)
+
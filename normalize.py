@@ -0,0 +1,179 @@
+# C:\Users\mnold_t1ohvc3\Documents\zahlenpirat-backend\normalize.py
+"""
+Kanonische Werte für Chat-Befehle und Einstellungen (Operatoren, Schwierigkeit, Modus)
+sowie die Mojibake-Reparatur für Settings und Connector-Eingaben.
+
+Alle Tabellen sind fest (MappingProxyType/frozenset), "Schlüssel: Wert"-Befehle werden mit
+einer vorkompilierten Regex erkannt, und kanonische Werte werden je Rohstring gemerkt –
+dieselben paar Eingaben kommen in jedem /flow-Durchlauf mehrfach vorbei.
+"""
+import re
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Any, Callable, Dict, Mapping, Optional, Tuple
+
+OPERATORS = ("+", "-", "×", "÷")
+_OPERATOR_SET = frozenset(OPERATORS)
+
+# Menü-Ziffern aus dem Operatorendialog
+OPERATOR_DIGITS: Mapping[str, str] = MappingProxyType({"1": "+", "2": "-", "3": "×", "4": "÷"})
+
+# Einzelnes Token → Operator (Ziffern, ASCII-Ersatzzeichen, typografische Striche)
+_OPERATOR_TOKENS: Mapping[str, str] = MappingProxyType({
+    **OPERATOR_DIGITS,
+    "+": "+", "-": "-", "×": "×", "÷": "÷",
+    "x": "×", "X": "×", "*": "×",
+    "/": "÷", ":": "÷",
+    "−": "-", "–": "-",
+})
+
+_SCHWIERIGKEIT: Mapping[str, str] = MappingProxyType({
+    "1": "Leicht", "leicht": "Leicht",
+    "2": "Mittel", "mittel": "Mittel",
+    "3": "Schwer", "schwer": "Schwer",
+    "4": "Extrem schwer", "extrem": "Extrem schwer", "extrem schwer": "Extrem schwer", "sehr schwer": "Extrem schwer",
+})
+
+_MODUS: Mapping[str, str] = MappingProxyType({
+    "1": "Prüfung der Zahlen",
+    "2": "Zahlenspiele",
+    "3": "Lernen",
+    "4": "Abenteuer & Extras",
+    "5": "Erinnerung",
+    "6": "Piraten-Minigames",
+})
+
+# Erlaubte Spielernamen im Namensdialog
+NAME_RE = re.compile(r"[A-Za-zÄÖÜäöüß\- ]{1,20}")
+
+
+# ======================
+# Einzelwerte
+# ======================
+
+def normalize_operator_token(tok: str) -> str:
+    t = tok.strip()
+    return _OPERATOR_TOKENS.get(t, t)
+
+
+@lru_cache(maxsize=512)
+def normalize_operator_value(raw: str) -> str:
+    out: list[str] = []
+    for p in raw.replace(",", " ").split():
+        n = _OPERATOR_TOKENS.get(p)
+        if n is not None and n not in out:
+            out.append(n)
+    return ",".join(out) if out else raw.strip()
+
+
+@lru_cache(maxsize=256)
+def normalize_schwierigkeit(raw: str) -> str:
+    v = raw.strip()
+    return _SCHWIERIGKEIT.get(v.lower(), v)
+
+
+@lru_cache(maxsize=256)
+def normalize_modus(raw: str) -> str:
+    v = raw.strip()
+    return _MODUS.get(v, v)
+
+
+_CANONICALIZERS: Mapping[str, Callable[[str], str]] = MappingProxyType({
+    "Operatoren": normalize_operator_value,
+    "Schwierigkeit": normalize_schwierigkeit,
+    "Modus": normalize_modus,
+    "Name": str.strip,
+})
+
+
+def canonical_value(key: str, value: str) -> str:
+    """Kanonische Form für `key`; unbekannte Schlüssel bleiben unverändert."""
+    fn = _CANONICALIZERS.get(key)
+    return fn(value) if fn is not None else value
+
+
+def canonical_settings(d: Mapping[str, Any]) -> Dict[str, Any]:
+    """Kopie von `d` mit kanonischen Operatoren/Schwierigkeit/Modus (Name bleibt wie gespeichert)."""
+    out = dict(d)
+    for key in ("Operatoren", "Schwierigkeit", "Modus"):
+        if key in out:
+            out[key] = _CANONICALIZERS[key](out[key])
+    return out
+
+
+# ======================
+# "Schlüssel: Wert"-Befehle
+# ======================
+
+_COMMAND_RE = re.compile(r"(operatoren|modus|klasse|schwierigkeit|zahlenauswahl|name):(.*)", re.IGNORECASE | re.DOTALL)
+
+_COMMAND_KEYS: Mapping[str, str] = MappingProxyType({
+    "operatoren": "Operatoren",
+    "modus": "Modus",
+    "klasse": "Klasse",
+    "schwierigkeit": "Schwierigkeit",
+    "zahlenauswahl": "Zahlenauswahl",
+    "name": "Name",
+})
+
+
+def parse_command(text: str) -> Optional[Tuple[str, str]]:
+    """"Operatoren: 1,3" → ("Operatoren", "+,×"); sonst None."""
+    m = _COMMAND_RE.match(text.strip())
+    if m is None:
+        return None
+    key = _COMMAND_KEYS[m.group(1).lower()]
+    value = m.group(2).strip()
+    if key in ("Operatoren", "Schwierigkeit", "Modus"):
+        value = _CANONICALIZERS[key](value)
+    return (key, value)
+
+
+# ======================
+# Mojibake
+# ======================
+
+# UTF-8, das als Latin-1/CP1252 gelesen und wieder gespeichert wurde
+_MOJI_FIX: Mapping[str, str] = MappingProxyType({
+    "Ã—": "×",
+    "Ã·": "÷",
+    "Ã„": "Ä", "Ã–": "Ö", "Ãœ": "Ü",
+    "Ã¤": "ä", "Ã¶": "ö", "Ã¼": "ü",
+    "ÃŸ": "ß",
+})
+_MOJI_RE = re.compile("|".join(re.escape(bad) for bad in _MOJI_FIX))
+
+# Zusätzliche Reste, die nur bei Operator-Eingaben vorkommen (abgeschnittenes "Ã—")
+_OPERATOR_MOJI_FIX: Mapping[str, str] = MappingProxyType({"Ã×": "×", "Ã·": "÷", "Ã,": "×,"})
+_OPERATOR_MOJI_RE = re.compile("|".join(re.escape(bad) for bad in _OPERATOR_MOJI_FIX))
+
+
+def fix_mojibake_str(s: str) -> str:
+    """Bekannte Mojibake-Sequenzen ersetzen (alle beginnen mit "Ã" → schneller Ausstieg)."""
+    if "Ã" not in s:
+        return s
+    return _MOJI_RE.sub(lambda m: _MOJI_FIX[m.group(0)], s)
+
+
+def fix_mojibake(obj: Any) -> Any:
+    if isinstance(obj, dict):
+        return {k: fix_mojibake(v) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [fix_mojibake(v) for v in obj]
+    if isinstance(obj, str):
+        return fix_mojibake_str(obj)
+    return obj
+
+
+@lru_cache(maxsize=256)
+def repair_mojibake(s: str) -> str:
+    """Eingaben vom Connector: erst komplett zurückkodieren, sonst bekannte Reste ersetzen."""
+    if "Ã" in s or "Â" in s:
+        try:
+            return s.encode("latin-1").decode("utf-8")
+        except Exception:
+            pass
+    if "Ã" not in s:
+        return s
+    s = _OPERATOR_MOJI_RE.sub(lambda m: _OPERATOR_MOJI_FIX[m.group(0)], s)
+    return fix_mojibake_str(s)
@@ -0,0 +1,57 @@
+# C:\Users\mnold_t1ohvc3\Documents\zahlenpirat-backend\paging.py
+"""
+Cursor-Seiten und NDJSON-Streams für /load und /getHistory.
+
+Die Store-Iteratoren (ScoreStore.iter_player_*) liefern (cursor, eintrag); hier werden daraus
+Seiten mit `nextCursor` bzw. ein application/x-ndjson-Stream, der stückweise im I/O-Pool
+gelesen wird – der Speicherbedarf hängt nicht von der Länge der Historie ab.
+"""
+from itertools import islice
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
+
+from fastapi.responses import StreamingResponse
+
+from io_executor import run_io
+from fast_json import dumps
+
+NDJSON = "application/x-ndjson"
+STREAM_CHUNK = 200  # Einträge pro Lesevorgang im I/O-Pool
+
+Cursored = Tuple[int, Dict[str, Any]]
+
+
+def page(it: Iterator[Cursored], limit: int, after: Optional[int] = None) -> Tuple[List[Dict[str, Any]], Optional[int], bool]:
+    """Bis zu `limit` Einträge; (einträge, nextCursor, hatMehr). nextCursor = Cursor des letzten Eintrags."""
+    rows = list(islice(it, limit + 1))
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    return [e for _, e in rows], (rows[-1][0] if rows else after), has_more
+
+
+def tail_page(rows: List[Cursored], limit: int) -> Tuple[List[Dict[str, Any]], Optional[int], bool]:
+    """
+    Letzte Seite aus `limit + 1` Zeilen (chronologisch, z. B. von tail_player_*): hatMehr heißt
+    hier, dass es ältere Einträge gibt; nextCursor = Cursor des neuesten Eintrags.
+    """
+    has_more = len(rows) > limit
+    rows = rows[-limit:] if limit else []
+    return [e for _, e in rows], (rows[-1][0] if rows else None), has_more
+
+
+async def _ndjson_chunks(it: Iterator[Cursored], limit: Optional[int]) -> AsyncIterator[bytes]:
+    if limit is not None:
+        it = islice(it, limit)
+    while True:
+        rows = await run_io(lambda: list(islice(it, STREAM_CHUNK)))
+        if not rows:
+            return
+        yield b"".join(dumps(dict(e, cursor=c)) + b"\n" for c, e in rows)
+
+
+def ndjson_response(it: Iterator[Cursored], limit: Optional[int] = None) -> StreamingResponse:
+    """Eine Zeile pro Eintrag, jeweils mit seinem `cursor` (für ?after= beim nächsten Abruf)."""
+    return StreamingResponse(_ndjson_chunks(it, limit), media_type=NDJSON)
+
+
+def wants_ndjson(fmt: Optional[str], accept: Optional[str]) -> bool:
+    return fmt == "ndjson" or (fmt is None and bool(accept) and NDJSON in accept)
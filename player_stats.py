@@ -0,0 +1,429 @@
+# C:\Users\mnold_t1ohvc3\Documents\zahlenpirat-backend\player_stats.py
+"""
+Statistik je Spieler (GET /stats), inkrementell bei jedem Speichern mitgeführt.
+
+Pro Spieler (Case-insensitive) ein Aggregat: Anzahl/Summe/Bestwert der Scores, Sessions,
+gelöste Aufgaben je Operator und je Klasse, zuletzt gespielt. Abfragen sind ein Dict-Zugriff.
+
+- Scores (scores.json): Punkte; Treffer, wenn die Zeile sie mitbringt ("korrekt" aus /test/answer,
+  "aufgaben"/"richtig" aus /test/answers:batch)
+- Sessions (data/scores.json): aufgabenGesamt/aufgabenGeloest. Ein neuer Stand derselben sessionId
+  (Autosave aus /flow, /endSession) ersetzt den Beitrag des vorigen, statt ihn doppelt zu zählen.
+
+Die Aggregate liegen unter ZP_STATS_FILE und werden gebündelt im Hintergrund geschrieben. Fehlt
+die Datei, werden sie einmalig aus der Historie aufgebaut; `python player_stats.py rebuild`
+(oder POST /stats/rebuild mit X-Profile-Token) rechnet sie jederzeit neu.
+
+Mehrere Worker teilen sich die Datei: Jeder merkt sich seine noch nicht geschriebenen Änderungen
+und spielt sie beim Schreiben unter file_lock auf den aktuellen Dateistand (lesen, anwenden,
+schreiben). Abfragen prüfen höchstens alle ZP_STATS_RECHECK_SEK per stat(), ob ein anderer Worker
+geschrieben hat, und laden dann neu (wie settings_manager).
+"""
+import copy, os, sys, threading, time, logging
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from json_files import atomic_write_json, file_lock, read_json
+from normalize import normalize_operator_token, normalize_operator_value
+from score_store import get_store
+
+log = logging.getLogger(__name__)
+
+STATS_FILE = os.getenv("ZP_STATS_FILE", os.path.join("data", "player_stats.json"))
+STATS_FLUSH_SEK = float(os.getenv("ZP_STATS_FLUSH_SEK", "2"))
+STATS_RECHECK_SEK = float(os.getenv("ZP_STATS_RECHECK_SEK", "1.0"))
+STATS_VERSION = 1
+
+# (aufgaben, richtig, operator-Schlüssel, klasse)
+Beitrag = Tuple[int, int, Optional[str], Optional[str]]
+# noch nicht geschriebene Änderung: ("score", entry) oder ("session", spieler, session)
+Op = Tuple[Any, ...]
+
+
+def _int(v: Any) -> int:
+    try:
+        return int(v or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+def _operator_key(ops: Any) -> Optional[str]:
+    """["+", "×"] oder "+,×" → "+,×"; mehrere Operatoren bilden einen gemeinsamen Topf."""
+    if isinstance(ops, str):
+        key = normalize_operator_value(ops)
+    elif isinstance(ops, list):
+        out: List[str] = []
+        for op in ops:
+            n = normalize_operator_token(str(op))
+            if n and n not in out:
+                out.append(n)
+        key = ",".join(out)
+    else:
+        return None
+    return key or None
+
+
+def _klasse_key(klasse: Any) -> Optional[str]:
+    return None if klasse is None or klasse == "" else str(klasse)
+
+
+def _score_beitrag(entry: Dict[str, Any]) -> Beitrag:
+    korrekt = entry.get("korrekt")
+    if isinstance(korrekt, bool):
+        aufgaben, richtig = 1, int(korrekt)
+    else:
+        aufgaben, richtig = _int(entry.get("aufgaben")), _int(entry.get("richtig"))
+    return aufgaben, richtig, _operator_key(entry.get("operatoren")), _klasse_key(entry.get("klasse"))
+
+
+def _session_beitrag(session: Dict[str, Any]) -> Beitrag:
+    return (_int(session.get("aufgabenGesamt")), _int(session.get("aufgabenGeloest")),
+            _operator_key(session.get("operatoren")), _klasse_key(session.get("klasse")))
+
+
+def _new_agg(spieler: str) -> Dict[str, Any]:
+    return {"spieler": spieler, "scores": 0, "summe": 0, "best": None, "sessions": 0,
+            "aufgaben": 0, "richtig": 0, "operatoren": {}, "klassen": {}, "zuletzt": None,
+            "letzteSession": None}
+
+
+def _quote(richtig: int, aufgaben: int) -> Optional[float]:
+    return round(richtig / aufgaben, 4) if aufgaben else None
+
+
+def _file_sig(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _valid(data: Any) -> bool:
+    return isinstance(data, dict) and data.get("version") == STATS_VERSION
+
+
+class PlayerStats:
+    """Aggregate je Spieler; Schreiber rufen add_score/add_session nach dem Speichern (unter `lock`)."""
+
+    def __init__(self, load_scores: Callable[[], Iterable[Dict[str, Any]]],
+                 load_sessions: Callable[[], Dict[str, Dict[str, List[Dict[str, Any]]]]],
+                 path: str = STATS_FILE, flush_sek: float = STATS_FLUSH_SEK,
+                 recheck_sek: float = STATS_RECHECK_SEK):
+        self._load_scores = load_scores
+        self._load_sessions = load_sessions
+        self.path = path
+        self.flush_sek = flush_sek
+        self.recheck_sek = recheck_sek
+        self.lock = threading.RLock()
+        self._players: Dict[str, Dict[str, Any]] = {}
+        self._loaded = False
+        self._dirty = False
+        self._pending: List[Op] = []   # seit dem letzten Schreiben angewendet, aber nicht in der Datei
+        self._replace = False          # nach rebuild(): Datei komplett ersetzen statt mischen
+        self._sig: Optional[Tuple[int, int]] = None
+        self._checked = 0.0
+        self.reloads = 0
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+
+    # ------------------------------------------------------------------
+    # Laden / Neuaufbau
+    # ------------------------------------------------------------------
+    def _ensure_loaded(self) -> bool:
+        """Aggregate laden; True, wenn sie dafür gerade aus der Historie aufgebaut wurden."""
+        if self._loaded:
+            return False
+        with self.lock:
+            if self._loaded:
+                return False
+            sig = _file_sig(self.path) if self.path else None
+            data = read_json(self.path, None) if self.path else None
+            if _valid(data):
+                self._players = data.get("spieler") or {}
+                self._sig, self._checked = sig, time.monotonic()
+                self._loaded = True
+                return False
+            self._rebuild_locked()
+            return True
+
+    def _revalidate(self) -> None:
+        """Hat ein anderer Worker die Datei geschrieben: neu laden und eigene offene Änderungen darüberlegen."""
+        if not self.path or time.monotonic() - self._checked < self.recheck_sek:
+            return
+        with self.lock:
+            self._checked = time.monotonic()
+            sig = _file_sig(self.path)
+            if sig is None or sig == self._sig or self._replace:
+                return
+            data = read_json(self.path, None)
+            if not _valid(data):
+                return
+            self._players = data.get("spieler") or {}
+            self._sig = sig
+            self._replay(self._players, self._pending)
+            self.reloads += 1
+
+    def rebuild(self) -> int:
+        """Alle Aggregate aus scores.json + Sessions neu berechnen; liefert die Anzahl Spieler."""
+        with self.lock:
+            self._replace = True
+            self._rebuild_locked()
+            n = len(self._players)
+        self.flush()
+        return n
+
+    def _rebuild_locked(self) -> None:
+        self._players = {}
+        self._pending = []
+        for entry in self._load_scores():
+            if isinstance(entry, dict):
+                self._apply_score(self._players, entry)
+        for spieler, data in (self._load_sessions() or {}).items():
+            for session in (data or {}).get("sessions", []):
+                if isinstance(session, dict):
+                    self._apply_session(self._players, spieler, session)
+        self._loaded = True
+        self._mark_dirty()
+
+    # ------------------------------------------------------------------
+    # Pflege
+    # ------------------------------------------------------------------
+    def _needs_apply(self) -> bool:
+        # Aufgerufen nach dem Speichern: Wird dafür erst aus der Historie aufgebaut, steckt der
+        # Eintrag schon drin. Eine unlesbare Historie darf das Speichern nicht nachträglich
+        # scheitern lassen – der Eintrag kommt dann beim nächsten Aufbau mit.
+        try:
+            return not self._ensure_loaded()
+        except Exception:
+            log.error("Spielerstatistik konnte nicht aufgebaut werden", exc_info=True)
+            return False
+
+    def add_score(self, entry: Dict[str, Any]) -> None:
+        if not self._needs_apply():
+            return
+        with self.lock:
+            self._apply(("score", dict(entry)))
+            self._mark_dirty()
+
+    def add_session(self, spieler: str, session: Dict[str, Any]) -> None:
+        if not self._needs_apply():
+            return
+        with self.lock:
+            self._apply(("session", spieler, dict(session)))
+            self._mark_dirty()
+
+    def add_sessions(self, items: Iterable[Tuple[str, Dict[str, Any]]]) -> None:
+        if not self._needs_apply():
+            return
+        with self.lock:
+            for spieler, session in items:
+                self._apply(("session", spieler, dict(session)))
+            self._mark_dirty()
+
+    def _apply(self, op: Op) -> None:
+        self._replay(self._players, [op])
+        if self.path:
+            self._pending.append(op)
+
+    # Die Anwendung arbeitet auf einem übergebenen Aggregat-Dict: dem eigenen (unter `lock`)
+    # oder beim Schreiben auf dem frisch gelesenen Dateistand (ohne Lock, s. flush)
+    def _replay(self, players: Dict[str, Dict[str, Any]], ops: Iterable[Op]) -> None:
+        for op in ops:
+            if op[0] == "score":
+                self._apply_score(players, op[1])
+            else:
+                self._apply_session(players, op[1], op[2])
+
+    @staticmethod
+    def _agg(players: Dict[str, Dict[str, Any]], spieler: Any) -> Optional[Dict[str, Any]]:
+        if not isinstance(spieler, str):
+            return None
+        agg = players.get(spieler.lower())
+        if agg is None:
+            agg = players[spieler.lower()] = _new_agg(spieler)
+        return agg
+
+    def _apply_score(self, players: Dict[str, Dict[str, Any]], entry: Dict[str, Any]) -> None:
+        agg = self._agg(players, entry.get("spieler"))
+        if agg is None:
+            return
+        punkte = _int(entry.get("punkte"))
+        agg["scores"] += 1
+        agg["summe"] += punkte
+        agg["best"] = punkte if agg["best"] is None else max(agg["best"], punkte)
+        aufgaben, richtig, op, klasse = _score_beitrag(entry)
+        self._add_counts(agg, aufgaben, richtig, op, klasse, 1)
+        if klasse is not None:
+            k = agg["klassen"][klasse]
+            k["scores"] += 1
+            k["summe"] += punkte
+            k["best"] = punkte if k["best"] is None else max(k["best"], punkte)
+        agg["zuletzt"] = entry.get("datum") or agg["zuletzt"]
+
+    def _apply_session(self, players: Dict[str, Dict[str, Any]], spieler: str, session: Dict[str, Any]) -> None:
+        agg = self._agg(players, spieler)
+        if agg is None:
+            return
+        sid = session.get("sessionId")
+        last = agg["letzteSession"]
+        if sid is not None and last is not None and last["sessionId"] == sid:
+            self._add_counts(agg, *last["beitrag"], -1)  # neuer Stand derselben Session
+        else:
+            agg["sessions"] += 1
+        beitrag = _session_beitrag(session)
+        self._add_counts(agg, *beitrag, 1)
+        agg["letzteSession"] = {"sessionId": sid, "beitrag": list(beitrag)}
+        agg["zuletzt"] = session.get("datumEnde") or session.get("datum") or agg["zuletzt"]
+
+    @staticmethod
+    def _add_counts(agg: Dict[str, Any], aufgaben: int, richtig: int, op: Optional[str],
+                    klasse: Optional[str], sign: int) -> None:
+        if klasse is not None and klasse not in agg["klassen"]:
+            agg["klassen"][klasse] = {"scores": 0, "summe": 0, "best": None, "aufgaben": 0, "richtig": 0}
+        if not aufgaben:
+            return
+        agg["aufgaben"] += sign * aufgaben
+        agg["richtig"] += sign * richtig
+        if op is not None:
+            o = agg["operatoren"].setdefault(op, {"aufgaben": 0, "richtig": 0})
+            o["aufgaben"] += sign * aufgaben
+            o["richtig"] += sign * richtig
+        if klasse is not None:
+            k = agg["klassen"][klasse]
+            k["aufgaben"] += sign * aufgaben
+            k["richtig"] += sign * richtig
+
+    # ------------------------------------------------------------------
+    # Abfrage
+    # ------------------------------------------------------------------
+    def get(self, spieler: str) -> Optional[Dict[str, Any]]:
+        if not self._ensure_loaded():
+            self._revalidate()
+        with self.lock:
+            agg = self._players.get(spieler.lower())
+            if agg is None:
+                return None
+            return {
+                "spieler": agg["spieler"],
+                "scores": {
+                    "anzahl": agg["scores"],
+                    "summe": agg["summe"],
+                    "best": agg["best"],
+                    "durchschnitt": round(agg["summe"] / agg["scores"], 2) if agg["scores"] else None,
+                },
+                "sessions": agg["sessions"],
+                "aufgaben": agg["aufgaben"],
+                "richtig": agg["richtig"],
+                "quote": _quote(agg["richtig"], agg["aufgaben"]),
+                "operatoren": {
+                    op: dict(o, quote=_quote(o["richtig"], o["aufgaben"]))
+                    for op, o in agg["operatoren"].items() if o["aufgaben"]
+                },
+                "klassen": {
+                    k: {
+                        "scores": v["scores"],
+                        "best": v["best"],
+                        "durchschnitt": round(v["summe"] / v["scores"], 2) if v["scores"] else None,
+                        "aufgaben": v["aufgaben"],
+                        "richtig": v["richtig"],
+                        "quote": _quote(v["richtig"], v["aufgaben"]),
+                    }
+                    for k, v in agg["klassen"].items()
+                },
+                "zuletzt": agg["zuletzt"],
+            }
+
+    # ------------------------------------------------------------------
+    # Persistenz
+    # ------------------------------------------------------------------
+    def _mark_dirty(self) -> None:
+        self._dirty = True
+        if not self.path:
+            return
+        if self._closed:
+            self.flush()  # nach dem Shutdown kein Hintergrund-Thread mehr
+            return
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="player-stats-flusher", daemon=True)
+            self._thread.start()
+
+    def flush(self) -> None:
+        """
+        Offene Änderungen unter file_lock auf den aktuellen Dateistand anwenden und schreiben.
+        Unter `lock` werden nur die offenen Änderungen übernommen – Lesen, Mischen und das
+        fsync'te Schreiben laufen ohne ihn, Speichern (add_*) wartet nicht darauf.
+        """
+        if not self.path:
+            return
+        with self.lock:
+            if not self._dirty:
+                return
+            ops, self._pending = self._pending, []
+            replace, self._replace = self._replace, False
+            known_sig = self._sig
+            # Ganzer eigener Stand nur, wenn es nichts zum Mischen gibt (Neuaufbau, noch keine Datei)
+            full = copy.deepcopy(self._players) if replace or _file_sig(self.path) is None else None
+            self._dirty = False
+        corrupt = False
+        try:
+            with file_lock(self.path):
+                data = None if replace else read_json(self.path, None)
+                if _valid(data):
+                    players = data.get("spieler") or {}
+                    self._replay(players, ops)
+                    changed = _file_sig(self.path) != known_sig
+                elif full is not None:
+                    players, changed = full, False
+                else:
+                    corrupt = True
+                    raise ValueError("Statistik-Datei unlesbar – nächster Lauf schreibt den eigenen Stand")
+                atomic_write_json(self.path, {"version": STATS_VERSION, "spieler": players},
+                                  ensure_ascii=False, separators=(",", ":"))
+                sig = _file_sig(self.path)
+        except Exception:
+            log.error("Spielerstatistik konnte nicht gespeichert werden: %s", self.path, exc_info=True)
+            with self.lock:
+                self._pending = ops + self._pending
+                self._replace = self._replace or replace or corrupt
+                self._dirty = True
+            return
+        with self.lock:
+            # Inzwischen neu aufgebaut oder von einem späteren Lauf überschrieben: _revalidate lädt nach
+            if self._replace or _file_sig(self.path) != sig:
+                return
+            # Geschriebener Stand + was seitdem dazukam (andere Worker sind damit eingelesen)
+            self._players = players
+            self._replay(self._players, self._pending)
+            self._sig, self._checked = sig, time.monotonic()
+            if changed:
+                self.reloads += 1
+
+    def _run(self) -> None:
+        while not self._wake.wait(self.flush_sek):
+            self.flush()
+
+    def close(self) -> None:
+        self._closed = True
+        self._wake.set()
+        t = self._thread
+        if t is not None and t.is_alive():
+            t.join()
+        self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"loaded": self._loaded, "players": len(self._players), "dirty": self._dirty,
+                "pending": len(self._pending), "reloads": self.reloads}
+
+
+PLAYER_STATS = PlayerStats(lambda: get_store().all_scores(), lambda: get_store().all_sessions())
+
+
+if __name__ == "__main__":
+    # python player_stats.py rebuild   (nutzt das über ZP_SCORES_STORAGE gewählte Backend)
+    if sys.argv[1:] != ["rebuild"]:
+        print("Aufruf: python player_stats.py rebuild")
+        sys.exit(2)
+    n = PLAYER_STATS.rebuild()
+    PLAYER_STATS.close()
+    print(f"{n} Spieler neu berechnet → {PLAYER_STATS.path}")
@@ -0,0 +1,214 @@
+# C:\Users\mnold_t1ohvc3\Documents\zahlenpirat-backend\profiling.py
+"""
+Profil einzelner Anfragen auf Zuruf – ohne Neustart und ohne Zusatzpaket.
+
+Auslöser (ProfilingMiddleware):
+  - Header `X-Profile: <token>` oder Query `?profile=<token>` – nur mit gesetztem ZP_PROFILE_TOKEN
+  - Stichprobe: ZP_PROFILE_SAMPLE = Anteil aller Anfragen (0.01 = jede hundertste, Standard 0);
+    der einzige Auslöser ohne Token
+
+Während der Anfrage tastet ein Hintergrund-Thread alle ZP_PROFILE_INTERVAL_MS die Stacks der
+Event-Loop und der I/O-Pool-Threads (run_io) ab – so tauchen auch JSON-Parsing und Datei-I/O im
+Pool auf, die cProfile auf dem Loop-Thread nicht sähe. Ergebnis sind "collapsed stacks"
+(`thread;datei:funktion;... anzahl`), direkt lesbar für flamegraph.pl, speedscope oder inferno.
+
+Es läuft höchstens ein Profil gleichzeitig; weitere markierte Anfragen laufen ungemessen.
+Parallele Anfragen auf derselben Event-Loop erscheinen im Profil mit.
+
+Die Profile liegen als Ring unter ZP_PROFILE_DIR (<id>.folded + <id>.json mit Kopfdaten),
+ältere als die letzten ZP_PROFILE_KEEP werden gelöscht. Die Antwort trägt `X-Profile-Id`.
+Abrufbar über /admin/profiles mit Header `X-Profile-Token` – ohne ZP_PROFILE_TOKEN gesperrt.
+"""
+import hmac, json, os, random, re, sys, threading, time, logging
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional
+from urllib.parse import parse_qs
+
+from io_executor import run_io
+from json_files import atomic_write_bytes
+
+log = logging.getLogger(__name__)
+
+PROFILE_DIR = os.getenv("ZP_PROFILE_DIR", os.path.join("data", "profiles"))
+PROFILE_KEEP = max(1, int(os.getenv("ZP_PROFILE_KEEP", "50")))
+PROFILE_SAMPLE = float(os.getenv("ZP_PROFILE_SAMPLE", "0"))
+PROFILE_INTERVAL = float(os.getenv("ZP_PROFILE_INTERVAL_MS", "1")) / 1000
+PROFILE_TOKEN = os.getenv("ZP_PROFILE_TOKEN", "")
+MAX_DEPTH = 128
+
+IO_THREAD_PREFIX = "zp-io"   # Namenspräfix der run_io-Threads (io_executor.py)
+
+_SAFE_ID = re.compile(r"[0-9]{13}-[0-9a-f]{6}")
+
+# Ein Profil zur Zeit – der Sampler sieht alle Threads, zwei Profile würden sich gegenseitig messen
+_active = threading.Lock()
+
+
+def _frame_label(frame: Any) -> str:
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+def _stack(frame: Any) -> List[str]:
+    out: List[str] = []
+    while frame is not None and len(out) < MAX_DEPTH:
+        out.append(_frame_label(frame))
+        frame = frame.f_back
+    out.reverse()
+    return out
+
+
+class StackSampler:
+    """Tastet periodisch die Stacks ausgewählter Threads ab und zählt gleiche Stacks."""
+
+    def __init__(self, loop_thread: int, interval: float = PROFILE_INTERVAL):
+        self.loop_thread = loop_thread
+        self.interval = interval
+        self.counts: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="zp-profiler", daemon=True)
+
+    def _targets(self) -> Dict[int, str]:
+        targets = {self.loop_thread: "loop"}
+        for t in threading.enumerate():
+            if t.name.startswith(IO_THREAD_PREFIX) and t.ident is not None:
+                targets[t.ident] = t.name
+        return targets
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            targets = self._targets()
+            frames = sys._current_frames()
+            for ident, name in targets.items():
+                frame = frames.get(ident)
+                if frame is None:
+                    continue
+                stack = _stack(frame)
+                # wartende Pool-Threads (_worker ohne Auftrag) sind kein Befund
+                if ident != self.loop_thread and stack and stack[-1] == "thread.py:_worker":
+                    continue
+                self.counts[";".join([name, *stack])] += 1
+            self.samples += 1
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {n}\n" for stack, n in sorted(self.counts.items()))
+
+
+# ======================
+# Ablage (Ring auf der Platte)
+# ======================
+
+def _new_id() -> str:
+    return f"{int(time.time() * 1000):013d}-{random.getrandbits(24):06x}"
+
+
+def _ids() -> List[str]:
+    try:
+        names = os.listdir(PROFILE_DIR)
+    except OSError:
+        return []
+    return sorted(n[:-7] for n in names if n.endswith(".folded") and _SAFE_ID.fullmatch(n[:-7]))
+
+
+def save_profile(profile_id: str, folded: str, meta: Dict[str, Any]) -> None:
+    """Profil + Kopfdaten schreiben und den Ring auf PROFILE_KEEP kürzen. Blockierend → run_io."""
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    body = json.dumps(meta, ensure_ascii=False).encode("utf-8")
+    atomic_write_bytes(os.path.join(PROFILE_DIR, f"{profile_id}.json"), body, lock=False)
+    atomic_write_bytes(os.path.join(PROFILE_DIR, f"{profile_id}.folded"), folded.encode("utf-8"), lock=False)
+    for old in _ids()[:-PROFILE_KEEP]:
+        for ext in (".folded", ".json"):
+            try:
+                os.remove(os.path.join(PROFILE_DIR, old + ext))
+            except OSError:
+                pass
+
+
+def list_profiles() -> List[Dict[str, Any]]:
+    """Kopfdaten aller gespeicherten Profile, neueste zuerst."""
+    out: List[Dict[str, Any]] = []
+    for pid in reversed(_ids()):
+        try:
+            with open(os.path.join(PROFILE_DIR, f"{pid}.json"), "r", encoding="utf-8") as f:
+                out.append(json.load(f))
+        except (OSError, ValueError):
+            out.append({"id": pid})
+    return out
+
+
+def read_profile(profile_id: str) -> Optional[str]:
+    if not _SAFE_ID.fullmatch(profile_id):
+        return None
+    try:
+        with open(os.path.join(PROFILE_DIR, f"{profile_id}.folded"), "r", encoding="utf-8") as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def token_ok(value: Optional[str]) -> bool:
+    """Passendes ZP_PROFILE_TOKEN? Ohne gesetztes Token immer False (Auslöser + Admin-Routen aus)."""
+    return bool(PROFILE_TOKEN) and value is not None and hmac.compare_digest(value, PROFILE_TOKEN)
+
+
+# ======================
+# Middleware
+# ======================
+
+class ProfilingMiddleware:
+    def __init__(self, app: Any):
+        self.app = app
+
+    def _requested(self, scope: Dict[str, Any]) -> bool:
+        if PROFILE_TOKEN:
+            for name, value in scope.get("headers") or ():
+                if name == b"x-profile":
+                    return token_ok(value.decode("latin-1"))
+            qs = scope.get("query_string") or b""
+            if b"profile=" in qs:
+                return any(token_ok(v) for v in parse_qs(qs.decode("latin-1")).get("profile", []))
+        return PROFILE_SAMPLE > 0 and random.random() < PROFILE_SAMPLE
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable, send: Callable) -> None:
+        if scope["type"] != "http" or not self._requested(scope) or not _active.acquire(blocking=False):
+            await self.app(scope, receive, send)
+            return
+        profile_id = _new_id()
+        status = 500
+
+        async def _send(message: Dict[str, Any]) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message = dict(message, headers=[*message.get("headers", []), (b"x-profile-id", profile_id.encode())])
+            await send(message)
+
+        sampler = StackSampler(threading.get_ident())
+        start = time.perf_counter()
+        sampler.start()
+        try:
+            await self.app(scope, receive, _send)
+        finally:
+            sampler.stop()
+            _active.release()
+            meta = {
+                "id": profile_id,
+                "method": scope["method"],
+                "path": scope["path"],
+                "status": status,
+                "dauerMs": round((time.perf_counter() - start) * 1000, 2),
+                "samples": sampler.samples,
+                "intervalMs": sampler.interval * 1000,
+            }
+            try:
+                await run_io(save_profile, profile_id, sampler.collapsed(), meta)
+            except OSError:
+                log.warning("Profil konnte nicht gespeichert werden: %s", profile_id, exc_info=True)
@@ -0,0 +1,214 @@
+# C:\Users\mnold_t1ohvc3\Documents\zahlenpirat-backend\quiz_sessions.py
+"""
+Laufende Tests (/test/start, /test/answer, /test/answers:batch).
+
+/test/start legt die Aufgaben kompakt (TaskBatch, spaltenweise) samt Index taskId → Position,
+Timer und Punktestand ab; Antworten werden gegen diesen Index geprüft, ohne etwas zu laden.
+Sessions liegen im begrenzten SessionStore (TTL/LRU) und werden beim Abschluss genau einmal
+als Score gespeichert. Mit ZP_SESSION_BACKEND=sqlite liegen sie wie die Chat-Sessions in einer
+gemeinsamen SQLite-Datei (ZP_QUIZ_DB_FILE), damit jeder Worker /test/answer beantworten kann;
+nach jeder Änderung ist dann `QUIZ_SESSIONS.save()` nötig.
+"""
+import json, os, time, uuid
+from dataclasses import dataclass, field, fields
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from session_store import SESSION_BACKEND, SessionStore, SqliteSessionStore
+from task_generator import TaskBatch
+
+PUNKTE_RICHTIG = 10
+PUNKTE_FALSCH = -5
+
+QUIZ_TTL_SEK = float(os.getenv("ZP_QUIZ_TTL_SEK", "3600"))     # Leerlauf, danach verfällt der Test
+QUIZ_MAX = int(os.getenv("ZP_QUIZ_MAX", "20000"))              # gleichzeitige Tests (LRU)
+QUIZ_GRACE_SEK = float(os.getenv("ZP_QUIZ_GRACE_SEK", "30"))   # Nachfrist nach Ablauf des Timers
+QUIZ_DB_FILE = os.getenv("ZP_QUIZ_DB_FILE", os.path.join("data", "quiz_sessions.db"))
+
+TASK_ID_PREFIX = "t"
+
+
+@dataclass(slots=True)
+class QuizSession:
+    spieler: Optional[str] = None
+    klasse: Optional[int] = None
+    modus: str = "Test"
+    punkte: int = 0
+    richtig: int = 0
+    falsch: int = 0
+    dauer_sek: float = 0.0
+    # taskId → Detail im ResultJson-Format (Einfügereihenfolge = Antwortreihenfolge)
+    ergebnisse: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    gespeichert: bool = False
+
+    # Nur bei /test/start: Aufgaben, Index taskId → Position, Timer
+    schwierigkeit: Optional[str] = None
+    zahlenauswahl: Optional[str] = None
+    aufgaben: Optional[TaskBatch] = None
+    index: Dict[str, int] = field(default_factory=dict)
+    timer_sek: int = 0
+    gestartet: float = 0.0
+
+
+def start_session(batch: TaskBatch, spieler: Optional[str] = None, klasse: Optional[int] = None,
+                  modus: str = "Test", schwierigkeit: Optional[str] = None,
+                  zahlenauswahl: Optional[str] = None, timer_sek: int = 0) -> Tuple[str, QuizSession]:
+    session_id = uuid.uuid4().hex
+    session = QuizSession(
+        spieler=spieler, klasse=klasse, modus=modus,
+        schwierigkeit=schwierigkeit, zahlenauswahl=zahlenauswahl,
+        aufgaben=batch,
+        index={f"{TASK_ID_PREFIX}{i + 1}": i for i in range(len(batch))},
+        timer_sek=timer_sek or 0,
+        gestartet=time.time(),
+    )
+    QUIZ_SESSIONS.put(session_id, session)
+    return session_id, session
+
+
+def lookup(session: QuizSession, task_id: str) -> Optional[Tuple[str, str, str]]:
+    """(frage, loesung, operator) der Aufgabe oder None – O(1) über den Index."""
+    i = session.index.get(task_id)
+    if i is None or session.aufgaben is None:
+        return None
+    b = session.aufgaben
+    return b.frage(i), str(b.loesung[i]), b.ops[i]
+
+
+def zeit_abgelaufen(session: QuizSession, now: Optional[float] = None) -> bool:
+    if session.timer_sek <= 0 or not session.gestartet:
+        return False
+    return (now or time.time()) - session.gestartet > session.timer_sek + QUIZ_GRACE_SEK
+
+
+def grade(session: QuizSession, task_id: str, antwort: Optional[str], loesung: str,
+          dauer_sek: Optional[float] = None, frage: Optional[str] = None,
+          operator: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Eine Antwort werten und auf den Session-Stand buchen. Eine bereits gewertete Aufgabe
+    wird nicht erneut gezählt (Wiederholung nach Netzwerkfehler) – es kommt das alte Detail zurück.
+    """
+    done = session.ergebnisse.get(task_id)
+    if done is not None:
+        return done
+    korrekt = antwort is not None and antwort.strip() == loesung.strip()
+    delta = PUNKTE_RICHTIG if korrekt else PUNKTE_FALSCH
+    session.punkte = max(0, session.punkte + delta)
+    if korrekt:
+        session.richtig += 1
+    else:
+        session.falsch += 1
+    session.dauer_sek += dauer_sek or 0
+    detail = {
+        "taskId": task_id,
+        "frage": frage,
+        "korrekt": korrekt,
+        "antwort": antwort,
+        "loesung": loesung,
+        "dauerSek": dauer_sek,
+        "punkte": delta,
+    }
+    if operator is not None:
+        detail["operator"] = operator
+    session.ergebnisse[task_id] = detail
+    return detail
+
+
+def note_fuer(richtig: int, gesamt: int) -> Optional[str]:
+    if gesamt <= 0:
+        return None
+    quote = richtig / gesamt
+    if quote >= 1:
+        return "Sehr gut"
+    if quote >= 0.8:
+        return "Gut"
+    if quote >= 0.6:
+        return "Befriedigend"
+    if quote >= 0.4:
+        return "Ausreichend"
+    return "Ungenügend"
+
+
+def result_json(session_id: str, session: QuizSession,
+                details: Optional[Iterable[Dict[str, Any]]] = None) -> Dict[str, Any]:
+    """ResultJson laut API-Spezifikation; ohne `details` alle bisherigen Ergebnisse."""
+    aufgaben = session.richtig + session.falsch
+    out: List[Dict[str, Any]] = list(session.ergebnisse.values() if details is None else details)
+    return {
+        "sessionId": session_id,
+        "summary": {
+            "aufgaben": aufgaben,
+            "richtig": session.richtig,
+            "falsch": session.falsch,
+            "gesamtpunkte": session.punkte,
+            "note": note_fuer(session.richtig, aufgaben),
+            "dauerSek": round(session.dauer_sek) if aufgaben else None,
+        },
+        "details": out,
+        "generatedAt": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+    }
+
+
+def score_entry(session: QuizSession, schwierigkeit: Optional[str] = None,
+                zahlenauswahl: Optional[str] = None) -> Dict[str, Any]:
+    """Score-Zeile für scores.json/Store (gleiches Format wie /save)."""
+    operatoren: List[str] = []
+    for d in session.ergebnisse.values():
+        op = d.get("operator")
+        if op and op not in operatoren:
+            operatoren.append(op)
+    return {
+        "spieler": session.spieler or "Anonymer Matrose",
+        "punkte": session.punkte,
+        "klasse": session.klasse,
+        "modus": session.modus,
+        "operatoren": operatoren,
+        "schwierigkeit": schwierigkeit or session.schwierigkeit or "Einfach",
+        "zahlenauswahl": zahlenauswahl or session.zahlenauswahl or "1-20",
+        "kategorie": 1,
+        "dauer": f"{round(session.dauer_sek)} Sek",
+        "aufgaben": session.richtig + session.falsch,
+        "richtig": session.richtig,
+        "autosave": True,
+        "datum": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+    }
+
+
+# ======================
+# Gemeinsames Backend (mehrere Worker)
+# ======================
+
+# Ohne `index`: der ergibt sich aus der Anzahl Aufgaben (t1 … tN, s. start_session)
+_QUIZ_FIELDS = tuple(f.name for f in fields(QuizSession) if f.name != "index")
+
+
+def _encode_session(session: QuizSession) -> str:
+    # Kompakt: Werte in Feldreihenfolge als JSON-Array, Aufgaben spaltenweise
+    values = []
+    for name in _QUIZ_FIELDS:
+        v = getattr(session, name)
+        if name == "aufgaben" and v is not None:
+            v = [v.ops, v.a, v.b, v.loesung]
+        values.append(v)
+    return json.dumps(values, ensure_ascii=False, separators=(",", ":"))
+
+
+def _decode_session(raw: str) -> Optional[QuizSession]:
+    values = json.loads(raw)
+    if len(values) != len(_QUIZ_FIELDS):
+        return None  # älteres/neueres Format → wie abgelaufen
+    data = dict(zip(_QUIZ_FIELDS, values))
+    if data["aufgaben"] is not None:
+        data["aufgaben"] = TaskBatch(*data["aufgaben"])
+        data["index"] = {f"{TASK_ID_PREFIX}{i + 1}": i for i in range(len(data["aufgaben"]))}
+    return QuizSession(**data)
+
+
+# Laufende Tests (verfallen nach Leerlauf, begrenzte Anzahl); im Prozess oder – mit
+# ZP_SESSION_BACKEND=sqlite – geteilt zwischen allen Workern (eigene Datei, eigene Limits)
+if SESSION_BACKEND == "sqlite":
+    QUIZ_SESSIONS: "SessionStore[QuizSession]" = SqliteSessionStore(
+        QuizSession, _encode_session, _decode_session, path=QUIZ_DB_FILE,
+        ttl=QUIZ_TTL_SEK, max_entries=QUIZ_MAX, name="quiz")
+else:
+    QUIZ_SESSIONS = SessionStore(QuizSession, ttl=QUIZ_TTL_SEK, max_entries=QUIZ_MAX, name="quiz")
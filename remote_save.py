@@ -0,0 +1,395 @@
+# C:\Users\mnold_t1ohvc3\Documents\zahlenpirat-backend\remote_save.py
+"""
+Ausgehende Speicherungen für /saveWithFallback.
+
+- ein gemeinsamer httpx.AsyncClient mit Keep-Alive-Pool (kein neuer TCP/TLS-Handshake pro Aufruf)
+- Basis-URL über ZP_REMOTE_BASE_URL (z. B. https://<dein-render-service>.onrender.com oder
+  http://127.0.0.1:9000 für einen lokalen Stub-Server); ohne sie wird nur lokal gespeichert
+- Circuit Breaker: nach ZP_REMOTE_FAIL_MAX Fehlschlägen in Folge wird der Remote-Dienst
+  ZP_REMOTE_RESET_SEK Sekunden lang gar nicht erst versucht, danach genau ein Probe-Aufruf.
+  Als Fehlschlag zählen nur Verbindungsfehler/Timeouts und 5xx-Antworten.
+- Outbox (JSONL): was remote nicht ankam, wird lokal gespeichert, vorgemerkt und später
+  gebündelt nachgeschickt. Lehnt der Dienst einen Eintrag ab (4xx), kommt er in die
+  Dead-Letter-Datei <outbox>.dead statt die Outbox zu blockieren.
+"""
+import asyncio, json, os, threading, time, logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import httpx
+
+from json_files import atomic_write_bytes, file_lock
+
+log = logging.getLogger(__name__)
+
+REMOTE_BASE_URL = os.getenv("ZP_REMOTE_BASE_URL", "")  # "" = kein Remote-Dienst, nur lokal speichern
+REMOTE_TIMEOUT_SEK = float(os.getenv("ZP_REMOTE_TIMEOUT_SEK", "5"))
+REMOTE_MAX_CONNECTIONS = int(os.getenv("ZP_REMOTE_MAX_CONNECTIONS", "20"))
+REMOTE_FAIL_MAX = int(os.getenv("ZP_REMOTE_FAIL_MAX", "3"))
+REMOTE_RESET_SEK = float(os.getenv("ZP_REMOTE_RESET_SEK", "30"))
+OUTBOX_FILE = os.getenv("ZP_OUTBOX_FILE", os.path.join("data", "outbox.jsonl"))
+OUTBOX_BATCH = int(os.getenv("ZP_OUTBOX_BATCH", "50"))
+OUTBOX_REPLAY_SEK = float(os.getenv("ZP_OUTBOX_REPLAY_SEK", "30"))
+# Claim eines Workers gilt danach als verwaist; muss deutlich über 2 × ZP_REMOTE_TIMEOUT_SEK liegen
+OUTBOX_CLAIM_STALE_SEK = float(os.getenv("ZP_OUTBOX_CLAIM_STALE_SEK", "600"))
+
+
+class CircuitBreaker:
+    """
+    closed → (fail_max Fehler in Folge) → open → (reset_sek abgelaufen) → half_open
+    half_open lässt genau einen Probe-Aufruf durch: Erfolg → closed, Fehler → wieder open.
+    """
+
+    def __init__(self, fail_max: int = REMOTE_FAIL_MAX, reset_sek: float = REMOTE_RESET_SEK):
+        self.fail_max = fail_max
+        self.reset_sek = reset_sek
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probe = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_sek:
+                self.state = "half_open"
+                self._probe = False
+            if self.state == "half_open" and not self._probe:
+                self._probe = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+            self._probe = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.fail_max:
+                self.state = "open"
+                self.opened_at = time.monotonic()
+                self._probe = False
+
+
+class Outbox:
+    """
+    Fehlgeschlagene Remote-Speicherungen als JSONL; ältester Eintrag zuerst.
+
+    Mehrere Worker schicken aus derselben Datei nach: `claim` verschiebt eine Charge unter dem
+    Datei-Lock in <outbox>.claim-<pid>, nur dieser Worker schickt sie und streicht jeden
+    erledigten Eintrag (`ack`); Unverschicktes geht per `release` zurück an den Anfang.
+    Claims abgestürzter Worker (älter als ZP_OUTBOX_CLAIM_STALE_SEK) holt `claim` zurück.
+    """
+
+    def __init__(self, path: str = OUTBOX_FILE, claim_stale_sek: float = OUTBOX_CLAIM_STALE_SEK):
+        self.path = path
+        self.claim_stale_sek = claim_stale_sek
+
+    def append(self, item: Dict[str, Any]) -> None:
+        line = json.dumps(item, ensure_ascii=False, separators=(",", ":")) + "\n"
+        d = os.path.dirname(self.path)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        with file_lock(self.path):
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+
+    def dead_letter(self, item: Dict[str, Any], reason: str) -> None:
+        """Vom Remote-Dienst abgelehnten Eintrag beiseitelegen (<outbox>.dead) – wird nie nachgeschickt."""
+        line = json.dumps({"item": item, "grund": reason, "zeit": time.time()},
+                          ensure_ascii=False, separators=(",", ":")) + "\n"
+        dead = self.path + ".dead"
+        with file_lock(dead):
+            with open(dead, "a", encoding="utf-8") as f:
+                f.write(line)
+
+    # --- Chargen je Worker ---
+    def _claim_path(self) -> str:
+        return f"{self.path}.claim-{os.getpid()}"
+
+    def claim(self, n: int) -> List[Dict[str, Any]]:
+        """Bis zu `n` Einträge für diesen Worker reservieren; ein eigener Rest kommt zuerst."""
+        own = self._claim_path()
+        with file_lock(self.path):
+            self._recover_stale(own)
+            items = self._read(own)
+            if items:
+                return items
+            queued = self._read(self.path)
+            items = queued[:n]
+            if items:
+                self._write(own, items)
+                self._write(self.path, queued[n:])
+            return items
+
+    def ack(self, remaining: List[Dict[str, Any]]) -> None:
+        """Claim nach jedem erledigten Eintrag auf die noch offenen kürzen."""
+        own = self._claim_path()
+        with file_lock(self.path):
+            if remaining:
+                self._write(own, remaining)
+            else:
+                self._remove(own)
+
+    def release(self, items: List[Dict[str, Any]]) -> None:
+        """Nicht verschickte Einträge zurück an den Anfang der Outbox (Reihenfolge bleibt)."""
+        with file_lock(self.path):
+            if items:
+                self._write(self.path, items + self._read(self.path))
+            self._remove(self._claim_path())
+
+    def _recover_stale(self, own: str) -> None:
+        d = os.path.dirname(self.path) or "."
+        prefix = os.path.basename(self.path) + ".claim-"
+        try:
+            names = [n for n in os.listdir(d) if n.startswith(prefix) and not n.endswith(".lock")]
+        except OSError:
+            return
+        now = time.time()
+        stale = []
+        for name in names:
+            p = os.path.join(d, name)
+            try:
+                mtime = os.path.getmtime(p)
+            except OSError:
+                continue
+            if p != own and now - mtime > self.claim_stale_sek:
+                stale.append((mtime, p))
+        if not stale:
+            return
+        recovered: List[Dict[str, Any]] = []
+        for _, p in sorted(stale):
+            recovered.extend(self._read(p))
+        self._write(self.path, recovered + self._read(self.path))
+        for _, p in stale:
+            self._remove(p)
+        log.warning("Outbox: %d Einträge aus verwaisten Claims zurückgeholt", len(recovered))
+
+    def __len__(self) -> int:
+        return len(self._read(self.path))
+
+    def _write(self, path: str, items: List[Dict[str, Any]]) -> None:
+        # Aufrufer halten schon den Outbox-Lock – der gilt auch für die Claim-Dateien
+        atomic_write_bytes(path, "".join(
+            json.dumps(item, ensure_ascii=False, separators=(",", ":")) + "\n" for item in items
+        ).encode("utf-8"), lock=False)
+
+    @staticmethod
+    def _remove(path: str) -> None:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def _read(self, path: str) -> List[Dict[str, Any]]:
+        if not os.path.exists(path):
+            return []
+        out: List[Dict[str, Any]] = []
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    out.append(json.loads(line))
+                except json.JSONDecodeError:
+                    log.warning("Ungültige Outbox-Zeile in %s übersprungen", path)
+        return out
+
+
+class RemoteUnavailable(Exception):
+    """Remote-Dienst nicht erreichbar (Verbindung/Timeout/5xx) – zählt für den Circuit Breaker."""
+
+
+class RemoteRejected(Exception):
+    """Remote-Dienst lehnt den Eintrag ab (4xx) – ein erneuter Versuch ändert daran nichts."""
+
+
+class RemoteSaver:
+    def __init__(
+        self,
+        local_save: Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]],
+        base_url: str = REMOTE_BASE_URL,
+        timeout: float = REMOTE_TIMEOUT_SEK,
+        max_connections: int = REMOTE_MAX_CONNECTIONS,
+        breaker: Optional[CircuitBreaker] = None,
+        outbox: Optional[Outbox] = None,
+        batch: int = OUTBOX_BATCH,
+        replay_interval: float = OUTBOX_REPLAY_SEK,
+        run_io: Optional[Callable[..., Awaitable[Any]]] = None,
+    ):
+        self.local_save = local_save
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.max_connections = max_connections
+        # `is not None`: eine leere Outbox ist falsy (__len__)
+        self.breaker = breaker if breaker is not None else CircuitBreaker()
+        self.outbox = outbox if outbox is not None else Outbox()
+        self.batch = batch
+        self.replay_interval = replay_interval
+        self._run_io = run_io
+        self._client: Optional[httpx.AsyncClient] = None
+        self._replayer: Optional[asyncio.Task] = None
+        self.replayed = 0
+        self.rejected = 0
+
+    # ------------------------------------------------------------------
+    # Client
+    # ------------------------------------------------------------------
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=self.max_connections,
+                                    max_keepalive_connections=self.max_connections),
+            )
+        return self._client
+
+    async def _io(self, fn: Callable[..., Any], *args: Any) -> Any:
+        if self._run_io is None:
+            return fn(*args)
+        return await self._run_io(fn, *args)
+
+    # ------------------------------------------------------------------
+    # Speichern
+    # ------------------------------------------------------------------
+    @property
+    def enabled(self) -> bool:
+        return bool(self.base_url)
+
+    async def save(self, sessionData: Dict[str, Any]) -> Dict[str, Any]:
+        """Remote speichern (/save, sonst /postSaveExtended); sonst lokal + Outbox."""
+        if not self.enabled:
+            local = await self.local_save(dict(sessionData))
+            return {"status": local.get("status", "ok"), "source": "local", "data": local}
+        payload = dict(sessionData)
+        if self.breaker.allow():
+            try:
+                source, data = await self._post_remote(payload)
+            except RemoteRejected as e:
+                # Dienst erreichbar, Eintrag aber ungültig → nicht in die Outbox (würde sie blockieren)
+                self.breaker.record_success()
+                log.warning("Remote-Speichern abgelehnt (%s) – nur lokal gespeichert", e)
+                await self._io(self.outbox.dead_letter, payload, str(e))
+                local = await self.local_save(dict(sessionData))
+                return {"status": local.get("status", "ok"), "source": "local", "rejected": True, "data": local}
+            except RemoteUnavailable as e:
+                self.breaker.record_failure()
+                log.warning("Remote-Speichern fehlgeschlagen (%s) – lokal gespeichert, Outbox", e)
+            except Exception:
+                # Unerwartetes (z. B. kaputte Antwort) darf das Speichern nicht verhindern
+                self.breaker.record_failure()
+                log.error("Remote-Speichern fehlgeschlagen – lokal gespeichert, Outbox", exc_info=True)
+            else:
+                self.breaker.record_success()
+                return {"status": "ok", "source": source, "data": data}
+
+        await self._io(self.outbox.append, payload)
+        local = await self.local_save(dict(sessionData))
+        return {"status": local.get("status", "ok"), "source": "local", "queued": True, "data": local}
+
+    async def _post_remote(self, payload: Dict[str, Any]):
+        client = self.client()
+        errors: List[str] = []
+        server_error = False
+        # /save zuerst; antwortet der Dienst mit Fehlerstatus, noch /postSaveExtended.
+        # Ist er gar nicht erreichbar, wird der zweite Pfad nicht mehr versucht.
+        for path in ("/save", "/postSaveExtended"):
+            try:
+                resp = await client.post(path, json=payload)
+            except httpx.TransportError as e:
+                raise RemoteUnavailable(f"{path}: {e!r}") from e
+            if resp.is_success:
+                # 2xx ist angenommen – egal, ob (und was für) ein Body zurückkommt
+                try:
+                    data = resp.json() if resp.content else None
+                except ValueError:
+                    data = resp.text
+                return path, data
+            server_error = server_error or resp.status_code >= 500
+            errors.append(f"{path}: {resp.status_code} {resp.text[:200]}")
+        # Nur Serverfehler sind vorübergehend; lehnen beide Pfade mit 4xx ab, bleibt es dabei
+        raise (RemoteUnavailable if server_error else RemoteRejected)("; ".join(errors))
+
+    # ------------------------------------------------------------------
+    # Outbox nachschicken
+    # ------------------------------------------------------------------
+    async def replay_once(self) -> int:
+        """
+        Bis zu `batch` Einträge nachschicken; bricht beim ersten Fehler ab. Liefert die Anzahl
+        erledigter Einträge (nachgeschickt oder abgelehnt).
+        """
+        items = await self._io(self.outbox.claim, self.batch)
+        if not items:
+            return 0
+        done = rejected = 0
+        try:
+            if not self.breaker.allow():
+                return 0
+            try:
+                for item in items:
+                    try:
+                        await self._post_remote(item)
+                    except RemoteRejected as e:
+                        log.warning("Outbox: Eintrag abgelehnt (%s) – nach %s.dead verschoben", e, self.outbox.path)
+                        await self._io(self.outbox.dead_letter, item, str(e))
+                        rejected += 1
+                    done += 1
+                    await self._io(self.outbox.ack, items[done:])
+            except RemoteUnavailable as e:
+                self.breaker.record_failure()
+                log.info("Outbox: Nachschicken nach %d Einträgen unterbrochen (%s)", done, e)
+            except Exception:
+                self.breaker.record_failure()
+                log.error("Outbox: Nachschicken nach %d Einträgen unterbrochen", done, exc_info=True)
+            else:
+                self.breaker.record_success()
+        finally:
+            if done < len(items):
+                await self._io(self.outbox.release, items[done:])
+            self.replayed += done - rejected
+            self.rejected += rejected
+        return done
+
+    async def _replay_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.replay_interval)
+            try:
+                while await self.replay_once() == self.batch:
+                    pass  # volle Charge → gleich die nächste
+            except Exception:
+                log.error("Outbox: Nachschicken fehlgeschlagen", exc_info=True)
+
+    def start(self) -> None:
+        if not self.enabled:
+            log.info("ZP_REMOTE_BASE_URL nicht gesetzt – /saveWithFallback speichert nur lokal")
+            return
+        if self.replay_interval > 0 and (self._replayer is None or self._replayer.done()):
+            self._replayer = asyncio.get_running_loop().create_task(self._replay_loop())
+
+    async def close(self) -> None:
+        if self._replayer is not None:
+            self._replayer.cancel()
+            try:
+                await self._replayer
+            except asyncio.CancelledError:
+                pass
+            self._replayer = None
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "baseUrl": self.base_url or None,
+            "breaker": self.breaker.state,
+            "failures": self.breaker.failures,
+            "outbox": len(self.outbox),
+            "replayed": self.replayed,
+            "rejected": self.rejected,
+        }
@@ -0,0 +1,292 @@
+# C:\Users\mnold_t1ohvc3\Documents\zahlenpirat-backend\result_export.py
+"""
+Ergebnisdateien für GET /download/result (ResultJson als JSON-Stream oder PDF-Bericht).
+
+- JSON wird stückweise geschrieben (Kopf, Details in Blöcken, Ende) statt als ein großer String
+- das PDF erzeugt ein kleiner eigener Writer (Helvetica, WinAnsi, A4, mehrseitig) – ohne Zusatzpaket
+- PDFs werden pro Session + Inhalts-Hash gemerkt: im Speicher (LRU) und unter
+  ZP_RESULT_CACHE_DIR/<sessionId>/<hash>.pdf. Ändert sich der Test (neue Antworten), ändert sich
+  der Hash; die alte Datei wird ersetzt. Ist die Session schon abgelaufen, wird das zuletzt
+  erzeugte PDF von der Platte ausgeliefert.
+- Die Platte räumt ein Hintergrund-Thread alle ZP_RESULT_CACHE_SWEEP_SEK ab: Sessions, deren PDF
+  älter als ZP_RESULT_CACHE_TTL_SEK ist, und darüber hinaus die ältesten, bis höchstens
+  ZP_RESULT_CACHE_MAX_FILES übrig sind.
+"""
+import hashlib, json, os, re, shutil, threading, time, logging
+from collections import OrderedDict
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from json_files import atomic_write_bytes
+
+log = logging.getLogger(__name__)
+
+RESULT_CACHE_DIR = os.getenv("ZP_RESULT_CACHE_DIR", os.path.join("data", "results"))  # "" = nur Speicher
+RESULT_CACHE_MAX = int(os.getenv("ZP_RESULT_CACHE_MAX", "256"))                        # PDFs im Speicher
+RESULT_CACHE_TTL_SEK = float(os.getenv("ZP_RESULT_CACHE_TTL_SEK", str(7 * 24 * 3600)))  # PDFs auf der Platte
+RESULT_CACHE_MAX_FILES = int(os.getenv("ZP_RESULT_CACHE_MAX_FILES", "10000"))           # Sessions auf der Platte
+RESULT_CACHE_SWEEP_SEK = float(os.getenv("ZP_RESULT_CACHE_SWEEP_SEK", "600"))
+JSON_CHUNK = 500  # Details pro geschriebenem Block
+
+_SAFE_ID = re.compile(r"[A-Za-z0-9_-]{1,64}")
+
+_cache: "OrderedDict[str, bytes]" = OrderedDict()
+_cache_lock = threading.Lock()
+_sweeper: Optional[threading.Thread] = None
+evicted_files = 0
+
+
+# ======================
+# JSON
+# ======================
+
+def _dumps(obj: Any) -> str:
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+
+
+def iter_result_json(result: Dict[str, Any]) -> Iterator[bytes]:
+    """ResultJson in Blöcken; Feldreihenfolge wie result_json()."""
+    yield f'{{"sessionId":{_dumps(result["sessionId"])},"summary":{_dumps(result["summary"])},"details":['.encode("utf-8")
+    details = result["details"]
+    for i in range(0, len(details), JSON_CHUNK):
+        chunk = ",".join(_dumps(d) for d in details[i:i + JSON_CHUNK])
+        yield (("," if i else "") + chunk).encode("utf-8")
+    yield f'],"generatedAt":{_dumps(result["generatedAt"])}}}'.encode("utf-8")
+
+
+# ======================
+# PDF
+# ======================
+
+_PAGE_W, _PAGE_H = 595, 842  # A4 in Punkt
+_MARGIN = 50
+_LEADING = 14
+_ROWS_PER_PAGE = (_PAGE_H - 2 * _MARGIN) // _LEADING
+
+# Spalten der Aufgabentabelle: (Überschrift, x-Position)
+_COLUMNS: Tuple[Tuple[str, int], ...] = (
+    ("Nr.", 50), ("Aufgabe", 90), ("Antwort", 250), ("Lösung", 320), ("Ergebnis", 390), ("Punkte", 460), ("Zeit", 510),
+)
+
+
+def _pdf_text(s: Any) -> bytes:
+    """String-Literal für PDF: WinAnsi (cp1252, enthält ×, ÷ und Umlaute), Sonderzeichen maskiert."""
+    raw = str(s).encode("cp1252", errors="replace")
+    return b"(" + raw.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)") + b")"
+
+
+def _cell(font: str, size: int, x: float, y: float, text: Any) -> bytes:
+    return b"BT /%s %d Tf 1 0 0 1 %d %d Tm %s Tj ET\n" % (font.encode(), size, x, y, _pdf_text(text))
+
+
+def _fmt(v: Any) -> str:
+    return "–" if v is None or v == "" else str(v)
+
+
+def _rows(result: Dict[str, Any], meta: Dict[str, Any]) -> List[List[Tuple[str, int, int, Any]]]:
+    """Zeilen als Liste von Zellen (font, size, x, text); Seitenumbruch macht render_pdf."""
+    s = result["summary"]
+    lines: List[List[Tuple[str, int, int, Any]]] = [
+        [("F2", 16, _MARGIN, "Zahlenpirat – Testergebnis")],
+        [],
+        [("F1", 10, _MARGIN, f"Spieler: {_fmt(meta.get('spieler'))}"),
+         ("F1", 10, 300, f"Klasse: {_fmt(meta.get('klasse'))}")],
+        [("F1", 10, _MARGIN, f"Modus: {_fmt(meta.get('modus'))}"),
+         ("F1", 10, 300, f"Erstellt: {result['generatedAt']}")],
+        [("F1", 10, _MARGIN, f"Aufgaben: {s['aufgaben']}   Richtig: {s['richtig']}   Falsch: {s['falsch']}"),
+         ("F1", 10, 300, f"Punkte: {s['gesamtpunkte']}   Note: {_fmt(s['note'])}   Dauer: {_fmt(s['dauerSek'])} Sek")],
+        [],
+        [("F2", 10, x, title) for title, x in _COLUMNS],
+    ]
+    for n, d in enumerate(result["details"], start=1):
+        values = (
+            d.get("taskId") or n, d.get("frage"), d.get("antwort"), d.get("loesung"),
+            "richtig" if d.get("korrekt") else "falsch", d.get("punkte"),
+            f"{d['dauerSek']} s" if d.get("dauerSek") is not None else None,
+        )
+        lines.append([("F1", 10, x, _fmt(v)) for (_, x), v in zip(_COLUMNS, values)])
+    return lines
+
+
+def render_pdf(result: Dict[str, Any], meta: Dict[str, Any]) -> bytes:
+    """Minimaler PDF-1.4-Bericht: Kopf mit Zusammenfassung, danach eine Zeile pro Aufgabe."""
+    lines = _rows(result, meta)
+    pages = [lines[i:i + _ROWS_PER_PAGE] for i in range(0, len(lines), _ROWS_PER_PAGE)] or [[]]
+
+    # Objekte: 1 Katalog, 2 Seitenbaum, 3/4 Schriften, dann je Seite (Seite, Inhalt)
+    objects: List[bytes] = [b"", b"",
+                            b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+                            b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>"]
+    kids: List[int] = []
+    for nr, page in enumerate(pages, start=1):
+        y = _PAGE_H - _MARGIN
+        stream = bytearray()
+        for row in page:
+            for font, size, x, text in row:
+                stream += _cell(font, size, x, y, text)
+            y -= _LEADING
+        stream += _cell("F1", 8, _PAGE_W - _MARGIN - 40, _MARGIN // 2, f"Seite {nr}/{len(pages)}")
+        page_id = len(objects) + 1
+        kids.append(page_id)
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] "
+                       b"/Resources << /Font << /F1 3 0 R /F2 4 0 R >> >> /Contents %d 0 R >>"
+                       % (_PAGE_W, _PAGE_H, page_id + 1))
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + bytes(stream) + b"endstream")
+    objects[0] = b"<< /Type /Catalog /Pages 2 0 R >>"
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(b"%d 0 R" % k for k in kids), len(kids))
+
+    out = bytearray(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    offsets: List[int] = []
+    for i, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % i + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % off for off in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+
+# ======================
+# Cache
+# ======================
+
+def content_hash(result: Dict[str, Any], meta: Dict[str, Any]) -> str:
+    """Hash über alles, was im Bericht steht – außer dem Erstellungszeitpunkt."""
+    body = _dumps([meta, result["summary"], result["details"]])
+    return hashlib.sha256(body.encode("utf-8")).hexdigest()[:16]
+
+
+def _session_dir(session_id: str) -> Optional[str]:
+    if not RESULT_CACHE_DIR or not _SAFE_ID.fullmatch(session_id):
+        return None
+    return os.path.join(RESULT_CACHE_DIR, session_id)
+
+
+def _cache_path(session_id: str, digest: str) -> Optional[str]:
+    d = _session_dir(session_id)
+    return os.path.join(d, f"{digest}.pdf") if d is not None else None
+
+
+def _remember(key: str, data: bytes) -> None:
+    with _cache_lock:
+        _cache[key] = data
+        _cache.move_to_end(key)
+        while len(_cache) > RESULT_CACHE_MAX:
+            _cache.popitem(last=False)
+
+
+def _session_files(d: str) -> List[str]:
+    """Gespeicherte PDFs einer Session – nur ihr eigener Ordner wird gelistet."""
+    try:
+        return [n for n in os.listdir(d) if n.endswith(".pdf")]
+    except OSError:
+        return []
+
+
+def _drop_stale_files(d: str, keep: str) -> None:
+    for name in _session_files(d):
+        if name != keep:
+            try:
+                os.remove(os.path.join(d, name))
+            except OSError:
+                pass
+
+
+def sweep() -> int:
+    """Alte Sessions von der Platte löschen (Alter, dann Anzahl); liefert die Anzahl gelöschter."""
+    global evicted_files
+    if not RESULT_CACHE_DIR:
+        return 0
+    try:
+        entries = []
+        with os.scandir(RESULT_CACHE_DIR) as it:
+            for e in it:
+                try:
+                    entries.append((e.stat().st_mtime, e.path, e.is_dir(follow_symlinks=False)))
+                except OSError:
+                    pass
+    except OSError:
+        return 0
+    entries.sort()
+    cutoff = time.time() - RESULT_CACHE_TTL_SEK
+    excess = len(entries) - RESULT_CACHE_MAX_FILES
+    removed = 0
+    for i, (mtime, path, is_dir) in enumerate(entries):
+        if mtime >= cutoff and i >= excess:
+            break  # sortiert: alles Weitere ist jünger und passt in die Obergrenze
+        try:
+            if is_dir:
+                shutil.rmtree(path)
+            else:
+                os.remove(path)  # flache <sessionId>-<hash>.pdf aus älteren Versionen
+            removed += 1
+        except OSError:
+            pass
+    evicted_files += removed
+    return removed
+
+
+def _run_sweeper() -> None:
+    while True:
+        time.sleep(RESULT_CACHE_SWEEP_SEK)
+        try:
+            sweep()
+        except Exception:
+            log.warning("Ergebnis-PDFs konnten nicht aufgeräumt werden", exc_info=True)
+
+
+def _ensure_sweeper() -> None:
+    global _sweeper
+    if _sweeper is not None or RESULT_CACHE_SWEEP_SEK <= 0:
+        return
+    with _cache_lock:
+        if _sweeper is None:
+            _sweeper = threading.Thread(target=_run_sweeper, name="result-pdf-sweeper", daemon=True)
+            _sweeper.start()
+
+
+def pdf_bytes(session_id: str, result: Dict[str, Any], meta: Dict[str, Any]) -> bytes:
+    """PDF aus dem Cache (Speicher, dann Platte) oder neu erzeugen und merken. Blockierend → run_io."""
+    digest = content_hash(result, meta)
+    key = f"{session_id}-{digest}"
+    with _cache_lock:
+        data = _cache.get(key)
+        if data is not None:
+            _cache.move_to_end(key)
+            return data
+    path = _cache_path(session_id, digest)
+    if path is not None and os.path.exists(path):
+        with open(path, "rb") as f:
+            data = f.read()
+    else:
+        data = render_pdf(result, meta)
+        if path is not None:
+            try:
+                atomic_write_bytes(path, data, lock=False)
+                _drop_stale_files(os.path.dirname(path), os.path.basename(path))
+            except OSError:
+                log.warning("Ergebnis-PDF konnte nicht gespeichert werden: %s", path, exc_info=True)
+            _ensure_sweeper()
+    _remember(key, data)
+    return data
+
+
+def cached_pdf(session_id: str) -> Optional[bytes]:
+    """Zuletzt erzeugtes PDF einer (abgelaufenen) Session von der Platte, sonst None."""
+    d = _session_dir(session_id)
+    if d is None:
+        return None
+    names = _session_files(d)
+    if not names:
+        return None
+    try:
+        path = max((os.path.join(d, n) for n in names), key=os.path.getmtime)
+        with open(path, "rb") as f:
+            return f.read()
+    except OSError:
+        return None  # gerade vom Aufräumen gelöscht
+
+
+def report_meta(session: Any) -> Dict[str, Any]:
+    """Kopfdaten für den Bericht aus einer QuizSession."""
+    return {"spieler": session.spieler, "klasse": session.klasse, "modus": session.modus}
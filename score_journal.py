@@ -0,0 +1,228 @@
+# C:\Users\mnold_t1ohvc3\Documents\zahlenpirat-backend\score_journal.py
+import json, os, threading, time, logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from json_files import STORE_JSON, CorruptJsonFile, atomic_write_bytes, atomic_write_json, read_json
+from score_schema import scores_list
+
+log = logging.getLogger(__name__)
+
+# fsync-Strategie für das Journal:
+#   "always"   → nach jedem Eintrag (sicherste Variante, langsamer)
+#   "interval" → höchstens alle FSYNC_INTERVAL_SEK Sekunden
+#   "never"    → nur flush, das OS entscheidet
+FSYNC_POLICIES = ("always", "interval", "never")
+
+
+def rotation_merged(compacting_path: str, snapshot_len: int) -> bool:
+    """
+    True, wenn der Snapshot die Rotation `compacting_path` schon enthält: Die Kompaktierung
+    vermerkt vor dem Snapshot-Tausch dessen neue Länge in <rotation>.merged. Stürzt sie danach
+    ab, bevor die Rotation gelöscht ist, passt die Länge – die Zeilen dürfen nicht erneut zählen.
+    """
+    if not os.path.exists(compacting_path):
+        return False
+    marker = read_json(compacting_path + ".merged", None)
+    return isinstance(marker, dict) and marker.get("eintraege") == snapshot_len
+
+
+def _file_sig(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _remove(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class ScoreJournal:
+    """
+    Append-only Journal (JSONL) vor einem kompakten Snapshot (JSON-Liste).
+
+    Jeder neue Score wird als eine Zeile angehängt – die Kosten pro Schreibvorgang
+    hängen nicht mehr von der Anzahl gespeicherter Scores ab. Ab `compact_after`
+    Einträgen wird der Snapshot im Hintergrund neu aufgebaut und das Journal geleert.
+    """
+
+    def __init__(
+        self,
+        snapshot_path: str,
+        journal_path: Optional[str] = None,
+        fsync: str = "interval",
+        fsync_interval: float = 1.0,
+        compact_after: int = 500,
+    ):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"Unbekannte fsync-Strategie: {fsync!r} (erlaubt: {', '.join(FSYNC_POLICIES)})")
+        self.snapshot_path = snapshot_path
+        self.journal_path = journal_path or snapshot_path + ".journal.jsonl"
+        self.compacting_path = self.journal_path + ".compacting"
+        self.merged_path = self.compacting_path + ".merged"
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        self.compact_after = compact_after
+
+        self._append_lock = threading.Lock()   # Dateihandle + Zähler
+        self._swap_lock = threading.RLock()    # Snapshot/Journal-Rotation konsistent lesen
+        self._fh = None
+        self._last_fsync = 0.0
+        self._since_compact = self._count_lines(self.journal_path)
+        self._compactor: Optional[threading.Thread] = None
+
+    # ------------------------------------------------------------------
+    # Schreiben
+    # ------------------------------------------------------------------
+    def append(self, entry: Dict[str, Any]) -> None:
+        line = json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n"
+        with self._append_lock:
+            fh = self._handle()
+            fh.write(line)
+            fh.flush()
+            self._maybe_fsync(fh)
+            self._since_compact += 1
+            due = self.compact_after > 0 and self._since_compact >= self.compact_after
+        if due:
+            self.compact_in_background()
+
+    def _handle(self):
+        if self._fh is None or self._fh.closed:
+            d = os.path.dirname(self.journal_path)
+            if d:
+                os.makedirs(d, exist_ok=True)
+            self._fh = open(self.journal_path, "a", encoding="utf-8")
+        return self._fh
+
+    def _maybe_fsync(self, fh) -> None:
+        if self.fsync == "never":
+            return
+        now = time.monotonic()
+        if self.fsync == "always" or now - self._last_fsync >= self.fsync_interval:
+            os.fsync(fh.fileno())
+            self._last_fsync = now
+
+    def close(self) -> None:
+        with self._append_lock:
+            if self._fh is not None and not self._fh.closed:
+                self._fh.flush()
+                if self.fsync != "never":
+                    os.fsync(self._fh.fileno())
+                self._fh.close()
+            self._fh = None
+        t = self._compactor
+        if t is not None and t.is_alive():
+            t.join()
+
+    # ------------------------------------------------------------------
+    # Lesen
+    # ------------------------------------------------------------------
+    def load(self) -> List[Dict[str, Any]]:
+        with self._swap_lock:
+            scores = self._read_snapshot()
+            if not rotation_merged(self.compacting_path, len(scores)):
+                scores.extend(self._read_lines(self.compacting_path))
+            scores.extend(self._read_lines(self.journal_path))
+        return scores
+
+    def _read_snapshot(self) -> List[Dict[str, Any]]:
+        if not os.path.exists(self.snapshot_path):
+            return []
+        with open(self.snapshot_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        try:
+            # Fremdes Layout (z. B. server.js) wird beim Start umgeschrieben (score_store); bis dahin umwandeln
+            return scores_list(data)
+        except CorruptJsonFile as e:
+            log.warning("%s: %s – nur das Journal zählt", self.snapshot_path, e)
+            return []
+
+    @staticmethod
+    def _read_lines(path: str) -> List[Dict[str, Any]]:
+        out: List[Dict[str, Any]] = []
+        if not os.path.exists(path):
+            return out
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    out.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # Abgerissene letzte Zeile (Absturz/paralleles Schreiben) überspringen
+                    log.warning("Ungültige Journal-Zeile in %s übersprungen", path)
+        return out
+
+    def version(self) -> Tuple[Optional[Tuple[int, int]], ...]:
+        """(mtime_ns, größe) von Snapshot, Rotation und Journal – ändert sich mit jedem Schreibvorgang."""
+        with self._swap_lock:
+            return tuple(_file_sig(p) for p in (self.snapshot_path, self.compacting_path, self.journal_path))
+
+    @staticmethod
+    def _count_lines(path: str) -> int:
+        if not os.path.exists(path):
+            return 0
+        with open(path, "rb") as f:
+            return sum(1 for _ in f)
+
+    # ------------------------------------------------------------------
+    # Kompaktierung
+    # ------------------------------------------------------------------
+    def compact_in_background(self) -> None:
+        with self._append_lock:
+            if self._compactor is not None and self._compactor.is_alive():
+                return
+            self._compactor = threading.Thread(target=self.compact, name="score-journal-compactor", daemon=True)
+            self._compactor.start()
+
+    def compact(self) -> None:
+        try:
+            self._compact()
+        except Exception:
+            log.error("Kompaktierung von %s fehlgeschlagen", self.snapshot_path, exc_info=True)
+
+    def _compact(self) -> None:
+        # 1) Journal rotieren (kurz unter beiden Locks). Liegt noch eine Rotation von
+        #    einem abgebrochenen Lauf herum, wird zuerst diese eingearbeitet.
+        with self._swap_lock, self._append_lock:
+            if not os.path.exists(self.compacting_path):
+                if self._fh is not None and not self._fh.closed:
+                    self._fh.flush()
+                    os.fsync(self._fh.fileno())
+                    self._fh.close()
+                self._fh = None
+                if not os.path.exists(self.journal_path):
+                    return
+                _remove(self.merged_path)  # Rest eines Laufs, der nach dem Löschen der Rotation abbrach
+                os.replace(self.journal_path, self.compacting_path)
+                self._since_compact = 0
+
+        # 2) Neuen Snapshot außerhalb der Locks schreiben
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path, "r", encoding="utf-8") as f:
+                base = json.load(f)
+            try:
+                base = scores_list(base)
+            except CorruptJsonFile as e:
+                log.warning("%s: %s – Kompaktierung übersprungen", self.snapshot_path, e)
+                return
+        else:
+            base = []
+        if rotation_merged(self.compacting_path, len(base)):
+            log.info("Rotation %s steckt schon im Snapshot – nur aufräumen", self.compacting_path)
+        else:
+            base.extend(self._read_lines(self.compacting_path))
+
+        # 3) Snapshot atomar tauschen + Rotation löschen (für Leser ein Schritt). Die Marke
+        #    vorher macht einen Absturz zwischen Tausch und Löschen wiederholbar (rotation_merged)
+        with self._swap_lock:
+            atomic_write_bytes(self.merged_path, json.dumps({"eintraege": len(base)}).encode("utf-8"), lock=False)
+            atomic_write_json(self.snapshot_path, base, **STORE_JSON)
+            os.remove(self.compacting_path)
+            _remove(self.merged_path)
+        log.info("Score-Journal kompaktiert: %d Einträge in %s", len(base), self.snapshot_path)
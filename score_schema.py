@@ -0,0 +1,195 @@
+# C:\Users\mnold_t1ohvc3\Documents\zahlenpirat-backend\score_schema.py
+"""
+Ein Datensatzformat für Scores und Session-Stände – egal, wer sie geschrieben hat.
+
+Im Umlauf sind drei Layouts:
+  "list"     → flache Liste von Einträgen (main.py, scores.json) – das kanonische Format
+  "server"   → {spieler: eintrag | [einträge]} (server.js; so liegt scores.json im Repo)
+  "sessions" → {spieler: {"sessions": [...]}} (connector_routes.py, data/scores.json)
+
+`detect_layout` erkennt das Layout einmal beim Laden, `scores_list` macht daraus die flache
+Liste – Leser arbeiten danach nur noch mit kanonischen Einträgen. `drop_stale_running`
+entfernt überholte "laufend"-Stände (server.js hängt pro Antwort einen neuen an).
+"""
+from dataclasses import dataclass, field, fields
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from json_files import CorruptJsonFile
+from normalize import normalize_operator_token, normalize_operator_value
+
+LAYOUT_EMPTY = "empty"
+LAYOUT_LIST = "list"
+LAYOUT_SERVER = "server"
+LAYOUT_SESSIONS = "sessions"
+
+
+def _int_or_none(v: Any) -> Optional[int]:
+    if v is None or v == "":
+        return None
+    try:
+        return int(v)
+    except (TypeError, ValueError):
+        return None
+
+
+def _operatoren(v: Any) -> Optional[List[str]]:
+    if v is None:
+        return None
+    if isinstance(v, str):
+        v = normalize_operator_value(v).split(",") if v.strip() else []
+    if not isinstance(v, list):
+        return None
+    out: List[str] = []
+    for op in v:
+        n = normalize_operator_token(str(op))
+        if n and n not in out:
+            out.append(n)
+    return out
+
+
+@dataclass(slots=True)
+class ScoreRecord:
+    spieler: Optional[str] = None
+    punkte: int = 0
+    klasse: Optional[int] = None
+    modus: Optional[str] = None
+    datum: Optional[str] = None
+    operatoren: Optional[List[str]] = None
+    schwierigkeit: Optional[str] = None
+    zahlenauswahl: Optional[str] = None
+    kategorie: Optional[int] = None
+    dauer: Optional[str] = None
+    autosave: Optional[bool] = None
+    sessionId: Optional[str] = None
+    status: Optional[str] = None
+    # alles Weitere (aufgabenGesamt, korrekt, datumEnde, ...) unverändert
+    extra: Dict[str, Any] = field(default_factory=dict)
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any], spieler: Optional[str] = None) -> "ScoreRecord":
+        """`spieler` = Schlüssel aus den Dict-Layouts, falls der Eintrag selbst keinen Namen hat."""
+        extra = {k: v for k, v in d.items() if k not in _KNOWN}
+        name = d.get("spieler")
+        return cls(
+            spieler=name if isinstance(name, str) and name else spieler,
+            punkte=_int_or_none(d.get("punkte")) or 0,
+            klasse=_int_or_none(d.get("klasse")),
+            modus=d.get("modus"),
+            datum=d.get("datum"),
+            operatoren=_operatoren(d.get("operatoren")),
+            schwierigkeit=d.get("schwierigkeit"),
+            zahlenauswahl=d.get("zahlenauswahl"),
+            kategorie=_int_or_none(d.get("kategorie")),
+            dauer=d.get("dauer"),
+            autosave=d.get("autosave"),
+            sessionId=d.get("sessionId"),
+            status=d.get("status"),
+            extra=extra,
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Kanonischer Eintrag: Kernfelder immer, optionale nur wenn gesetzt."""
+        out: Dict[str, Any] = {
+            "spieler": self.spieler,
+            "punkte": self.punkte,
+            "klasse": self.klasse,
+            "modus": self.modus,
+        }
+        for name in _OPTIONAL:
+            v = getattr(self, name)
+            if v is not None:
+                out[name] = v
+        out["datum"] = self.datum
+        out.update(self.extra)
+        return out
+
+    def running_key(self) -> Optional[Tuple[str, str]]:
+        """(spieler, sessionId) eines "laufend"-Stands, sonst None."""
+        if self.status != "laufend" or not self.sessionId:
+            return None
+        return ((self.spieler or "").lower(), self.sessionId)
+
+
+_KNOWN = frozenset(f.name for f in fields(ScoreRecord) if f.name != "extra")
+_OPTIONAL = ("operatoren", "schwierigkeit", "zahlenauswahl", "kategorie", "dauer", "autosave", "sessionId", "status")
+
+
+# ======================
+# Layouts
+# ======================
+
+def detect_layout(data: Any) -> str:
+    if isinstance(data, list):
+        return LAYOUT_LIST
+    if not isinstance(data, dict):
+        raise CorruptJsonFile(f"Unbekanntes Score-Layout: {type(data).__name__}")
+    if not data:
+        return LAYOUT_EMPTY
+    if all(isinstance(v, dict) and isinstance(v.get("sessions"), list) for v in data.values()):
+        return LAYOUT_SESSIONS
+    if all(isinstance(v, (dict, list)) for v in data.values()):
+        return LAYOUT_SERVER
+    raise CorruptJsonFile("Unbekanntes Score-Layout: Dict mit gemischten Werten")
+
+
+def iter_records(data: Any, layout: Optional[str] = None) -> Iterator[ScoreRecord]:
+    """Alle Einträge eines beliebigen Layouts als ScoreRecord (Dateireihenfolge)."""
+    layout = layout or detect_layout(data)
+    if layout == LAYOUT_LIST:
+        for d in data:
+            if isinstance(d, dict):
+                yield ScoreRecord.from_dict(d)
+    elif layout == LAYOUT_SERVER:
+        for name, v in data.items():
+            for d in (v if isinstance(v, list) else [v]):
+                if isinstance(d, dict):
+                    yield ScoreRecord.from_dict(d, spieler=name)
+    elif layout == LAYOUT_SESSIONS:
+        for name, block in data.items():
+            for d in block["sessions"]:
+                if isinstance(d, dict):
+                    yield ScoreRecord.from_dict(d, spieler=name)
+
+
+def drop_stale_running(records: Iterable[ScoreRecord]) -> List[ScoreRecord]:
+    """Ein "laufend"-Stand entfällt, wenn später noch ein Stand derselben Session (Spieler + sessionId) kommt."""
+    records = list(records)
+    last: Dict[Tuple[str, str], int] = {}
+    for i, r in enumerate(records):
+        if r.sessionId:
+            last[((r.spieler or "").lower(), r.sessionId)] = i
+    return [
+        r for i, r in enumerate(records)
+        if (key := r.running_key()) is None or last[key] == i
+    ]
+
+
+def scores_list(data: Any) -> List[Dict[str, Any]]:
+    """
+    Inhalt von scores.json als flache Liste. Eine Liste bleibt wie sie ist (kein Umbau pro
+    Lesevorgang); fremde Layouts werden einmal umgewandelt und kompaktiert.
+    """
+    layout = detect_layout(data)
+    if layout == LAYOUT_LIST:
+        return data
+    if layout == LAYOUT_EMPTY:
+        return []
+    if layout == LAYOUT_SESSIONS:
+        raise CorruptJsonFile("Session-Historie statt Score-Datei")
+    return [r.to_dict() for r in drop_stale_running(iter_records(data, layout))]
+
+
+def compact_sessions(data: Dict[str, Any]) -> Tuple[Dict[str, Dict[str, List[Dict[str, Any]]]], int]:
+    """
+    Session-Historie ohne überholte "laufend"-Stände; (neue Historie, Anzahl entfernt).
+    Die verbleibenden Sessions bleiben unverändert (ihr Format gehört /getHistory).
+    """
+    out: Dict[str, Dict[str, List[Dict[str, Any]]]] = {}
+    dropped = 0
+    for name, block in data.items():
+        sessions = [d for d in (block.get("sessions", []) if isinstance(block, dict) else []) if isinstance(d, dict)]
+        records = [ScoreRecord.from_dict(d, spieler=name) for d in sessions]
+        keep = {id(r) for r in drop_stale_running(records)}
+        out[name] = {"sessions": [d for d, r in zip(sessions, records) if id(r) in keep]}
+        dropped += len(sessions) - len(out[name]["sessions"])
+    return out, dropped
@@ -0,0 +1,674 @@
+# C:\Users\mnold_t1ohvc3\Documents\zahlenpirat-backend\score_store.py
+"""
+Austauschbarer Speicher für Scores (main.py) und Session-Historien (connector_routes.py).
+
+Backends (Umgebungsvariable ZP_SCORES_STORAGE):
+  "journal" → scores.json + Append-only-Journal, data/scores.json komplett (Standard)
+  "json"    → beide JSON-Dateien werden bei jedem Speichern komplett neu geschrieben
+  "sqlite"  → eingebettete SQLite-Datenbank (WAL) mit Indizes; JSON bleibt Import/Export-Format
+"""
+import json, os, shutil, sqlite3, threading, logging
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from score_journal import ScoreJournal, rotation_merged
+from json_files import (
+    PRETTY_JSON, STORE_JSON, CorruptJsonFile, atomic_write_json, atomic_write_json_list, file_lock, read_json, update_json,
+)
+from score_schema import LAYOUT_LIST, ScoreRecord, compact_sessions, detect_layout, drop_stale_running, iter_records, scores_list
+from metrics import instrument
+
+log = logging.getLogger(__name__)
+
+SCORES_FILE = "scores.json"                          # flache Liste (main.py)
+SESSIONS_FILE = os.path.join("data", "scores.json")  # {spieler: {"sessions": [...]}} (connector_routes.py)
+JOURNAL_FILE = os.getenv("ZP_SCORES_JOURNAL", "scores.journal.jsonl")
+SQLITE_FILE = os.getenv("ZP_SQLITE_FILE", os.path.join("data", "zahlenpirat.db"))
+
+# Cursor-Iteration (/load, /getHistory): Zeilen je SQLite-Abfrage
+PAGE_SIZE = 500
+
+# (cursor, eintrag) – cursor ist aufsteigend und wird als ?after= zurückgegeben
+Cursored = Tuple[int, Dict[str, Any]]
+
+
+class ScoreStore(ABC):
+    """Gemeinsame Schnittstelle aller Backends."""
+
+    # --- flache Scores (/save, /load, /leaderboard) ---
+    @abstractmethod
+    def add_score(self, entry: Dict[str, Any]) -> None:
+        ...
+
+    @abstractmethod
+    def player_scores(self, spieler: str, limit: int = 20) -> List[Dict[str, Any]]:
+        """Letzte `limit` Scores eines Spielers (Groß/Klein egal), chronologisch."""
+
+    @abstractmethod
+    def top_scores(self, limit: Optional[int] = None, modus: Optional[str] = None,
+                   klasse: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Scores absteigend nach Punkten; bei gleichen Punkten gilt die Speicherreihenfolge."""
+
+    @abstractmethod
+    def all_scores(self) -> List[Dict[str, Any]]:
+        ...
+
+    def scores_version(self) -> Any:
+        """
+        Günstige Kennung des Score-Stands (stat() bzw. eine Index-Abfrage); ändert sich mit jedem
+        Schreibvorgang, auch dem anderer Worker. None = nicht bestimmbar.
+        """
+        return None
+
+    @abstractmethod
+    def iter_player_scores(self, spieler: str, after: Optional[int] = None) -> Iterator[Cursored]:
+        """Scores eines Spielers chronologisch ab Cursor `after` (exklusiv), lazy."""
+
+    def tail_player_scores(self, spieler: str, limit: int) -> List[Cursored]:
+        """Die letzten `limit` Scores mit Cursor, chronologisch (konstanter Speicher)."""
+        return list(deque(self.iter_player_scores(spieler), maxlen=limit))
+
+    # --- Session-Historie (/flow, /saveSession, /getHistory, ...) ---
+    @abstractmethod
+    def add_session(self, spieler: str, session: Dict[str, Any]) -> None:
+        ...
+
+    @abstractmethod
+    def player_sessions(self, spieler: str) -> List[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def iter_player_sessions(self, spieler: str, after: Optional[int] = None) -> Iterator[Cursored]:
+        """Sessions eines Spielers chronologisch ab Cursor `after` (exklusiv), lazy."""
+
+    def tail_player_sessions(self, spieler: str, limit: int) -> List[Cursored]:
+        """Die letzten `limit` Sessions mit Cursor, chronologisch (konstanter Speicher)."""
+        return list(deque(self.iter_player_sessions(spieler), maxlen=limit))
+
+    @abstractmethod
+    def last_session(self, spieler: str) -> Optional[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def replace_last_session(self, spieler: str, session: Dict[str, Any]) -> None:
+        ...
+
+    @abstractmethod
+    def upsert_running_sessions(self, items: List[Tuple[str, Dict[str, Any]]]) -> None:
+        """
+        Autosave-Schnappschüsse (status "laufend") in einem Rutsch speichern: ist die letzte
+        Session des Spielers der laufende Stand mit derselben sessionId, wird sie ersetzt,
+        sonst wird angehängt.
+        """
+
+    @abstractmethod
+    def all_sessions(self) -> Dict[str, Dict[str, List[Dict[str, Any]]]]:
+        ...
+
+    def close(self) -> None:
+        pass
+
+
+def _is_same_running(last: Optional[Dict[str, Any]], session: Dict[str, Any]) -> bool:
+    return (
+        last is not None
+        and last.get("status") == "laufend"
+        and last.get("sessionId") == session.get("sessionId")
+    )
+
+
+# ======================
+# JSON-Dateien
+# ======================
+
+class JsonScoreStore(ScoreStore):
+    def __init__(self, scores_file: str = SCORES_FILE, sessions_file: str = SESSIONS_FILE,
+                 journal: Optional[ScoreJournal] = None, pretty: bool = False):
+        self.scores_file = scores_file
+        self.sessions_file = sessions_file
+        self.journal = journal
+        # Laufende Dateien kompakt (STORE_JSON), Exporte eingerückt
+        self.dump = PRETTY_JSON if pretty else STORE_JSON
+
+    # --- flache Scores ---
+    def load_scores(self) -> list:
+        if self.journal is not None:
+            return self.journal.load()
+        return scores_list(read_json(self.scores_file, [], strict=True))
+
+    def save_scores(self, scores: list) -> None:
+        atomic_write_json(self.scores_file, scores, **self.dump)
+
+    def add_score(self, entry):
+        if self.journal is not None:
+            self.journal.append(entry)
+            return
+
+        def _append(scores):
+            scores = scores_list(scores)  # fremdes Layout → ab jetzt als Liste
+            scores.append(entry)
+            return scores
+
+        update_json(self.scores_file, _append, list, **self.dump)
+
+    def player_scores(self, spieler, limit=20):
+        key = spieler.lower()
+        matching = [
+            s for s in self.load_scores()
+            if "spieler" in s and isinstance(s["spieler"], str) and s["spieler"].lower() == key
+        ]
+        return matching[-limit:] if limit else matching
+
+    def top_scores(self, limit=None, modus=None, klasse=None):
+        scores = [
+            s for s in self.load_scores()
+            if (modus is None or s.get("modus") == modus) and (klasse is None or s.get("klasse") == klasse)
+        ]
+        scores.sort(key=lambda x: x["punkte"], reverse=True)
+        return scores[:limit] if limit else scores
+
+    def all_scores(self):
+        return self.load_scores()
+
+    def scores_version(self):
+        if self.journal is not None:
+            return self.journal.version()
+        try:
+            st = os.stat(self.scores_file)
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    # Cursor = Position in der Gesamtliste (1-basiert); die Dateien werden ohnehin ganz geparst,
+    # gefiltert wird aber ohne Zwischenliste
+    def iter_player_scores(self, spieler, after=None):
+        key = spieler.lower()
+        for pos, s in enumerate(self.load_scores(), start=1):
+            if after is not None and pos <= after:
+                continue
+            name = s.get("spieler") if isinstance(s, dict) else None
+            if isinstance(name, str) and name.lower() == key:
+                yield pos, s
+
+    # --- Sessions ---
+    def load_sessions(self) -> dict:
+        # Nur für Leser: eine kaputte Datei ergibt {} (Schreiber brechen dagegen ab, s. _update_sessions)
+        return read_json(self.sessions_file, {})
+
+    def save_sessions(self, data: dict) -> None:
+        atomic_write_json(self.sessions_file, data, **self.dump)
+
+    def _update_sessions(self, mutate) -> None:
+        update_json(self.sessions_file, mutate, dict, **self.dump)
+
+    def add_session(self, spieler, session):
+        self._update_sessions(
+            lambda data: data.setdefault(spieler, {"sessions": []})["sessions"].append(session)
+        )
+
+    def player_sessions(self, spieler):
+        data = self.load_sessions()
+        if spieler not in data:
+            return []
+        return data[spieler]["sessions"]
+
+    def iter_player_sessions(self, spieler, after=None):
+        start = after or 0
+        sessions = self.player_sessions(spieler)
+        for pos in range(start, len(sessions)):
+            yield pos + 1, sessions[pos]
+
+    def tail_player_sessions(self, spieler, limit):
+        sessions = self.player_sessions(spieler)
+        start = max(0, len(sessions) - limit)
+        return [(pos + 1, sessions[pos]) for pos in range(start, len(sessions))]
+
+    def last_session(self, spieler):
+        sessions = self.player_sessions(spieler)
+        return sessions[-1] if sessions else None
+
+    def replace_last_session(self, spieler, session):
+        def _replace(data):
+            sessions = data.get(spieler, {}).get("sessions")
+            if not sessions:
+                raise KeyError(spieler)
+            sessions[-1] = session
+
+        self._update_sessions(_replace)
+
+    def upsert_running_sessions(self, items):
+        def _upsert(data):
+            for spieler, session in items:
+                sessions = data.setdefault(spieler, {"sessions": []})["sessions"]
+                if sessions and _is_same_running(sessions[-1], session):
+                    sessions[-1] = session
+                else:
+                    sessions.append(session)
+
+        self._update_sessions(_upsert)
+
+    def all_sessions(self):
+        return self.load_sessions()
+
+    def close(self):
+        if self.journal is not None:
+            self.journal.close()
+
+
+# ======================
+# SQLite (WAL)
+# ======================
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS scores (
+    id          INTEGER PRIMARY KEY,
+    spieler     TEXT,
+    spieler_lc  TEXT,
+    punkte      INTEGER NOT NULL DEFAULT 0,
+    modus       TEXT,
+    klasse      INTEGER,
+    datum       TEXT,
+    data        TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_scores_spieler ON scores (spieler_lc, datum);
+CREATE INDEX IF NOT EXISTS ix_scores_spieler_id ON scores (spieler_lc, id);
+CREATE INDEX IF NOT EXISTS ix_scores_punkte ON scores (punkte DESC);
+CREATE INDEX IF NOT EXISTS ix_scores_bucket ON scores (modus, klasse, punkte);
+
+CREATE TABLE IF NOT EXISTS sessions (
+    id          INTEGER PRIMARY KEY,
+    spieler     TEXT NOT NULL,
+    status      TEXT,
+    datum       TEXT,
+    data        TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_sessions_spieler ON sessions (spieler, id);
+"""
+
+
+def _punkte(entry: Dict[str, Any]) -> int:
+    try:
+        return int(entry.get("punkte") or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+class SqliteScoreStore(ScoreStore):
+    """
+    Eine Verbindung pro Thread (FastAPI-Threadpool), Schreibzugriffe über einen Lock serialisiert.
+    `spieler_lc` ist Pythons str.lower() – SQLites lower() kennt nur ASCII (Ä/Ö/Ü).
+    """
+
+    def __init__(self, path: str = SQLITE_FILE):
+        self.path = path
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        d = os.path.dirname(path)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(_SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False, timeout=30)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def is_empty(self) -> bool:
+        conn = self._conn()
+        return (conn.execute("SELECT 1 FROM scores LIMIT 1").fetchone() is None
+                and conn.execute("SELECT 1 FROM sessions LIMIT 1").fetchone() is None)
+
+    # --- flache Scores ---
+    def add_score(self, entry):
+        self.add_scores([entry])
+
+    def add_scores(self, entries: List[Dict[str, Any]]) -> None:
+        rows = []
+        for e in entries:
+            spieler = e.get("spieler") if isinstance(e.get("spieler"), str) else None
+            rows.append((
+                spieler, spieler.lower() if spieler else None, _punkte(e),
+                e.get("modus"), e.get("klasse"), e.get("datum"),
+                json.dumps(e, ensure_ascii=False, separators=(",", ":")),
+            ))
+        with self._write_lock:
+            conn = self._conn()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.executemany(
+                    "INSERT INTO scores (spieler, spieler_lc, punkte, modus, klasse, datum, data) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def player_scores(self, spieler, limit=20):
+        sql = "SELECT data FROM scores WHERE spieler_lc = ? ORDER BY datum DESC, id DESC"
+        params: list = [spieler.lower()]
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
+        rows = self._conn().execute(sql, params).fetchall()
+        return [json.loads(r[0]) for r in reversed(rows)]
+
+    def top_scores(self, limit=None, modus=None, klasse=None):
+        where, params = [], []
+        if modus is not None:
+            where.append("modus = ?")
+            params.append(modus)
+        if klasse is not None:
+            where.append("klasse = ?")
+            params.append(klasse)
+        sql = "SELECT data FROM scores"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY punkte DESC, id ASC"
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return [json.loads(r[0]) for r in self._conn().execute(sql, params)]
+
+    def all_scores(self):
+        return [json.loads(r[0]) for r in self._conn().execute("SELECT data FROM scores ORDER BY id")]
+
+    def scores_version(self):
+        # Scores werden nur angehängt → die höchste id genügt (Primärschlüssel, O(log n))
+        return self._conn().execute("SELECT MAX(id) FROM scores").fetchone()[0]
+
+    def _iter_pages(self, sql: str, key: str, after: Optional[int]) -> Iterator[Cursored]:
+        # Keyset-Paging: jede Seite ist eine abgeschlossene Abfrage, dazwischen hält der
+        # Generator nur die letzte id – egal in welchem Thread er weiterläuft
+        last = after or 0
+        while True:
+            rows = self._conn().execute(sql, (key, last, PAGE_SIZE)).fetchall()
+            for rid, data in rows:
+                yield rid, json.loads(data)
+            if len(rows) < PAGE_SIZE:
+                return
+            last = rows[-1][0]
+
+    def iter_player_scores(self, spieler, after=None):
+        return self._iter_pages(
+            "SELECT id, data FROM scores WHERE spieler_lc = ? AND id > ? ORDER BY id LIMIT ?",
+            spieler.lower(), after,
+        )
+
+    def tail_player_scores(self, spieler, limit):
+        rows = self._conn().execute(
+            "SELECT id, data FROM scores WHERE spieler_lc = ? ORDER BY id DESC LIMIT ?", (spieler.lower(), limit)
+        ).fetchall()
+        return [(rid, json.loads(data)) for rid, data in reversed(rows)]
+
+    # --- Sessions ---
+    def add_session(self, spieler, session):
+        with self._write_lock:
+            self._conn().execute(
+                "INSERT INTO sessions (spieler, status, datum, data) VALUES (?, ?, ?, ?)",
+                (spieler, session.get("status"), session.get("datum"),
+                 json.dumps(session, ensure_ascii=False, separators=(",", ":"))),
+            )
+
+    def player_sessions(self, spieler):
+        rows = self._conn().execute("SELECT data FROM sessions WHERE spieler = ? ORDER BY id", (spieler,))
+        return [json.loads(r[0]) for r in rows]
+
+    def iter_player_sessions(self, spieler, after=None):
+        return self._iter_pages(
+            "SELECT id, data FROM sessions WHERE spieler = ? AND id > ? ORDER BY id LIMIT ?",
+            spieler, after,
+        )
+
+    def tail_player_sessions(self, spieler, limit):
+        rows = self._conn().execute(
+            "SELECT id, data FROM sessions WHERE spieler = ? ORDER BY id DESC LIMIT ?", (spieler, limit)
+        ).fetchall()
+        return [(rid, json.loads(data)) for rid, data in reversed(rows)]
+
+    def last_session(self, spieler):
+        row = self._conn().execute(
+            "SELECT data FROM sessions WHERE spieler = ? ORDER BY id DESC LIMIT 1", (spieler,)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def replace_last_session(self, spieler, session):
+        with self._write_lock:
+            conn = self._conn()
+            row = conn.execute(
+                "SELECT id FROM sessions WHERE spieler = ? ORDER BY id DESC LIMIT 1", (spieler,)
+            ).fetchone()
+            if row is None:
+                raise KeyError(spieler)
+            conn.execute(
+                "UPDATE sessions SET status = ?, datum = ?, data = ? WHERE id = ?",
+                (session.get("status"), session.get("datum"),
+                 json.dumps(session, ensure_ascii=False, separators=(",", ":")), row[0]),
+            )
+
+    def upsert_running_sessions(self, items):
+        with self._write_lock:
+            conn = self._conn()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                for spieler, session in items:
+                    payload = json.dumps(session, ensure_ascii=False, separators=(",", ":"))
+                    row = conn.execute(
+                        "SELECT id, data FROM sessions WHERE spieler = ? ORDER BY id DESC LIMIT 1", (spieler,)
+                    ).fetchone()
+                    if row is not None and _is_same_running(json.loads(row[1]), session):
+                        conn.execute(
+                            "UPDATE sessions SET status = ?, datum = ?, data = ? WHERE id = ?",
+                            (session.get("status"), session.get("datum"), payload, row[0]),
+                        )
+                    else:
+                        conn.execute(
+                            "INSERT INTO sessions (spieler, status, datum, data) VALUES (?, ?, ?, ?)",
+                            (spieler, session.get("status"), session.get("datum"), payload),
+                        )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def all_sessions(self):
+        out: Dict[str, Dict[str, List[Dict[str, Any]]]] = {}
+        for spieler, data in self._conn().execute("SELECT spieler, data FROM sessions ORDER BY id"):
+            out.setdefault(spieler, {"sessions": []})["sessions"].append(json.loads(data))
+        return out
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+# Laufzeiten für /metrics (zp_storage_seconds{op="json.load_scores"}, ...); Iteratoren bleiben außen vor,
+# dort würde nur das Anlegen des Generators gemessen
+_TIMED = ("load_scores", "save_scores", "load_sessions", "save_sessions", "add_score", "add_scores",
+          "player_scores", "top_scores", "all_scores", "tail_player_scores", "add_session", "player_sessions",
+          "tail_player_sessions", "last_session", "replace_last_session", "upsert_running_sessions", "all_sessions")
+instrument(JsonScoreStore, "json", _TIMED)
+instrument(SqliteScoreStore, "sqlite", _TIMED)
+
+
+# ======================
+# Import / Export (JSON)
+# ======================
+
+def import_json(store: ScoreStore, scores_file: str = SCORES_FILE, sessions_file: str = SESSIONS_FILE) -> Dict[str, int]:
+    """Übernimmt scores.json (Liste) und data/scores.json (Sessions) in `store`."""
+    counts = {"scores": 0, "sessions": 0}
+    src = JsonScoreStore(scores_file, sessions_file)
+    if os.path.exists(scores_file):
+        try:
+            scores = src.load_scores()  # jedes Layout (auch server.js) → flache Liste
+        except CorruptJsonFile as e:
+            log.warning("%s: %s – Import übersprungen", scores_file, e)
+            scores = []
+        entries = [s for s in scores if isinstance(s, dict)]
+        if isinstance(store, SqliteScoreStore):
+            store.add_scores(entries)
+        else:
+            for e in entries:
+                store.add_score(e)
+        counts["scores"] = len(entries)
+    for spieler, block in src.load_sessions().items():
+        for s in (block or {}).get("sessions", []):
+            store.add_session(spieler, s)
+            counts["sessions"] += 1
+    return counts
+
+
+def normalize_scores_file(path: str = SCORES_FILE) -> bool:
+    """
+    Liegt `path` in einem fremden Layout vor (server.js), wird es einmal als flache Liste
+    umgeschrieben (Original als <datei>.bak). True, wenn umgeschrieben wurde.
+    """
+    with file_lock(path):
+        try:
+            data = read_json(path, None, strict=True)
+            if data is None or isinstance(data, list):
+                return False
+            scores = scores_list(data)
+        except CorruptJsonFile as e:
+            log.warning("%s nicht umgewandelt: %s", path, e)
+            return False
+        shutil.copy2(path, path + ".bak")
+        atomic_write_json_list(path, scores)
+    log.warning("%s war im Layout %r – als Liste mit %d Einträgen neu geschrieben (Original: %s.bak)",
+                path, detect_layout(data), len(scores), path)
+    return True
+
+
+def migrate(scores_file: str = SCORES_FILE, sessions_file: str = SESSIONS_FILE,
+            journal_file: str = JOURNAL_FILE, dry_run: bool = False) -> Dict[str, Any]:
+    """
+    Einmalige Migration/Kompaktierung (Server dabei nicht laufen lassen):
+    scores.json (jedes Layout) + Journal → eine kompakte Liste kanonischer Einträge ohne
+    überholte "laufend"-Stände; data/scores.json → Historie ohne überholte "laufend"-Stände.
+    """
+    data = read_json(scores_file, [], strict=True)
+    layout = detect_layout(data)
+    records = list(iter_records(data, layout))
+    compacting = journal_file + ".compacting"
+    # Nach einem Absturz der Kompaktierung kann die Rotation schon im Snapshot stecken
+    merged = rotation_merged(compacting, len(records))
+    journal_files = [p for p in (compacting, journal_file) if os.path.exists(p)]
+    for p in journal_files:
+        if p == compacting and merged:
+            continue
+        records.extend(ScoreRecord.from_dict(d) for d in ScoreJournal._read_lines(p) if isinstance(d, dict))
+    total = len(records)
+    records = drop_stale_running(records)
+    report: Dict[str, Any] = {"layout": layout, "scoresIn": total, "scoresOut": len(records),
+                              "journal": journal_files}
+
+    sessions = read_json(sessions_file, {}, strict=True)
+    compacted, dropped = compact_sessions(sessions)
+    report.update(sessionsIn=sum(len(b["sessions"]) for b in compacted.values()) + dropped,
+                  sessionsDropped=dropped)
+    if dry_run:
+        return report
+
+    if layout != LAYOUT_LIST and os.path.exists(scores_file):
+        shutil.copy2(scores_file, scores_file + ".bak")
+    atomic_write_json_list(scores_file, (r.to_dict() for r in records))
+    for p in journal_files:
+        os.remove(p)
+    if os.path.exists(compacting + ".merged"):
+        os.remove(compacting + ".merged")
+    if sessions:
+        atomic_write_json(sessions_file, compacted, **STORE_JSON)
+    return report
+
+
+def export_json(store: ScoreStore, scores_file: str = SCORES_FILE, sessions_file: str = SESSIONS_FILE) -> Dict[str, int]:
+    """Schreibt den Inhalt von `store` in die beiden JSON-Dateien (Export/Backup, eingerückt)."""
+    dst = JsonScoreStore(scores_file, sessions_file, pretty=True)
+    scores = store.all_scores()
+    sessions = store.all_sessions()
+    dst.save_scores(scores)
+    dst.save_sessions(sessions)
+    return {"scores": len(scores), "sessions": sum(len(b["sessions"]) for b in sessions.values())}
+
+
+# ======================
+# Backend-Auswahl
+# ======================
+
+SCORES_STORAGE = os.getenv("ZP_SCORES_STORAGE", "journal")
+
+_store: Optional[ScoreStore] = None
+_store_lock = threading.Lock()
+
+
+def _create_store(kind: str) -> ScoreStore:
+    if kind == "sqlite":
+        fresh = not os.path.exists(SQLITE_FILE)
+        store = SqliteScoreStore(SQLITE_FILE)
+        if fresh and store.is_empty():
+            counts = import_json(store)
+            if counts["scores"] or counts["sessions"]:
+                log.info("JSON-Daten nach %s importiert: %s", SQLITE_FILE, counts)
+        return store
+    if kind == "journal":
+        normalize_scores_file(SCORES_FILE)
+        journal = ScoreJournal(
+            SCORES_FILE,
+            JOURNAL_FILE,
+            fsync=os.getenv("ZP_JOURNAL_FSYNC", "interval"),
+            fsync_interval=float(os.getenv("ZP_JOURNAL_FSYNC_INTERVAL", "1.0")),
+            compact_after=int(os.getenv("ZP_JOURNAL_COMPACT_AFTER", "500")),
+        )
+        return JsonScoreStore(journal=journal)
+    if kind == "json":
+        normalize_scores_file(SCORES_FILE)
+        return JsonScoreStore()
+    raise ValueError(f"Unbekanntes Score-Backend: {kind!r} (erlaubt: journal, json, sqlite)")
+
+
+def get_store() -> ScoreStore:
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = _create_store(SCORES_STORAGE)
+    return _store
+
+
+def close_store() -> None:
+    global _store
+    with _store_lock:
+        if _store is not None:
+            _store.close()
+            _store = None
+
+
+if __name__ == "__main__":
+    # python score_store.py export|import   (nutzt das über ZP_SCORES_STORAGE gewählte Backend)
+    import sys
+
+    logging.basicConfig(level=logging.INFO)
+    cmd = sys.argv[1] if len(sys.argv) > 1 else ""
+    if cmd == "migrate":
+        # python score_store.py migrate [--dry-run]   (arbeitet direkt auf den JSON-Dateien)
+        print(migrate(dry_run="--dry-run" in sys.argv[2:]))
+        sys.exit(0)
+    if cmd in ("export", "import") and SCORES_STORAGE != "sqlite":
+        print("Import/Export ist nur mit ZP_SCORES_STORAGE=sqlite sinnvoll – die JSON-Backends nutzen die Dateien direkt.")
+        sys.exit(2)
+    if cmd == "export":
+        print(export_json(get_store()))
+    elif cmd == "import":
+        print(import_json(get_store()))
+    else:
+        print("Verwendung: python score_store.py export|import|migrate [--dry-run]")
+        sys.exit(2)
+    close_store()
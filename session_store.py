@@ -0,0 +1,288 @@
+# C:\Users\mnold_t1ohvc3\Documents\zahlenpirat-backend\session_store.py
+"""
+Session-Backends für engine.get_state.
+
+  "memory" → SessionStore: im Prozess, nur mit einem uvicorn-Worker sinnvoll (Standard)
+  "sqlite" → SqliteSessionStore: gemeinsame SQLite-Datei (WAL), alle Worker sehen denselben Stand
+
+Beide bieten get / get_or_create / save / pop / sweep / stats / stop. Nach jeder Änderung
+an einem Zustand muss `save()` aufgerufen werden (beim In-Memory-Store nur ein Zeitstempel).
+"""
+import os, sqlite3, threading, time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Generic, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+SESSION_TTL_SEK = float(os.getenv("ZP_SESSION_TTL_SEK", "7200"))        # 2 h ohne Zugriff
+SESSION_MAX = int(os.getenv("ZP_SESSION_MAX", "10000"))                 # danach LRU-Verdrängung
+SESSION_SWEEP_SEK = float(os.getenv("ZP_SESSION_SWEEP_SEK", "60"))
+SESSION_BACKEND = os.getenv("ZP_SESSION_BACKEND", "memory")
+SESSION_DB_FILE = os.getenv("ZP_SESSION_DB_FILE", os.path.join("data", "sessions.db"))
+
+
+class SessionStore(Generic[T]):
+    """
+    Begrenzter In-Memory-Store: Einträge verfallen nach `ttl` Sekunden ohne Zugriff,
+    bei mehr als `max_entries` fliegt der am längsten ungenutzte raus.
+    Ein Hintergrund-Thread räumt alle `sweep_interval` Sekunden abgelaufene Einträge ab.
+    """
+
+    def __init__(self, factory: Callable[[], T], ttl: float = SESSION_TTL_SEK,
+                 max_entries: int = SESSION_MAX, sweep_interval: float = SESSION_SWEEP_SEK,
+                 name: str = "sessions"):
+        self._factory = factory
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.sweep_interval = sweep_interval
+        self.name = name
+        # key → (Wert, letzter Zugriff); älteste Einträge vorne
+        self._data: "OrderedDict[str, Tuple[T, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._sweeper: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.created = 0
+        self.evicted_ttl = 0
+        self.evicted_lru = 0
+
+    # ------------------------------------------------------------------
+    # Zugriff
+    # ------------------------------------------------------------------
+    def get(self, key: str) -> Optional[T]:
+        """Vorhandenen Eintrag holen (zählt als Zugriff), legt nichts an."""
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            if now - item[1] > self.ttl:
+                del self._data[key]
+                self.evicted_ttl += 1
+                return None
+            self._data[key] = (item[0], now)
+            self._data.move_to_end(key)
+            return item[0]
+
+    def get_or_create(self, key: str) -> T:
+        value = self.get(key)
+        if value is not None:
+            return value
+        value = self._factory()
+        return self.setdefault(key, value)
+
+    def setdefault(self, key: str, value: T) -> T:
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None and now - item[1] <= self.ttl:
+                value = item[0]
+            else:
+                self.created += 1
+            self._data[key] = (value, now)
+            self._data.move_to_end(key)
+            self._evict_locked()
+        self._ensure_sweeper()
+        return value
+
+    def put(self, key: str, value: T) -> None:
+        with self._lock:
+            if key not in self._data:
+                self.created += 1
+            self._data[key] = (value, time.monotonic())
+            self._data.move_to_end(key)
+            self._evict_locked()
+        self._ensure_sweeper()
+
+    # Gleiche Schnittstelle wie SqliteSessionStore: Objekt liegt ohnehin im Speicher
+    save = put
+
+    def pop(self, key: str) -> Optional[T]:
+        with self._lock:
+            item = self._data.pop(key, None)
+        return item[0] if item else None
+
+    def __contains__(self, key: object) -> bool:
+        return isinstance(key, str) and self.get(key) is not None
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    # ------------------------------------------------------------------
+    # Aufräumen
+    # ------------------------------------------------------------------
+    def _evict_locked(self) -> None:
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+            self.evicted_lru += 1
+
+    def sweep(self) -> int:
+        """Abgelaufene Einträge entfernen; liefert die Anzahl entfernter Einträge."""
+        cutoff = time.monotonic() - self.ttl
+        removed = 0
+        with self._lock:
+            while self._data:
+                key, (_, last) = next(iter(self._data.items()))
+                if last > cutoff:
+                    break
+                del self._data[key]
+                removed += 1
+            self.evicted_ttl += removed
+        return removed
+
+    def _ensure_sweeper(self) -> None:
+        if self._sweeper is not None or self.sweep_interval <= 0:
+            return
+        with self._lock:
+            if self._sweeper is None:
+                self._sweeper = threading.Thread(target=self._run, name=f"{self.name}-sweeper", daemon=True)
+                self._sweeper.start()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.sweep_interval):
+            self.sweep()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    # ------------------------------------------------------------------
+    # Kennzahlen
+    # ------------------------------------------------------------------
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "live": len(self._data),
+            "created": self.created,
+            "evicted_ttl": self.evicted_ttl,
+            "evicted_lru": self.evicted_lru,
+        }
+
+
+# ======================
+# Gemeinsames Backend (mehrere Worker)
+# ======================
+
+class SqliteSessionStore(Generic[T]):
+    """
+    Sessions als kompakte Zeile in einer gemeinsamen SQLite-Datei (WAL).
+    `encode`/`decode` wandeln den Zustand in einen kurzen String und zurück;
+    TTL/Maximalzahl gelten wie beim In-Memory-Store, Zeitbasis ist die Wanduhr.
+    """
+
+    def __init__(self, factory: Callable[[], T], encode: Callable[[T], str], decode: Callable[[str], Optional[T]],
+                 path: str = SESSION_DB_FILE, ttl: float = SESSION_TTL_SEK, max_entries: int = SESSION_MAX,
+                 sweep_interval: float = SESSION_SWEEP_SEK, name: str = "sessions"):
+        self._factory = factory
+        self._encode = encode
+        self._decode = decode
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.sweep_interval = sweep_interval
+        self.name = name
+        self._local = threading.local()
+        self._sweeper: Optional[threading.Thread] = None
+        self._sweeper_lock = threading.Lock()
+        self._stop = threading.Event()
+        self.created = 0
+        self.evicted_ttl = 0
+        self.evicted_lru = 0
+        d = os.path.dirname(path)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS session_state ("
+            " id TEXT PRIMARY KEY, data TEXT NOT NULL, updated REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_session_state_updated ON session_state (updated)")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False, timeout=30)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[T]:
+        row = self._conn().execute(
+            "SELECT data, updated FROM session_state WHERE id = ?", (key,)
+        ).fetchone()
+        if row is None or time.time() - row[1] > self.ttl:
+            return None
+        return self._decode(row[0])
+
+    def get_or_create(self, key: str) -> T:
+        value = self.get(key)
+        if value is None:
+            value = self._factory()
+            self.created += 1
+            self.save(key, value)
+        return value
+
+    def save(self, key: str, value: T) -> None:
+        self._conn().execute(
+            "INSERT OR REPLACE INTO session_state (id, data, updated) VALUES (?, ?, ?)",
+            (key, self._encode(value), time.time()),
+        )
+        self._ensure_sweeper()
+
+    put = save
+
+    def pop(self, key: str) -> Optional[T]:
+        value = self.get(key)
+        self._conn().execute("DELETE FROM session_state WHERE id = ?", (key,))
+        return value
+
+    def __contains__(self, key: object) -> bool:
+        return isinstance(key, str) and self.get(key) is not None
+
+    def __len__(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM session_state").fetchone()[0]
+
+    def clear(self) -> None:
+        self._conn().execute("DELETE FROM session_state")
+
+    def sweep(self) -> int:
+        conn = self._conn()
+        removed = conn.execute("DELETE FROM session_state WHERE updated < ?", (time.time() - self.ttl,)).rowcount
+        self.evicted_ttl += removed
+        excess = len(self) - self.max_entries
+        if excess > 0:
+            conn.execute(
+                "DELETE FROM session_state WHERE id IN "
+                "(SELECT id FROM session_state ORDER BY updated LIMIT ?)", (excess,)
+            )
+            self.evicted_lru += excess
+        return removed
+
+    def _ensure_sweeper(self) -> None:
+        if self._sweeper is not None or self.sweep_interval <= 0:
+            return
+        with self._sweeper_lock:
+            if self._sweeper is None:
+                self._sweeper = threading.Thread(target=self._run, name=f"{self.name}-sweeper", daemon=True)
+                self._sweeper.start()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.sweep_interval):
+            try:
+                self.sweep()
+            except sqlite3.Error:
+                pass  # z. B. Datei gesperrt – nächster Durchlauf
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def stats(self) -> Dict[str, Any]:
+        # created/evicted zählen nur diesen Worker, "live" gilt für alle
+        return {
+            "live": len(self),
+            "created": self.created,
+            "evicted_ttl": self.evicted_ttl,
+            "evicted_lru": self.evicted_lru,
+        }
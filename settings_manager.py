@@ -1,6 +1,11 @@
 # C:\Users\mnold_t1ohvc3\Documents\zahlenpirat-backend\settings_manager.py
-import json, os, threading
-from typing import Dict, Any
+import json, os, threading, time
+from types import MappingProxyType
+from typing import Callable, Dict, Any, Mapping, Optional, Tuple
+
+from json_files import atomic_write_json, file_lock
+from metrics import timed
+from normalize import fix_mojibake as _fix_mojibake
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DATA_DIR = os.path.join(BASE_DIR, "data")
@@ -15,55 +20,97 @@ def _ensure_dir():
     os.makedirs(DATA_DIR, exist_ok=True)
 
 
-# --- Kleiner Reparatur-Helper gegen Mojibake in bereits gespeicherten Strings ---
-_MOJI_FIX = {
-    "Ã—": "×",
-    "Ã·": "÷",
-    # (optional weitere, falls nötig)
-    "Ã„": "Ä", "Ã–": "Ö", "Ãœ": "Ü",
-    "Ã¤": "ä", "Ã¶": "ö", "Ã¼": "ü",
-    "ÃŸ": "ß",
-}
-
-def _fix_mojibake_in_str(s: str) -> str:
-    out = s
-    for bad, good in _MOJI_FIX.items():
-        if bad in out:
-            out = out.replace(bad, good)
-    return out
-
-def _fix_mojibake(obj: Any) -> Any:
-    if isinstance(obj, dict):
-        return {k: _fix_mojibake(v) for k, v in obj.items()}
-    if isinstance(obj, list):
-        return [_fix_mojibake(v) for v in obj]
-    if isinstance(obj, str):
-        return _fix_mojibake_in_str(obj)
-    return obj
-# -------------------------------------------------------------------------------
+# --- Cache: geparste + reparierte Settings, gültig solange mtime/Größe der Datei gleich bleiben ---
+# Die Datei wird höchstens alle RECHECK_SEK Sekunden per stat() geprüft; eigene Schreibvorgänge
+# (save_persistent) aktualisieren den Cache direkt.
+RECHECK_SEK = float(os.getenv("ZP_SETTINGS_RECHECK_SEK", "1.0"))
+
+_EMPTY: Mapping[str, Any] = MappingProxyType({})
+_cache: Optional[Mapping[str, Any]] = None
+_cache_sig: Optional[Tuple[int, int]] = None
+_cache_checked = 0.0
+cache_hits = 0
+cache_misses = 0
+
+
+def _file_sig() -> Optional[Tuple[int, int]]:
+    try:
+        st = os.stat(SETTINGS_PATH)
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+@timed("settings.read")
+def _read_file() -> Mapping[str, Any]:
+    if not os.path.exists(SETTINGS_PATH):
+        return _EMPTY
+    try:
+        with open(SETTINGS_PATH, "r", encoding="utf-8") as f:
+            data = json.load(f)
+            if not isinstance(data, dict):
+                return _EMPTY
+            # Repariere evtl. falsch angezeigte UTF-8/Mojibake-Sequenzen:
+            return MappingProxyType(_fix_mojibake(data))
+    except json.JSONDecodeError:
+        return _EMPTY
+
+
+def load_persistent_snapshot() -> Mapping[str, Any]:
+    """Unveränderliche Sicht auf die Settings – für reine Leser (kein Kopieren, kein Datei-Zugriff)."""
+    global _cache, _cache_sig, _cache_checked, cache_hits, cache_misses
+    now = time.monotonic()
+    if _cache is not None and now - _cache_checked < RECHECK_SEK:
+        cache_hits += 1
+        return _cache
+    with _lock:
+        sig = _file_sig()
+        if _cache is None or sig != _cache_sig:
+            _cache = _read_file()
+            _cache_sig = sig
+            cache_misses += 1
+        else:
+            cache_hits += 1
+        _cache_checked = now
+        return _cache
+
+
+@timed("settings.load_persistent")
+def load_persistent() -> Dict[str, Any]:
+    """Veränderbare Kopie (für Lesen-Ändern-Speichern)."""
+    return dict(load_persistent_snapshot())
 
 
-def load_persistent() -> Dict[str, Any]:
+@timed("settings.save_persistent")
+def save_persistent(data: Dict[str, Any]) -> None:
+    global _cache, _cache_sig, _cache_checked
     with _lock:
-        if not os.path.exists(SETTINGS_PATH):
-            return {}
-        try:
-            with open(SETTINGS_PATH, "r", encoding="utf-8") as f:
-                data = json.load(f)
-                if not isinstance(data, dict):
-                    return {}
-                # Repariere evtl. falsch angezeigte UTF-8/Mojibake-Sequenzen:
-                return _fix_mojibake(data)
-        except json.JSONDecodeError:
-            return {}
+        _ensure_dir()
+        # Temp-Datei + Umbenennen: nie eine halb geschriebene settings.json
+        # ensure_ascii=False => echte UTF-8 Zeichen (×, ÷, …) landen im File
+        atomic_write_json(SETTINGS_PATH, data, ensure_ascii=False, indent=2)
+        # Write-through: Cache entspricht dem, was load_persistent aus der Datei lesen würde
+        _cache = MappingProxyType(_fix_mojibake(dict(data)))
+        _cache_sig = _file_sig()
+        _cache_checked = time.monotonic()
 
 
-def save_persistent(data: Dict[str, Any]) -> None:
+@timed("settings.update_persistent")
+def update_persistent(mutate: Callable[[Dict[str, Any]], Optional[Dict[str, Any]]]) -> Dict[str, Any]:
+    """
+    Lesen-Ändern-Speichern als eine Mutation: unter dem Prozess-Lock und file_lock (andere Worker)
+    wird die Datei frisch gelesen (nicht der Cache), `mutate` ändert die Kopie in-place oder gibt
+    eine neue zurück, dann wird atomar geschrieben. Liefert den gespeicherten Stand.
+    """
     with _lock:
         _ensure_dir()
-        with open(SETTINGS_PATH, "w", encoding="utf-8") as f:
-            # ensure_ascii=False => echte UTF-8 Zeichen (×, ÷, …) landen im File
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        with file_lock(SETTINGS_PATH):
+            data = dict(_read_file())
+            result = mutate(data)
+            if result is not None:
+                data = result
+            save_persistent(data)
+            return data
 
 
 def reset_persistent() -> None:
@@ -0,0 +1,205 @@
+# C:\Users\mnold_t1ohvc3\Documents\zahlenpirat-backend\task_generator.py
+"""
+Erzeugt Rechenaufgaben stapelweise (ein Durchlauf pro Stapel statt randint pro Aufgabe).
+
+- Zahlenbereich aus Klasse (wie generateTasks.js), Schwierigkeit und Zahlenauswahl ("1-20")
+- mehrere Operatoren werden gemischt
+- Division geht immer glatt auf, Subtraktion wird nie negativ (wie generateTasks.js)
+- mit `seed` reproduzierbar; ab NUMPY_THRESHOLD Aufgaben wird NumPy genutzt, falls installiert
+"""
+import random, re
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+try:
+    import numpy as np  # optional
+except ImportError:  # pragma: no cover - NumPy ist keine Pflicht-Abhängigkeit
+    np = None
+
+OPERATORS = ("+", "-", "×", "÷")
+
+_OPERATOR_ALIASES = {
+    "+": "+",
+    "-": "-", "−": "-", "–": "-",
+    "×": "×", "*": "×", "x": "×", "X": "×",
+    "÷": "÷", "/": "÷", ":": "÷",
+}
+
+# Obergrenze je Klasse (generateTasks.js: Klasse 1 → 20, Klasse 2 → 50, sonst 100)
+_KLASSE_MAX = {1: 20, 2: 50}
+_DEFAULT_MAX = 100
+
+# Faktor auf die Obergrenze je Schwierigkeit
+_SCHWIERIGKEIT_FAKTOR = {
+    "leicht": 0.5,
+    "einfach": 0.5,
+    "mittel": 1.0,
+    "schwer": 2.0,
+    "extrem schwer": 5.0,
+    "unlösbar": 10.0,
+}
+
+_RANGE_RE = re.compile(r"^\s*(-?\d+)\s*[-–—]\s*(-?\d+)\s*$")
+
+NUMPY_THRESHOLD = 256
+
+
+def normalize_operators(ops: Union[str, Sequence[str], None]) -> List[str]:
+    """'+,×' / ['+', '*'] → ['+', '×'] (nur gültige, ohne Duplikate, Reihenfolge bleibt)."""
+    if ops is None:
+        return []
+    if isinstance(ops, str):
+        ops = [p for chunk in ops.split(",") for p in chunk.split()]
+    out: List[str] = []
+    for raw in ops:
+        op = _OPERATOR_ALIASES.get(str(raw).strip())
+        if op and op not in out:
+            out.append(op)
+    return out
+
+
+def number_range(
+    klasse: Optional[Union[int, str]] = None,
+    schwierigkeit: Optional[str] = None,
+    zahlenauswahl: Optional[str] = None,
+) -> Tuple[int, int]:
+    """(min, max) der Operanden. Eine gültige Zahlenauswahl wie "1-20" hat Vorrang."""
+    if zahlenauswahl:
+        m = _RANGE_RE.match(str(zahlenauswahl))
+        if m:
+            lo, hi = int(m.group(1)), int(m.group(2))
+            if lo > hi:
+                lo, hi = hi, lo
+            return max(lo, 0), max(hi, 1)
+    try:
+        k = int(klasse) if klasse is not None else None
+    except (TypeError, ValueError):
+        k = None
+    hi = _KLASSE_MAX.get(k, _DEFAULT_MAX)
+    faktor = _SCHWIERIGKEIT_FAKTOR.get(str(schwierigkeit or "").strip().lower(), 1.0)
+    return 1, max(2, int(hi * faktor))
+
+
+@dataclass
+class TaskBatch:
+    """Spaltenweise Aufgaben: ops[i] a[i] b[i] = loesung[i]."""
+    ops: List[str]
+    a: List[int]
+    b: List[int]
+    loesung: List[int]
+
+    def __len__(self) -> int:
+        return len(self.ops)
+
+    def frage(self, i: int, suffix: str = "") -> str:
+        return f"{self.a[i]} {self.ops[i]} {self.b[i]}{suffix}"
+
+    def to_dicts(self, start_id: int = 1, id_prefix: str = "", suffix: str = "",
+                 loesung: bool = True, **extra: Any) -> List[Dict[str, Any]]:
+        """loesung=False → ohne korrekteLoesung (Tests, die der Server selbst prüft)."""
+        if not loesung:
+            return [
+                {"id": f"{id_prefix}{start_id + i}", "frage": f"{a} {op} {b}{suffix}", "operator": op, **extra}
+                for i, (op, a, b) in enumerate(zip(self.ops, self.a, self.b))
+            ]
+        return [
+            {
+                "id": f"{id_prefix}{start_id + i}",
+                "frage": f"{a} {op} {b}{suffix}",
+                "korrekteLoesung": str(l),
+                "operator": op,
+                **extra,
+            }
+            for i, (op, a, b, l) in enumerate(zip(self.ops, self.a, self.b, self.loesung))
+        ]
+
+
+def generate_batch(
+    count: int,
+    operatoren: Union[str, Sequence[str], None] = "+",
+    klasse: Optional[Union[int, str]] = None,
+    schwierigkeit: Optional[str] = None,
+    zahlenauswahl: Optional[str] = None,
+    seed: Optional[int] = None,
+) -> TaskBatch:
+    ops = normalize_operators(operatoren)
+    if count <= 0 or not ops:
+        return TaskBatch([], [], [], [])
+    lo, hi = number_range(klasse, schwierigkeit, zahlenauswahl)
+    if np is not None and count >= NUMPY_THRESHOLD:
+        return _generate_numpy(count, ops, lo, hi, seed)
+    return _generate_python(count, ops, lo, hi, seed)
+
+
+def generate_tasks(count: int, operatoren: Union[str, Sequence[str], None] = "+", **kwargs: Any) -> List[Dict[str, Any]]:
+    """Bequeme Variante: direkt als Liste von Task-Dicts (id ab 1)."""
+    return generate_batch(count, operatoren, **kwargs).to_dicts()
+
+
+# ======================
+# Implementierungen
+# ======================
+
+def _div_bounds(hi: int) -> Tuple[int, int]:
+    # Teiler 2..12 (wie generateTasks.js), aber nie größer als der halbe Zahlenbereich
+    return 2, max(2, min(12, hi // 2))
+
+
+def _generate_python(count: int, ops: List[str], lo: int, hi: int, seed: Optional[int]) -> TaskBatch:
+    rng = random.Random(seed)
+    span = range(lo, hi + 1)
+    op_col = rng.choices(ops, k=count) if len(ops) > 1 else [ops[0]] * count
+    a_col = rng.choices(span, k=count)
+    b_col = rng.choices(span, k=count)
+    loesung: List[int] = [0] * count
+
+    d_lo, d_hi = _div_bounds(hi)
+    divisors = range(d_lo, d_hi + 1)
+    rand = rng.random
+    for i, op in enumerate(op_col):
+        a, b = a_col[i], b_col[i]
+        if op == "+":
+            loesung[i] = a + b
+        elif op == "-":
+            if b > a:
+                a_col[i], b_col[i] = b, a
+                a, b = b, a
+            loesung[i] = a - b
+        elif op == "×":
+            loesung[i] = a * b
+        else:
+            b = divisors[int(rand() * len(divisors))]
+            q = 1 + int(rand() * max(1, hi // b))
+            a_col[i], b_col[i], loesung[i] = q * b, b, q
+    return TaskBatch(op_col, a_col, b_col, loesung)
+
+
+def _generate_numpy(count: int, ops: List[str], lo: int, hi: int, seed: Optional[int]) -> TaskBatch:
+    gen = np.random.default_rng(seed)
+    op_idx = gen.integers(0, len(ops), size=count)
+    a = gen.integers(lo, hi + 1, size=count, dtype=np.int64)
+    b = gen.integers(lo, hi + 1, size=count, dtype=np.int64)
+    loesung = np.empty(count, dtype=np.int64)
+
+    codes = np.array([OPERATORS.index(op) for op in ops])[op_idx]
+
+    m = codes == 0
+    loesung[m] = a[m] + b[m]
+
+    m = codes == 1
+    big, small = np.maximum(a[m], b[m]), np.minimum(a[m], b[m])
+    a[m], b[m] = big, small
+    loesung[m] = big - small
+
+    m = codes == 2
+    loesung[m] = a[m] * b[m]
+
+    m = codes == 3
+    n = int(m.sum())
+    if n:
+        d_lo, d_hi = _div_bounds(hi)
+        div = gen.integers(d_lo, d_hi + 1, size=n, dtype=np.int64)
+        q = 1 + (gen.random(n) * np.maximum(1, hi // div)).astype(np.int64)
+        a[m], b[m], loesung[m] = q * div, div, q
+
+    return TaskBatch([OPERATORS[c] for c in codes.tolist()], a.tolist(), b.tolist(), loesung.tolist())
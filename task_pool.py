@@ -0,0 +1,181 @@
+# C:\Users\mnold_t1ohvc3\Documents\zahlenpirat-backend\task_pool.py
+"""
+Vorgefertigte Aufgaben-Pools je Konfiguration (Operatoren, Klasse, Schwierigkeit, Zahlenauswahl).
+
+Anfragen nehmen nur fertige Aufgaben aus einer deque (O(1)); ein Hintergrund-Worker füllt
+Pools nach, sobald sie unter die Niedrigwassermarke fallen. Selten genutzte Konfigurationen
+werden per LRU verdrängt.
+"""
+import os, threading, logging
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, Iterable, List, Optional, Tuple
+
+from task_generator import TaskBatch, generate_batch, normalize_operators
+
+log = logging.getLogger(__name__)
+
+POOL_SIZE = int(os.getenv("ZP_TASK_POOL_SIZE", "500"))            # Aufgaben pro Pool (Obergrenze)
+POOL_LOW_WATER = int(os.getenv("ZP_TASK_POOL_LOW_WATER", "150"))  # darunter wird nachgefüllt
+MAX_POOLS = int(os.getenv("ZP_TASK_POOL_MAX", "64"))              # Anzahl Konfigurationen (LRU)
+
+PoolKey = Tuple[Tuple[str, ...], Optional[str], Optional[str], Optional[str]]
+
+# Eine fertige Aufgabe: (operator, a, b, loesung)
+RawTask = Tuple[str, int, int, int]
+
+
+def pool_key(operatoren: Any, klasse: Any = None, schwierigkeit: Optional[str] = None,
+             zahlenauswahl: Optional[str] = None) -> PoolKey:
+    return (
+        tuple(sorted(normalize_operators(operatoren))),
+        None if klasse is None or str(klasse).strip() == "" else str(klasse).strip(),
+        (schwierigkeit or "").strip().lower() or None,
+        (zahlenauswahl or "").strip() or None,
+    )
+
+
+class TaskPool:
+    def __init__(self, pool_size: int = POOL_SIZE, low_water: int = POOL_LOW_WATER, max_pools: int = MAX_POOLS):
+        self.pool_size = pool_size
+        self.low_water = low_water
+        self.max_pools = max_pools
+        self._pools: "OrderedDict[PoolKey, Deque[RawTask]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._refill: "OrderedDict[PoolKey, None]" = OrderedDict()
+        self._worker: Optional[threading.Thread] = None
+        self._stopped = False
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.refills = 0
+
+    # ------------------------------------------------------------------
+    # Ziehen
+    # ------------------------------------------------------------------
+    def draw(self, count: int, operatoren: Any, klasse: Any = None,
+             schwierigkeit: Optional[str] = None, zahlenauswahl: Optional[str] = None) -> TaskBatch:
+        """
+        `count` Aufgaben für die Konfiguration. Was der Pool nicht hergibt (Fehlschuss oder
+        zu große Anfrage), wird direkt erzeugt; der Pool wird danach im Hintergrund aufgefüllt.
+        """
+        key = pool_key(operatoren, klasse, schwierigkeit, zahlenauswahl)
+        if not key[0] or count <= 0:
+            return TaskBatch([], [], [], [])
+        if count > self.pool_size:
+            # Arbeitsblätter/Exporte: größer als jeder Pool → direkt als Stapel erzeugen
+            return generate_batch(count, list(key[0]), klasse=key[1], schwierigkeit=key[2], zahlenauswahl=key[3])
+
+        taken: List[RawTask] = []
+        with self._lock:
+            pool = self._pools.get(key)
+            if pool is None:
+                self._pools[key] = pool = deque()
+                self._evict_locked()
+            else:
+                self._pools.move_to_end(key)
+            while pool and len(taken) < count:
+                taken.append(pool.popleft())
+            if len(taken) == count:
+                self.hits += 1
+            else:
+                self.misses += 1
+            if len(pool) < self.low_water:
+                self._refill[key] = None
+        self._schedule()
+
+        missing = count - len(taken)
+        if missing:
+            extra = generate_batch(missing, list(key[0]), klasse=key[1], schwierigkeit=key[2], zahlenauswahl=key[3])
+            taken.extend(zip(extra.ops, extra.a, extra.b, extra.loesung))
+        ops, a, b, loesung = (list(col) for col in zip(*taken))
+        return TaskBatch(ops, a, b, loesung)
+
+    # ------------------------------------------------------------------
+    # Befüllen
+    # ------------------------------------------------------------------
+    def prefill(self, configs: Iterable[Dict[str, Any]]) -> None:
+        """Beim Start: Pools für die üblichen Konfigurationen sofort füllen."""
+        for cfg in configs:
+            key = pool_key(cfg.get("operatoren"), cfg.get("klasse"), cfg.get("schwierigkeit"), cfg.get("zahlenauswahl"))
+            if not key[0]:
+                continue
+            with self._lock:
+                if key not in self._pools:
+                    self._pools[key] = deque()
+                    self._evict_locked()
+            self._fill(key)
+
+    def _fill(self, key: PoolKey) -> None:
+        with self._lock:
+            pool = self._pools.get(key)
+            missing = self.pool_size - len(pool) if pool is not None else 0
+        if missing <= 0:
+            return
+        batch = generate_batch(missing, list(key[0]), klasse=key[1], schwierigkeit=key[2], zahlenauswahl=key[3])
+        with self._lock:
+            pool = self._pools.get(key)
+            if pool is None:
+                return  # zwischenzeitlich verdrängt
+            room = self.pool_size - len(pool)
+            pool.extend(list(zip(batch.ops, batch.a, batch.b, batch.loesung))[:room])
+            self.refills += 1
+
+    def _evict_locked(self) -> None:
+        while len(self._pools) > self.max_pools:
+            old, _ = self._pools.popitem(last=False)
+            self._refill.pop(old, None)
+            self.evictions += 1
+
+    def _schedule(self) -> None:
+        if self._stopped:
+            return
+        if self._worker is None or not self._worker.is_alive():
+            with self._lock:
+                if self._worker is None or not self._worker.is_alive():
+                    self._worker = threading.Thread(target=self._run, name="task-pool-refill", daemon=True)
+                    self._worker.start()
+        self._wake.set()
+
+    def _run(self) -> None:
+        while not self._stopped:
+            self._wake.wait()
+            self._wake.clear()
+            while not self._stopped:
+                with self._lock:
+                    if not self._refill:
+                        break
+                    key, _ = self._refill.popitem(last=False)
+                try:
+                    self._fill(key)
+                except Exception:
+                    log.error("Task-Pool konnte nicht nachgefüllt werden: %s", key, exc_info=True)
+
+    def stop(self) -> None:
+        self._stopped = True
+        self._wake.set()
+
+    # ------------------------------------------------------------------
+    # Kennzahlen
+    # ------------------------------------------------------------------
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "pools": len(self._pools),
+                "aufgaben": sum(len(p) for p in self._pools.values()),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "refills": self.refills,
+            }
+
+
+# Gemeinsamer Pool für main.py und engine.py
+TASK_POOL = TaskPool()
+
+# Konfigurationen, die beim Start vorgefüllt werden (Chat-Standard + Einzeloperatoren)
+DEFAULT_PREFILL = [
+    {"operatoren": "+", "zahlenauswahl": "1-10"},
+    {"operatoren": "+,×", "zahlenauswahl": "1-10"},
+    *({"operatoren": op, "klasse": k, "schwierigkeit": "Mittel"} for op in ("+", "-", "×", "÷") for k in (1, 2, 3)),
+]
@@ -0,0 +1,5 @@
+# C:\Users\mnold_t1ohvc3\Documents\zahlenpirat-backend\tests\conftest.py
+# Die Module liegen flach im Projektordner → für die Tests importierbar machen
+import os, sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,155 @@
+# C:\Users\mnold_t1ohvc3\Documents\zahlenpirat-backend\tests\test_remote_save.py
+"""RemoteSaver gegen einen lokalen Stub-HTTP-Server (http.server in einem Thread)."""
+import asyncio, json, os, threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Tuple
+
+import pytest
+
+from remote_save import CircuitBreaker, Outbox, RemoteSaver
+
+
+class StubServer:
+    """Antwortet je Pfad mit (status, body, content-type); Standard 200 + JSON."""
+
+    def __init__(self) -> None:
+        self.responses: Dict[str, Tuple[int, bytes, str]] = {}
+        self.calls: List[Tuple[str, Any]] = []
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self) -> None:
+                body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                stub.calls.append((self.path, json.loads(body or b"null")))
+                status, out, ctype = stub.responses.get(self.path, (200, b'{"status":"ok"}', "application/json"))
+                self.send_response(status)
+                self.send_header("Content-Type", ctype)
+                self.send_header("Content-Length", str(len(out)))
+                self.end_headers()
+                self.wfile.write(out)
+
+            def log_message(self, *args: Any) -> None:
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+
+    def respond(self, path: str, status: int, body: bytes = b"", ctype: str = "text/plain") -> None:
+        self.responses[path] = (status, body, ctype)
+
+    def close(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture
+def stub():
+    server = StubServer()
+    yield server
+    server.close()
+
+
+@pytest.fixture
+def outbox(tmp_path):
+    return Outbox(str(tmp_path / "outbox.jsonl"))
+
+
+def make_saver(stub: StubServer, outbox: Outbox, saved: List[Dict[str, Any]]) -> RemoteSaver:
+    async def local_save(data: Dict[str, Any]) -> Dict[str, Any]:
+        saved.append(data)
+        return {"status": "ok"}
+
+    return RemoteSaver(local_save, base_url=stub.url, timeout=2, outbox=outbox,
+                       breaker=CircuitBreaker(fail_max=3, reset_sek=60), replay_interval=0)
+
+
+def run(saver: RemoteSaver, coro_fn) -> Any:
+    async def _main():
+        try:
+            return await coro_fn()
+        finally:
+            await saver.close()
+    return asyncio.run(_main())
+
+
+def test_injected_empty_outbox_is_used(stub, outbox):
+    saver = make_saver(stub, outbox, [])
+    assert len(outbox) == 0
+    assert saver.outbox is outbox
+
+
+def test_success_json(stub, outbox):
+    saved: List[Dict[str, Any]] = []
+    saver = make_saver(stub, outbox, saved)
+    res = run(saver, lambda: saver.save({"spieler": "Anna", "punkte": 3}))
+    assert res == {"status": "ok", "source": "/save", "data": {"status": "ok"}}
+    assert stub.calls == [("/save", {"spieler": "Anna", "punkte": 3})]
+    assert saved == [] and len(outbox) == 0
+
+
+@pytest.mark.parametrize("status,body", [(200, b"OK"), (204, b"")])
+def test_success_without_json_body(stub, outbox, status, body):
+    stub.respond("/save", status, body)
+    saved: List[Dict[str, Any]] = []
+    saver = make_saver(stub, outbox, saved)
+    res = run(saver, lambda: saver.save({"spieler": "Anna"}))
+    assert res["source"] == "/save"
+    assert res["data"] == (body.decode() or None)
+    assert saved == [] and len(outbox) == 0
+    assert saver.breaker.state == "closed" and saver.breaker.failures == 0
+
+
+def test_4xx_goes_to_dead_letter(stub, outbox):
+    stub.respond("/save", 422, b"kaputt")
+    stub.respond("/postSaveExtended", 400, b"kaputt")
+    saved: List[Dict[str, Any]] = []
+    saver = make_saver(stub, outbox, saved)
+    res = run(saver, lambda: saver.save({"spieler": "Anna"}))
+    assert res["source"] == "local" and res["rejected"] is True
+    assert saved == [{"spieler": "Anna"}]
+    assert len(outbox) == 0
+    with open(outbox.path + ".dead", encoding="utf-8") as f:
+        dead = [json.loads(line) for line in f]
+    assert [d["item"] for d in dead] == [{"spieler": "Anna"}]
+    assert saver.breaker.failures == 0
+
+
+def test_5xx_goes_to_outbox(stub, outbox):
+    stub.respond("/save", 503)
+    stub.respond("/postSaveExtended", 500)
+    saved: List[Dict[str, Any]] = []
+    saver = make_saver(stub, outbox, saved)
+    res = run(saver, lambda: saver.save({"spieler": "Anna"}))
+    assert res["source"] == "local" and res["queued"] is True
+    assert saved == [{"spieler": "Anna"}]
+    assert outbox._read(outbox.path) == [{"spieler": "Anna"}]
+    assert saver.breaker.failures == 1
+
+
+def test_replay_sends_each_entry_once(stub, outbox):
+    for i in range(3):
+        outbox.append({"spieler": "Anna", "nr": i})
+    stub.respond("/save", 204)
+    saver = make_saver(stub, outbox, [])
+
+    async def replay_twice():
+        return await saver.replay_once(), await saver.replay_once()
+
+    assert run(saver, replay_twice) == (3, 0)
+    assert [c[1]["nr"] for c in stub.calls] == [0, 1, 2]
+    assert len(outbox) == 0
+    assert not [n for n in os.listdir(os.path.dirname(outbox.path)) if ".claim-" in n and not n.endswith(".lock")]
+    assert saver.replayed == 3
+
+
+def test_replay_keeps_unsent_entries_on_5xx(stub, outbox):
+    for i in range(2):
+        outbox.append({"spieler": "Anna", "nr": i})
+    stub.respond("/save", 503)
+    stub.respond("/postSaveExtended", 503)
+    saver = make_saver(stub, outbox, [])
+    assert run(saver, saver.replay_once) == 0
+    assert [e["nr"] for e in outbox._read(outbox.path)] == [0, 1]
+    assert saver.breaker.failures == 1
@@ -1,45 +1,72 @@
 # C:\Users\mnold_t1ohvc3\Documents\zahlenpirat-backend\utils_text.py
-import unicodedata
+import re, unicodedata
+from functools import lru_cache
+
+# Emoji-Bereiche, die komplett entfernt werden
+_EMOJI_RANGES = (
+    (0x1F300, 0x1FAFF),  # Emoji Blocks
+    (0x2600, 0x26FF),    # Misc symbols
+    (0x2700, 0x27BF),    # Dingbats
+)
+_EMOJI_SINGLES = (0xFE0F, 0x20E3)  # Variation selector, keycap
+
+# gezielte Ersetzungen vor der ASCII-Normalisierung
+_REPLACEMENTS = {
+    # typografisch
+    "„": '"', "“": '"', "‚": "'", "’": "'", "…": "...", "—": "-", "–": "-",
+    "•": "- ", "·": "-", "×": "x", "÷": "/",
+    # Pfeile/Symbole (falls mal auftauchen)
+    "→": "->", "←": "<-", "±": "+/-",
+    # deutsche Umlaute -> ASCII
+    "Ä": "Ae", "Ö": "Oe", "Ü": "Ue", "ä": "ae", "ö": "oe", "ü": "ue", "ß": "ss",
+    # geschützte Leerzeichen
+    "\u00A0": " ",
+}
+
+
+def _build_emoji_table() -> dict:
+    table = {cp: None for lo, hi in _EMOJI_RANGES for cp in range(lo, hi + 1)}
+    table.update({cp: None for cp in _EMOJI_SINGLES})
+    return table
+
+
+# Einmal aufgebaute Übersetzungstabellen für str.translate (ein Durchlauf in C statt ~25 replace-Aufrufe)
+_EMOJI_TABLE = _build_emoji_table()
+_PLAIN_TABLE = {**_EMOJI_TABLE, **{ord(src): dst for src, dst in _REPLACEMENTS.items()}}
+
+_MULTI_SPACE = re.compile(r" {2,}")
+
+# Menü-/Bestätigungstexte wiederholen sich ständig → Ergebnis-Cache; sehr lange Texte nicht cachen
+_CACHE_MAX_LEN = 4096
+
 
 def _is_emoji(ch: str) -> bool:
-    o = ord(ch)
-    return (
-        0x1F300 <= o <= 0x1FAFF  # Emoji Blocks
-        or 0x2600 <= o <= 0x26FF # Misc symbols
-        or 0x2700 <= o <= 0x27BF # Dingbats
-        or o in (0xFE0F, 0x20E3) # Variation selector, keycap
-    )
+    return ord(ch) in _EMOJI_TABLE
+
 
 def strip_emoji(text: str) -> str:
-    return "".join(ch for ch in text if not _is_emoji(ch))
+    return text.translate(_EMOJI_TABLE)
 
-# ! ASCII-sichere Plain-Funktion: Umlaute, Bullets, typografische Zeichen
-def to_plain(text: str) -> str:
-    t = strip_emoji(text)
-
-    # gezielte Ersetzungen vor der ASCII-Normalisierung
-    replacements = {
-        # typografisch
-        "„": '"', "“": '"', "‚": "'", "’": "'", "…": "...", "—": "-", "–": "-",
-        "•": "- ", "·": "-", "×": "x", "÷": "/",
-        # Pfeile/Symbole (falls mal auftauchen)
-        "→": "->", "←": "<-", "±": "+/-",
-        # deutsche Umlaute -> ASCII
-        "Ä": "Ae", "Ö": "Oe", "Ü": "Ue", "ä": "ae", "ö": "oe", "ü": "ue", "ß": "ss",
-        # geschützte Leerzeichen
-        "\u00A0": " ",
-    }
-    for src, dst in replacements.items():
-        t = t.replace(src, dst)
+
+def _to_plain(text: str) -> str:
+    t = text.translate(_PLAIN_TABLE)
 
     # Restliche Nicht-ASCII-Zeichen defensiv entfernen
     # (z. B. wenn etwas Ungewöhnliches durchrutscht)
-    t = unicodedata.normalize("NFKD", t).encode("ascii", "ignore").decode("ascii")
+    if not t.isascii():
+        t = unicodedata.normalize("NFKD", t).encode("ascii", "ignore").decode("ascii")
 
     # Zeilenenden und Mehrfach-Leerzeichen hübsch machen
     # (ohne fancy Unicode, damit PS5.1 es sicher darstellt)
     t = "\n".join(line.rstrip() for line in t.splitlines())
-    while "  " in t:
-        t = t.replace("  ", " ")
+    return _MULTI_SPACE.sub(" ", t)
+
 
-    return t
+_to_plain_cached = lru_cache(maxsize=1024)(_to_plain)
+
+
+# ! ASCII-sichere Plain-Funktion: Umlaute, Bullets, typografische Zeichen
+def to_plain(text: str) -> str:
+    if len(text) <= _CACHE_MAX_LEN:
+        return _to_plain_cached(text)
+    return _to_plain(text)